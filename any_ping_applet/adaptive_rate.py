@@ -0,0 +1,100 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+from .ping_containers import RESULT_OK, RESULT_PARTIAL, \
+    DEFAULT_MIN_UPDATE_RATE, DEFAULT_MAX_UPDATE_RATE
+
+# interval factor after stable_results stable results in a row
+DEFAULT_BACKOFF = 1.5
+DEFAULT_STABLE_RESULTS = 3
+# avg change that still counts as stable, relative and absolute (ms)
+STABLE_AVG_CHANGE = 0.2
+STABLE_AVG_CHANGE_MS = 1.0
+# results without reply in a row before an outage backs off
+DEFAULT_OUTAGE_RESULTS = 5
+
+
+class AdaptiveRate(object):
+    """Probe interval of a target that stretches while the results stay
+    stable and drops to the minimum as soon as the target degrades. A result
+    is stable if all echo requests were answered, the avg stayed below the
+    warning threshold and moved less than STABLE_AVG_CHANGE. The status
+    changing, loss or a slow avg restart at min_update_rate. If no reply
+    arrives for outage_results results in a row the burst ends and the
+    interval grows by backoff per result until the target answers again.
+    """
+    def __init__(self, update_rate, min_update_rate=DEFAULT_MIN_UPDATE_RATE,
+                 max_update_rate=DEFAULT_MAX_UPDATE_RATE,
+                 backoff=DEFAULT_BACKOFF,
+                 stable_results=DEFAULT_STABLE_RESULTS,
+                 outage_results=DEFAULT_OUTAGE_RESULTS):
+        """Initialize.
+        :param update_rate: Initial interval in seconds.
+        :param min_update_rate: Interval of the burst after a degradation.
+        :param max_update_rate: Longest interval of a stable target.
+        :param backoff: Factor the interval grows by.
+        :param stable_results: Stable results in a row before it grows.
+        :param outage_results: Results without reply in a row before the
+        burst of an outage ends.
+        """
+        self.min_update_rate = min(min_update_rate, max_update_rate)
+        self.max_update_rate = max(min_update_rate, max_update_rate)
+        self.backoff = backoff
+        self.stable_results = stable_results
+        self.interval = min(max(update_rate, self.min_update_rate),
+                            self.max_update_rate)
+        self.outage_results = outage_results
+        self.stable_count = 0
+        self.outage_count = 0
+        self.last_avg = None
+
+    def update(self, result, ping_warning, is_status_changed):
+        """Adapt the interval to a new result.
+        :param result: PingStruct.
+        :param ping_warning: Warning threshold of the avg in ms.
+        :param is_status_changed: True if the status icon changed.
+        :return: The next interval in seconds.
+        """
+        is_degraded = is_status_changed or result.result != RESULT_OK or \
+            result.loss > 0.0 or result.avg > ping_warning
+        if result.result in (RESULT_OK, RESULT_PARTIAL):
+            self.outage_count = 0
+        else:
+            self.outage_count += 1
+        if not is_degraded and self.last_avg is not None and \
+                abs(result.avg - self.last_avg) > max(
+                    STABLE_AVG_CHANGE_MS, STABLE_AVG_CHANGE * self.last_avg):
+            # moving, but not degraded, keep the interval
+            self.stable_count = 0
+        elif is_degraded:
+            self.stable_count = 0
+            if self.outage_count > self.outage_results and \
+                    not is_status_changed:
+                # sustained outage, probe it less and less often
+                self.interval = min(self.interval * self.backoff,
+                                    self.max_update_rate)
+            else:
+                self.interval = self.min_update_rate
+        else:
+            self.stable_count += 1
+            if self.stable_count >= self.stable_results:
+                self.stable_count = 0
+                self.interval = min(self.interval * self.backoff,
+                                    self.max_update_rate)
+        self.last_avg = result.avg if result.result == RESULT_OK else None
+        return self.interval
@@ -0,0 +1,134 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import os
+import re
+import signal
+import subprocess
+
+from .history import summarize
+from .ping_containers import PingStruct, RESULT_NO_RESPONSE, \
+    RESULT_UNRESOLVED
+from .ping_parser import PING_ENVIRONMENT
+
+# per host line of fping -C -q, e.g. b"8.8.8.8 : 12.31 - 11.87"
+_HOST_LINE = re.compile(br"^(\S+)\s+:((?:\s+(?:[0-9.]+|-))+)\s*$",
+                        re.MULTILINE)
+
+# seconds fping waits for a reply
+DEFAULT_TIMEOUT = 1.0
+# seconds fping may overrun the update rate before it is killed
+DEADLINE_GRACE = 1.0
+
+
+def fping_period(number_of_pings, update_rate):
+    """Milliseconds between the pings to a host, spread over the update
+    rate, at most one per second like ping.
+    :param number_of_pings:
+    :param update_rate:
+    :return:
+    """
+    return max(10, min(1000, int(update_rate * 1000 / number_of_pings)))
+
+
+def fping_command(addresses, number_of_pings, update_rate,
+                  timeout=DEFAULT_TIMEOUT):
+    """Command line of one fping run over all addresses. The pings to a host
+    are spread over the update rate, at most one per second like ping.
+    :param addresses:
+    :param number_of_pings: Echo requests per host.
+    :param update_rate: Seconds until the next run.
+    :param timeout: Seconds to wait for a reply.
+    :return:
+    """
+    period = fping_period(number_of_pings, update_rate)
+    return ['fping', '-C', str(number_of_pings), '-q', '-p', str(period),
+            '-t', str(int(timeout * 1000)), '-i', '1', '-r', '0'] + \
+        list(addresses)
+
+
+def parse(output):
+    """Parse the output of fping -C -q.
+    :param output: Bytes of stderr.
+    :return: Dictionary address (str) -> list of round trip times in ms,
+    None for lost packets. Hosts fping could not resolve are missing.
+    """
+    samples = {}
+    for match in _HOST_LINE.finditer(output):
+        samples[match.group(1).decode()] = [
+            None if value == b"-" else float(value)
+            for value in match.group(2).split()]
+    return samples
+
+
+def probe(ping_objects, number_of_pings, update_rate):
+    """Probe all ping objects with one fping process.
+    :param ping_objects: Objects with a resolve() method, returning the IP
+    address or None, and a probe_timeouts counter.
+    :param number_of_pings: Echo requests per host.
+    :param update_rate: Seconds until the next run.
+    :return: Dictionary ping object -> (PingStruct, samples). If fping
+    overruns its deadline it is killed, its objects count a probe timeout
+    and get no response.
+    :raise FileNotFoundError: If fping is not installed.
+    :raise OSError: If fping cannot be started, e.g. out of file
+    descriptors.
+    """
+    results = {}
+    resolved = {}
+    for item in ping_objects:
+        address = item.resolve()
+        if address is None:
+            results[item] = (PingStruct(RESULT_UNRESOLVED, 0.0, 0.0, 0.0,
+                                        0.0), [])
+        else:
+            resolved[item] = address
+    if not resolved:
+        return results
+    # ping objects can share an address, probe it once
+    addresses = list(dict.fromkeys(resolved.values()))
+    process = subprocess.Popen(fping_command(addresses, number_of_pings,
+                                             update_rate),
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE,
+                               env=PING_ENVIRONMENT,
+                               preexec_fn=os.setsid)
+    deadline = number_of_pings * \
+        fping_period(number_of_pings, update_rate) / 1000.0 + DEFAULT_TIMEOUT
+    try:
+        output = process.communicate(timeout=deadline + DEADLINE_GRACE)[1]
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.communicate()
+        output = b""
+        for item in resolved:
+            item.probe_timeouts += 1
+    samples = parse(output)
+    for item, address in resolved.items():
+        item_samples = samples.get(address)
+        if item_samples is None:
+            # no reply line
+            results[item] = (PingStruct(RESULT_NO_RESPONSE, 0.0, 0.0, 0.0,
+                                        0.0),
+                             [None] * number_of_pings)
+        else:
+            results[item] = (summarize(item_samples), item_samples)
+    return results
@@ -0,0 +1,236 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import csv
+import io
+import ipaddress
+import threading
+
+from . import config
+from .ping_containers import PingObjectTuple
+
+IMPORT_CSV = "csv"
+IMPORT_HOSTS = "hosts"
+IMPORT_CIDR = "cidr"
+
+# largest range imported from a CIDR, a /20 of IPv4
+MAX_RANGE_HOSTS = 4096
+# targets handed to the callback at once
+DEFAULT_CHUNK_SIZE = 250
+
+# columns of a CSV file without header
+CSV_COLUMNS = ("address", "name", "update_rate", "number_of_pings")
+
+
+def parse_bool(value):
+    """Parse a boolean cell of a CSV file.
+    :param value:
+    :return:
+    """
+    return value.strip().lower() in ("1", "true", "yes")
+
+
+# types of the settings a CSV file can set, str if missing
+CSV_TYPES = {
+    "update_rate": float,
+    "number_of_pings": int,
+    "min_update_rate": float,
+    "max_update_rate": float,
+    "port": int,
+    "show_indicator": parse_bool,
+    "show_text": parse_bool,
+    "is_activated": parse_bool,
+    "streaming": parse_bool,
+    "adaptive": parse_bool,
+}
+
+
+def parse_csv(text, template, skipped=None):
+    """Parse targets of a CSV file. With a header row (containing
+    "address") the columns are named like the settings, else they are
+    address, name, update rate and number of pings. Rows with a value of
+    the wrong type are skipped.
+    :param text:
+    :param template: PingObjectTuple with the settings of missing columns.
+    :param skipped: List the reasons of the skipped rows are appended to,
+    printed if None.
+    :return: Generator of PingObjectTuple.
+    """
+    rows = csv.reader(io.StringIO(text))
+    columns = CSV_COLUMNS
+    for row in rows:
+        if not row or row[0].lstrip().startswith("#"):
+            continue
+        cells = [cell.strip() for cell in row]
+        if "address" in cells and columns is CSV_COLUMNS:
+            columns = tuple(cells)
+            continue
+        settings = {}
+        try:
+            for column, cell in zip(columns, cells):
+                if column not in PingObjectTuple._fields or cell == "":
+                    continue
+                settings[column] = CSV_TYPES.get(column, str)(cell)
+        except ValueError as e:
+            message = "row " + str(rows.line_num) + ": " + str(e)
+            if skipped is None:
+                print("skipped " + message)
+            else:
+                skipped.append(message)
+            continue
+        if settings.get("address"):
+            yield template._replace(**settings)
+
+
+def parse_hosts(text, template):
+    """Parse targets of a file in the format of /etc/hosts, the address
+    followed by host names. The target is named by the first host name.
+    :param text:
+    :param template: PingObjectTuple with the other settings.
+    :return: Generator of PingObjectTuple.
+    """
+    for line in text.splitlines():
+        fields = line.split("#", 1)[0].split()
+        if not fields:
+            continue
+        name = fields[1] if len(fields) > 1 else ""
+        yield template._replace(name=name, address=fields[0])
+
+
+def parse_cidr(text, template):
+    """Targets for the hosts of a CIDR range, e.g. 192.168.1.0/24.
+    :param text:
+    :param template: PingObjectTuple with the other settings.
+    :return: Generator of PingObjectTuple.
+    :raise ValueError: If the range is invalid or has more than
+    MAX_RANGE_HOSTS hosts.
+    """
+    network = ipaddress.ip_network(text.strip(), strict=False)
+    if network.num_addresses > MAX_RANGE_HOSTS + 2:
+        raise ValueError(str(network) + " has more than " +
+                         str(MAX_RANGE_HOSTS) + " hosts")
+    for host in network.hosts():
+        yield template._replace(name="", address=str(host))
+
+
+PARSERS = {IMPORT_CSV: parse_csv, IMPORT_HOSTS: parse_hosts,
+           IMPORT_CIDR: parse_cidr}
+
+
+def kind_of_file(path):
+    """Return the import kind of a file by its name.
+    :param path:
+    :return: IMPORT_CSV or IMPORT_HOSTS.
+    """
+    if path.lower().endswith(".csv"):
+        return IMPORT_CSV
+    return IMPORT_HOSTS
+
+
+class Importer(object):
+    """Read targets in a background thread. The targets are handed over in
+    chunks, so the caller can add them step by step and show the progress.
+    Addresses already known or repeated in the source and invalid targets
+    are skipped, the reasons of the invalid ones are kept in skipped.
+    """
+    def __init__(self, kind, source, template, on_chunk, on_done,
+                 known_addresses=(), chunk_size=DEFAULT_CHUNK_SIZE):
+        """Initialize.
+        :param kind: IMPORT_CSV, IMPORT_HOSTS or IMPORT_CIDR.
+        :param source: Path of the file, the range for IMPORT_CIDR.
+        :param template: PingObjectTuple with the settings the source does
+        not set.
+        :param on_chunk: on_chunk(targets, fraction), called in the thread
+        with a list of PingObjectTuple and the fraction of the source read.
+        :param on_done: on_done(count, error, skipped), called in the thread
+        at the end with the number of targets, the error message or None and
+        the reasons of the skipped targets.
+        :param known_addresses: Addresses not imported again.
+        :param chunk_size: Targets per on_chunk call.
+        """
+        self.kind = kind
+        self.source = source
+        self.template = template
+        self.on_chunk = on_chunk
+        self.on_done = on_done
+        self.known_addresses = set(known_addresses)
+        self.chunk_size = chunk_size
+        # reasons of the invalid targets that were skipped
+        self.skipped = []
+        self.is_cancelled = False
+        self.thread = None
+
+    def start(self):
+        """Start the import thread.
+        :return:
+        """
+        self.thread = threading.Thread(target=self.run,
+                                       name="any_ping_import")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def cancel(self):
+        """Stop handing over targets, the thread ends at the next chunk.
+        :return:
+        """
+        self.is_cancelled = True
+
+    def run(self):
+        """Import thread.
+        :return:
+        """
+        count = 0
+        error = None
+        try:
+            if self.kind == IMPORT_CIDR:
+                text = self.source
+                total = ipaddress.ip_network(text.strip(),
+                                             strict=False).num_addresses
+            else:
+                with open(self.source, "r") as source_file:
+                    text = source_file.read()
+                total = max(1, text.count("\n") + 1)
+            chunk = []
+            read = 0
+            if self.kind == IMPORT_CSV:
+                targets = parse_csv(text, self.template, self.skipped)
+            else:
+                targets = PARSERS[self.kind](text, self.template)
+            for settings in targets:
+                if self.is_cancelled:
+                    break
+                read += 1
+                if settings.address in self.known_addresses:
+                    continue
+                try:
+                    config.validate(settings)
+                except ValueError as e:
+                    self.skipped.append(str(e))
+                    continue
+                self.known_addresses.add(settings.address)
+                chunk.append(settings)
+                if len(chunk) >= self.chunk_size:
+                    count += len(chunk)
+                    self.on_chunk(chunk, min(1.0, float(read) / total))
+                    chunk = []
+            if chunk and not self.is_cancelled:
+                count += len(chunk)
+                self.on_chunk(chunk, 1.0)
+        except (OSError, ValueError, csv.Error) as e:
+            error = str(e)
+        self.on_done(count, error, list(self.skipped))
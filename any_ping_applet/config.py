@@ -18,19 +18,59 @@
 
 import os
 import json
+import threading
 
-from .ping_containers import PingObjectTuple
+from .ping_containers import PingObjectTuple, BACKEND_SUBPROCESS, \
+    BACKEND_NATIVE, BACKEND_BATCH, INDICATOR_MODE_TARGETS, PROBE_ICMP, \
+    PROBE_TCP, PROBE_UDP, PROBE_HTTP
 
 __CONFIG_FILE_PATH = os.path.expanduser("~/.any_ping_applet")
 __AUTOSTART_FILE_PATH = os.path.expanduser("~/.config/autostart/")
 __AUTOSTART_FILE_NAME = "any_ping_applet.desktop"
 
+# version of the file format, 1 is the legacy layout with index keys
+CONFIG_VERSION = 2
+# seconds schedule_persist() waits to coalesce writes
+DEFAULT_PERSIST_DELAY = 1.0
+
+# content of the config file as last loaded or persisted
+__last_content = None
+# config waiting for the write by schedule_persist() and its timer
+__pending = None
+__pending_timer = None
+__pending_mutex = threading.Lock()
+# one write at a time
+__write_mutex = threading.Lock()
+
+is_loaded = False
 autostart_file_path = __AUTOSTART_FILE_PATH
 autostart_file_name = __AUTOSTART_FILE_NAME
 ping_object_tuples = []
+# ids of the targets, in the order of ping_object_tuples
+target_ids = []
 check_for_updates = True
 autostart = True
 ping_warning = 50.0
+max_concurrent_probes = 16
+history_size = 3600
+statistics_window = 300.0
+icon_cache_size = 64
+icon_directory = ""
+icon_directory_max_bytes = 4 * 1024 * 1024
+icon_refresh_rate = 4.0
+metrics_port = 0
+metrics_address = "127.0.0.1"
+timeseries_store = False
+timeseries_directory = ""
+indicator_mode = INDICATOR_MODE_TARGETS
+summary_top_k = 5
+dns_cache_ttl = 300.0
+schedule_jitter = 0.0
+overlap_probes = False
+config_reload = True
+
+# settings of a target missing in the config
+TARGET_DEFAULTS = PingObjectTuple("", "8.8.8.8", 1.0, 1, True, True, True)
 
 
 def __load():
@@ -38,55 +78,42 @@ def __load():
     :return:
     """
     global ping_object_tuples
+    global target_ids
     global check_for_updates
     global autostart
     global ping_warning
+    global max_concurrent_probes
+    global history_size
+    global statistics_window
+    global icon_cache_size
+    global icon_directory
+    global icon_directory_max_bytes
+    global icon_refresh_rate
+    global metrics_port
+    global metrics_address
+    global timeseries_store
+    global timeseries_directory
+    global indicator_mode
+    global summary_top_k
+    global dns_cache_ttl
+    global schedule_jitter
+    global overlap_probes
+    global config_reload
+    global __last_content
 
     if not os.path.isfile(__CONFIG_FILE_PATH):
         print("no such config file")
         ping_object_tuple = PingObjectTuple("", "8.8.8.8", 1.0, 1, True, True,
                                             True)
         ping_object_tuples.append(ping_object_tuple)
+        target_ids.append(0)
         return
 
-    with open(__CONFIG_FILE_PATH, 'r') as config_file:
-        config_dict = json.load(config_file)
-
-    counter = 0
-    while config_dict.get(str(counter)) is not None:
-        # print(config_dict.get(str(counter))["address"])
-        # print(type(config_dict.get(str(counter))))
-        config = config_dict.get(str(counter))
-        name = ""
-        if "name" in config:
-            name = config["name"]
-        address = "8.8.8.8"
-        if "address" in config:
-            address = config["address"]
-        update_rate = 1.0
-        if "update_rate" in config:
-            update_rate = config["update_rate"]
-        number_of_pings = 1
-        if "number_of_pings" in config:
-            number_of_pings = config["number_of_pings"]
-        show_indicator = True
-        if "show_indicator" in config:
-            show_indicator = config["show_indicator"]
-        is_activated = True
-        if "is_activated" in config:
-            is_activated = config["is_activated"]
-        show_text = True
-        if "show_text" in config:
-            show_text = config["show_text"]
-        ping_object_tuple = PingObjectTuple(name,
-                                            address,
-                                            update_rate,
-                                            number_of_pings,
-                                            show_indicator,
-                                            is_activated,
-                                            show_text)
-        ping_object_tuples.append(ping_object_tuple)
-        counter += 1
+    with open(__CONFIG_FILE_PATH, 'rb') as config_file:
+        __last_content = config_file.read()
+    config_dict = json.loads(__last_content.decode("utf-8"))
+
+    target_ids, ping_object_tuples = assign_ids(parse_targets(config_dict))
 
     check_for_updates = config_dict.get("check_for_updates", True)
 
@@ -94,6 +121,45 @@ def __load():
 
     ping_warning = config_dict.get("ping_warning", 50.0)
 
+    max_concurrent_probes = config_dict.get("max_concurrent_probes", 16)
+
+    history_size = config_dict.get("history_size", 3600)
+
+    statistics_window = config_dict.get("statistics_window", 300.0)
+
+    icon_cache_size = config_dict.get("icon_cache_size", 64)
+
+    icon_directory = config_dict.get("icon_directory", "")
+
+    icon_directory_max_bytes = config_dict.get("icon_directory_max_bytes",
+                                               4 * 1024 * 1024)
+
+    icon_refresh_rate = config_dict.get("icon_refresh_rate", 4.0)
+    if not isinstance(icon_refresh_rate, (int, float)) or \
+            isinstance(icon_refresh_rate, bool) or icon_refresh_rate <= 0:
+        print("invalid icon_refresh_rate: " + repr(icon_refresh_rate))
+        icon_refresh_rate = 4.0
+
+    metrics_port = config_dict.get("metrics_port", 0)
+
+    metrics_address = config_dict.get("metrics_address", "127.0.0.1")
+
+    timeseries_store = config_dict.get("timeseries_store", False)
+
+    timeseries_directory = config_dict.get("timeseries_directory", "")
+
+    indicator_mode = config_dict.get("indicator_mode", INDICATOR_MODE_TARGETS)
+
+    summary_top_k = config_dict.get("summary_top_k", 5)
+
+    dns_cache_ttl = config_dict.get("dns_cache_ttl", 300.0)
+
+    schedule_jitter = config_dict.get("schedule_jitter", 0.0)
+
+    overlap_probes = config_dict.get("overlap_probes", False)
+
+    config_reload = config_dict.get("config_reload", True)
+
     # global objects
     # global check_for_updates
     #
@@ -107,26 +173,248 @@ def __load():
     #     objects.append(ping_object)
 
 
-def persist():
-    """Write the config (json format) to file.
+def snapshot():
+    """Return the config as dictionary of the current file format.
     :return:
     """
-    b = []
+    targets = []
     for i in range(0, len(ping_object_tuples)):
-        a = [i, {"name": ping_object_tuples[i].name,
-                 "address": ping_object_tuples[i].address,
-                 "update_rate": ping_object_tuples[i].update_rate,
-                 "number_of_pings": ping_object_tuples[i].number_of_pings,
-                 "show_indicator": ping_object_tuples[i].show_indicator,
-                 "is_activated": ping_object_tuples[i].is_activated,
-                 "show_text": ping_object_tuples[i].show_text}]
-        b.append(a)
+        target = {"id": target_ids[i]}
+        target.update(zip(PingObjectTuple._fields, ping_object_tuples[i]))
+        targets.append(target)
+    b = [["version", CONFIG_VERSION], ["targets", targets]]
     b.append(["check_for_updates", check_for_updates])
     b.append(["autostart", autostart])
     b.append(["ping_warning", ping_warning])
-    # print(b)
-    with open(__CONFIG_FILE_PATH, 'w') as config_file:
-        json.dump(dict(b), config_file)
+    b.append(["max_concurrent_probes", max_concurrent_probes])
+    b.append(["history_size", history_size])
+    b.append(["statistics_window", statistics_window])
+    b.append(["icon_cache_size", icon_cache_size])
+    b.append(["icon_directory", icon_directory])
+    b.append(["icon_directory_max_bytes", icon_directory_max_bytes])
+    b.append(["icon_refresh_rate", icon_refresh_rate])
+    b.append(["metrics_port", metrics_port])
+    b.append(["metrics_address", metrics_address])
+    b.append(["timeseries_store", timeseries_store])
+    b.append(["timeseries_directory", timeseries_directory])
+    b.append(["indicator_mode", indicator_mode])
+    b.append(["summary_top_k", summary_top_k])
+    b.append(["dns_cache_ttl", dns_cache_ttl])
+    b.append(["schedule_jitter", schedule_jitter])
+    b.append(["overlap_probes", overlap_probes])
+    b.append(["config_reload", config_reload])
+    return dict(b)
+
+
+def write(config_dict):
+    """Write a config to file atomically: into a temporary file next to it,
+    which is renamed over the old file. A crash leaves either the old or the
+    new config.
+    :param config_dict:
+    :return:
+    """
+    global __last_content
+    content = json.dumps(config_dict).encode("utf-8")
+    temp_path = __CONFIG_FILE_PATH + ".tmp"
+    with __write_mutex:
+        with open(temp_path, 'wb') as config_file:
+            config_file.write(content)
+            config_file.flush()
+            os.fsync(config_file.fileno())
+        # the config watcher ignores the own write
+        __last_content = content
+        os.replace(temp_path, __CONFIG_FILE_PATH)
+
+
+def persist():
+    """Write the config (json format) to file now. A scheduled write is
+    replaced.
+    :return:
+    """
+    global __pending
+    global __pending_timer
+    with __pending_mutex:
+        __pending = None
+        if __pending_timer is not None:
+            __pending_timer.cancel()
+            __pending_timer = None
+    write(snapshot())
+
+
+def schedule_persist(delay=DEFAULT_PERSIST_DELAY):
+    """Write the config to file in a background thread after delay seconds.
+    The config is taken now, calls until the write coalesce into it.
+    :param delay:
+    :return:
+    """
+    global __pending
+    global __pending_timer
+    with __pending_mutex:
+        __pending = snapshot()
+        if __pending_timer is None:
+            __pending_timer = threading.Timer(delay, __write_pending)
+            __pending_timer.daemon = True
+            __pending_timer.start()
+
+
+def __write_pending():
+    """Timer of schedule_persist().
+    :return:
+    """
+    global __pending
+    global __pending_timer
+    with __pending_mutex:
+        config_dict = __pending
+        __pending = None
+        __pending_timer = None
+    if config_dict is not None:
+        try:
+            write(config_dict)
+        except OSError as e:
+            print(e)
+
+
+def file_path():
+    """Return the path of the config file.
+    :return:
+    """
+    return __CONFIG_FILE_PATH
+
+
+def parse_target(entry):
+    """Parse the settings of a target, missing keys get their defaults.
+    :param entry: Dictionary.
+    :return: PingObjectTuple.
+    """
+    return PingObjectTuple(*[entry.get(field, default) for field, default
+                             in zip(PingObjectTuple._fields,
+                                    TARGET_DEFAULTS)])
+
+
+def parse_targets(config_dict):
+    """Parse the targets of the config. The legacy layout (one key per index,
+    "0", "1", ...) is migrated, its targets get their index as id.
+    :param config_dict: Parsed config file.
+    :return: List of (id, PingObjectTuple), id None if missing or already
+    used.
+    """
+    if "targets" not in config_dict:
+        entries = []
+        while str(len(entries)) in config_dict:
+            entries.append((len(entries),
+                            parse_target(config_dict[str(len(entries))])))
+        return entries
+    if config_dict.get("version", CONFIG_VERSION) > CONFIG_VERSION:
+        print("config version " + str(config_dict["version"]) +
+              " is newer than " + str(CONFIG_VERSION))
+    entries = []
+    ids = set()
+    for entry in config_dict["targets"]:
+        id = entry.get("id")
+        if not isinstance(id, int) or isinstance(id, bool) or id < 0 or \
+                id in ids:
+            id = None
+        else:
+            ids.add(id)
+        entries.append((id, parse_target(entry)))
+    return entries
+
 
+def assign_ids(entries):
+    """Give the entries without id an unused one.
+    :param entries: List of (id, PingObjectTuple).
+    :return: Tuple (list of ids, list of PingObjectTuple).
+    """
+    next_id = max([id for id, _ in entries if id is not None] + [-1]) + 1
+    ids = []
+    for id, _ in entries:
+        if id is None:
+            id = next_id
+            next_id += 1
+        ids.append(id)
+    return ids, [settings for _, settings in entries]
+
+
+def validate(ping_object_tuple):
+    """Check the settings of a target.
+    :param ping_object_tuple:
+    :return:
+    :raise ValueError: If a setting is invalid.
+    """
+    t = ping_object_tuple
+    if not isinstance(t.address, str) or not t.address:
+        raise ValueError("invalid address: " + repr(t.address))
+    for name in ("update_rate", "min_update_rate", "max_update_rate"):
+        value = getattr(t, name)
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or \
+                value <= 0:
+            raise ValueError(t.address + ": invalid " + name + ": " +
+                             repr(value))
+    if t.min_update_rate > t.max_update_rate:
+        raise ValueError(t.address + ": min_update_rate > max_update_rate")
+    if not isinstance(t.number_of_pings, int) or t.number_of_pings < 1:
+        raise ValueError(t.address + ": invalid number_of_pings: " +
+                         repr(t.number_of_pings))
+    if t.backend not in (BACKEND_SUBPROCESS, BACKEND_NATIVE, BACKEND_BATCH):
+        raise ValueError(t.address + ": invalid backend: " + repr(t.backend))
+    if t.probe_type not in (PROBE_ICMP, PROBE_TCP, PROBE_UDP, PROBE_HTTP):
+        raise ValueError(t.address + ": invalid probe_type: " +
+                         repr(t.probe_type))
+    if not isinstance(t.port, int) or not 0 <= t.port <= 65535:
+        raise ValueError(t.address + ": invalid port: " + repr(t.port))
+
+
+def reload():
+    """Read the config file again, without changing the loaded config. A
+    content equal to the last loaded, applied or persisted one, e.g. after
+    persist(), is ignored. The content counts as changed until the caller
+    passes it to applied().
+    :return: Tuple (list of (id, PingObjectTuple), ping warning, content),
+    None if the content did not change. The id is None if the target has
+    none.
+    :raise OSError: If the file cannot be read.
+    :raise ValueError: If the file is no valid config.
+    """
+    with open(__CONFIG_FILE_PATH, 'rb') as config_file:
+        content = config_file.read()
+    if content == __last_content:
+        return None
+    config_dict = json.loads(content.decode("utf-8"))
+    if not isinstance(config_dict, dict):
+        raise ValueError("no JSON object")
+    try:
+        targets = parse_targets(config_dict)
+    except (TypeError, AttributeError) as e:
+        # a target is no JSON object
+        raise ValueError(str(e))
+    if not targets:
+        raise ValueError("no targets")
+    for _, target in targets:
+        validate(target)
+    ping_warning = config_dict.get("ping_warning", 50.0)
+    if not isinstance(ping_warning, (int, float)):
+        raise ValueError("invalid ping_warning: " + repr(ping_warning))
+    return targets, ping_warning, content
 
-__load()
+
+def applied(content):
+    """Record the content of a reload() as applied, reload() ignores it
+    from now on.
+    :param content:
+    :return:
+    """
+    global __last_content
+    with __write_mutex:
+        __last_content = content
+
+
+def load():
+    """Load the config once. Called by the entry points instead of at import
+    time.
+    :return:
+    """
+    global is_loaded
+    if is_loaded:
+        return
+    is_loaded = True
+    __load()
@@ -0,0 +1,194 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+import time
+
+# seconds without further change before the file is read again
+DEFAULT_DEBOUNCE = 0.5
+# seconds between two stats of the file if inotify is not available
+DEFAULT_POLL_INTERVAL = 2.0
+
+# inotify flags, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event without the name
+_EVENT = struct.Struct("iIII")
+
+
+class Inotify(object):
+    """inotify instance watching the entries of one directory, bound with
+    ctypes. Editors often replace a file by renaming a new one over it, so
+    the directory is watched instead of the file.
+    """
+    def __init__(self, directory):
+        """Initialize.
+        :param directory:
+        :raise OSError: If inotify is not available.
+        """
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify not available")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | \
+            IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, "inotify_add_watch failed: " + directory)
+
+    def fileno(self):
+        return self.fd
+
+    def read(self):
+        """Read the pending events.
+        :return: Set of the names of the changed entries.
+        """
+        names = set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, _, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ConfigWatcher(object):
+    """Call back when a file changed. A background thread waits for inotify
+    events of the file, or compares its stat every poll_interval seconds if
+    inotify is not available. The callback runs in that thread once the
+    file did not change for debounce seconds, so a burst of writes causes a
+    single call.
+    """
+    def __init__(self, path, callback, debounce=DEFAULT_DEBOUNCE,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        """Initialize.
+        :param path: Path of the file.
+        :param callback: callback(), called in the watcher thread.
+        :param debounce: Seconds of quiet before the callback.
+        :param poll_interval: Seconds between two stats without inotify.
+        """
+        self.path = os.path.abspath(path)
+        self.callback = callback
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.thread = None
+        self.stop_event = threading.Event()
+        # written to wake up the thread on stop
+        self.wakeup = None
+
+    def start(self):
+        """Start the watcher thread.
+        :return:
+        """
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.wakeup = os.pipe()
+        self.thread = threading.Thread(target=self.run,
+                                       name="any_ping_config_watcher")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop the watcher thread.
+        :return:
+        """
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        os.write(self.wakeup[1], b"\0")
+        self.thread.join()
+        self.thread = None
+        for fd in self.wakeup:
+            os.close(fd)
+        self.wakeup = None
+
+    def stat(self):
+        """Return what identifies a version of the file.
+        :return: Tuple (inode, size, mtime in ns), None if it is missing.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def run(self):
+        """Watcher thread.
+        :return:
+        """
+        directory, name = os.path.split(self.path)
+        inotify = None
+        try:
+            inotify = Inotify(directory)
+        except (OSError, AttributeError, TypeError) as e:
+            print("config watcher falls back to polling: " + str(e))
+        last_stat = self.stat()
+        # monotonic time of the next callback, None if nothing changed
+        due = None
+        try:
+            while not self.stop_event.is_set():
+                timeout = self.poll_interval
+                if due is not None:
+                    timeout = max(0.0, due - time.monotonic())
+                sources = [self.wakeup[0]]
+                if inotify is not None:
+                    sources.append(inotify)
+                readable, _, _ = select.select(sources, [], [], timeout)
+                if self.stop_event.is_set():
+                    break
+                if inotify is not None:
+                    if inotify in readable and name in inotify.read():
+                        due = time.monotonic() + self.debounce
+                else:
+                    stat = self.stat()
+                    if stat != last_stat:
+                        last_stat = stat
+                        due = time.monotonic() + self.debounce
+                if due is not None and time.monotonic() >= due:
+                    due = None
+                    try:
+                        self.callback()
+                    except Exception as e:
+                        print(e)
+        finally:
+            if inotify is not None:
+                inotify.close()
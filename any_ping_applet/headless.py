@@ -0,0 +1,299 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import errno
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from . import config
+from . import history
+from . import reconfigure
+from . import resolver
+from . import scheduler
+from .ping_target import PingTarget
+
+
+def window_record(target, window):
+    """Return the JSON serializable statistics of the target's history.
+    :param target: PingTarget.
+    :param window: Seconds of the history.
+    :return: None if the window is empty.
+    """
+    statistics = target.history.statistics(window)
+    if statistics is None:
+        return None
+    record = statistics._asdict()
+    record["seconds"] = window
+    return record
+
+
+def result_record(target, window=history.DEFAULT_STATISTICS_WINDOW):
+    """Return the JSON serializable record of the target's latest result.
+    :param target: PingTarget.
+    :param window: Seconds of the history the window statistics cover.
+    :return:
+    """
+    return {
+        "time": time.time(),
+        "id": target.id,
+        "name": target.name,
+        "address": target.address,
+        "status": target.status_name(),
+        "result": target.result.result,
+        "min": target.result.min,
+        "avg": target.result.avg,
+        "max": target.result.max,
+        "loss": target.result.loss,
+        "resolve_ms": target.resolve_latency,
+        "interval": target.effective_update_rate,
+        "window": window_record(target, window)
+    }
+
+
+class StreamPublisher(object):
+    """Write one JSON line per result to a stream (stdout).
+    """
+    def __init__(self, stream):
+        """Initialize.
+        :param stream:
+        """
+        self.stream = stream
+        self.mutex = threading.Lock()
+
+    def publish(self, line):
+        """Write the line.
+        :param line: Bytes, terminated by a newline.
+        :return:
+        """
+        with self.mutex:
+            self.stream.write(line.decode("utf-8"))
+            self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class SocketPublisher(object):
+    """Send one JSON line per result to every client connected to a unix
+    domain socket. Clients that do not keep up are disconnected.
+    """
+    def __init__(self, path):
+        """Initialize and start accepting clients.
+        :param path: Path of the unix domain socket.
+        """
+        self.path = path
+        try:
+            os.remove(path)
+        except OSError as exception:
+            if exception.errno != errno.ENOENT:
+                raise
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(8)
+        self.clients = []
+        self.mutex = threading.Lock()
+        self.thread = threading.Thread(target=self.accept,
+                                       name="any_ping_socket")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def accept(self):
+        """Accept clients until the server socket is closed.
+        :return:
+        """
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                return
+            client.settimeout(1.0)
+            with self.mutex:
+                self.clients.append(client)
+
+    def publish(self, line):
+        """Send the line to all clients.
+        :param line: Bytes, terminated by a newline.
+        :return:
+        """
+        with self.mutex:
+            for client in list(self.clients):
+                try:
+                    client.sendall(line)
+                except OSError:
+                    client.close()
+                    self.clients.remove(client)
+
+    def close(self):
+        """Close the server and all clients.
+        :return:
+        """
+        self.server.close()
+        with self.mutex:
+            for client in self.clients:
+                client.close()
+            self.clients = []
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class HeadlessDaemon(object):
+    """Probe all targets of the config without a display and publish every
+    result as JSON line.
+    """
+    def __init__(self, publisher):
+        """Initialize.
+        :param publisher: StreamPublisher or SocketPublisher.
+        """
+        self.publisher = publisher
+        self.stop_event = threading.Event()
+        # limit the number of probes in flight
+        scheduler.configure(config.max_concurrent_probes,
+                            config.schedule_jitter, config.overlap_probes)
+        # resolved addresses are cached
+        resolver.configure(config.dns_cache_ttl)
+        # samples kept per target
+        history.set_default_capacity(config.history_size)
+        self.ping_targets = []
+        count = 0
+        for item in config.ping_object_tuples:
+            target = PingTarget.from_settings(config.target_ids[count],
+                                              item)
+            target.set_ping_warning(config.ping_warning)
+            target.add_listener(self.publish)
+            self.ping_targets.append(target)
+            count += 1
+        # prometheus endpoint, started if a port is configured
+        self.metrics_exporter = None
+        if config.metrics_port:
+            from .metrics_exporter import MetricsExporter
+            self.metrics_exporter = MetricsExporter(
+                config.metrics_port, config.metrics_address,
+                window=config.statistics_window)
+            self.metrics_exporter.set_targets(self.ping_targets)
+        # on-disk history of the results
+        self.timeseries_store = None
+        if config.timeseries_store:
+            from .timeseries import TimeSeriesStore
+            self.timeseries_store = TimeSeriesStore(
+                config.timeseries_directory)
+            self.timeseries_store.set_targets(self.ping_targets)
+        # reloads the config file when it changes
+        self.config_watcher = None
+        if config.config_reload:
+            from .config_watcher import ConfigWatcher
+            self.config_watcher = ConfigWatcher(config.file_path(),
+                                                self.on_config_changed)
+
+    def on_config_changed(self):
+        """Called by the config watcher thread when the config file changed.
+        Apply its targets as minimal change of the running targets.
+        :return:
+        """
+        try:
+            reloaded = config.reload()
+        except (OSError, ValueError) as e:
+            print("config not reloaded: " + str(e))
+            return
+        if reloaded is None:
+            return
+        entries, ping_warning, content = reloaded
+        changes = reconfigure.diff(
+            self.ping_targets,
+            reconfigure.match(self.ping_targets, entries),
+            PingTarget.from_settings)
+        reconfigure.apply(changes, ping_warning)
+        config.ping_object_tuples = [target.settings()
+                                     for target in changes.targets]
+        config.target_ids = [target.id for target in changes.targets]
+        config.ping_warning = ping_warning
+        self.ping_targets = changes.targets
+        reconfigure.update_sinks(
+            (self.metrics_exporter, self.timeseries_store),
+            self.ping_targets, changes.relabeled)
+        for target in changes.removed:
+            target.remove_listener(self.publish)
+        for target in changes.added:
+            target.add_listener(self.publish)
+            if target.is_activated:
+                target.start()
+        config.applied(content)
+
+    def publish(self, target):
+        """Publish the result of a target.
+        :param target:
+        :return:
+        """
+        self.publisher.publish(
+            json.dumps(result_record(target, config.statistics_window))
+            .encode("utf-8") + b"\n")
+
+    def run(self):
+        """Probe until SIGINT or SIGTERM.
+        :return:
+        """
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.start()
+        if self.timeseries_store is not None:
+            self.timeseries_store.start()
+        for target in self.ping_targets:
+            if target.is_activated:
+                target.start()
+        if self.config_watcher is not None:
+            self.config_watcher.start()
+        self.stop_event.wait()
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+        for target in self.ping_targets:
+            target.stop()
+        scheduler.default_scheduler().shutdown()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        if self.timeseries_store is not None:
+            self.timeseries_store.close()
+        self.publisher.close()
+
+    def stop(self, *_):
+        """Stop run(), usable as signal handler.
+        :return:
+        """
+        self.stop_event.set()
+
+
+def main(socket_path=None):
+    """Entry point of any_ping_applet --headless.
+    :param socket_path: Publish to this unix domain socket instead of stdout.
+    :return:
+    """
+    config.load()
+    if socket_path:
+        publisher = SocketPublisher(socket_path)
+    else:
+        publisher = StreamPublisher(sys.stdout)
+        # keep diagnostic output out of the result stream
+        sys.stdout = sys.stderr
+    daemon = HeadlessDaemon(publisher)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    daemon.run()
@@ -0,0 +1,196 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import math
+import threading
+import time
+
+from array import array
+from collections import namedtuple
+
+from .ping_containers import PingStruct, RESULT_OK, RESULT_PARTIAL, \
+    RESULT_FAILED
+
+DEFAULT_CAPACITY = 3600
+# seconds of the window the statistics are published for
+DEFAULT_STATISTICS_WINDOW = 300.0
+
+HistoryStatistics = namedtuple("HistoryStatistics", "count "
+                                                    "loss_rate "
+                                                    "mean "
+                                                    "stddev "
+                                                    "p50 "
+                                                    "p95 "
+                                                    "p99 "
+                                                    "jitter")
+
+__default_capacity = DEFAULT_CAPACITY
+
+
+def set_default_capacity(capacity):
+    """Set the capacity of histories created without an explicit capacity.
+    :param capacity: Number of samples.
+    :return:
+    """
+    global __default_capacity
+    __default_capacity = max(1, int(capacity))
+
+
+def default_capacity():
+    """Return the capacity of histories created without an explicit capacity.
+    :return:
+    """
+    return __default_capacity
+
+
+def summarize(samples):
+    """Summarize round trip times as PingStruct.
+    :param samples: Round trip times in ms, None for lost packets.
+    :return: PingStruct.
+    """
+    rtts = [rtt for rtt in samples if rtt is not None]
+    if not rtts:
+        return PingStruct(RESULT_FAILED, 0.0, 0.0, 0.0, 100.0)
+    loss = 100.0 * (len(samples) - len(rtts)) / len(samples)
+    result = RESULT_OK if len(rtts) == len(samples) else RESULT_PARTIAL
+    return PingStruct(result, min(rtts), max(rtts), sum(rtts) / len(rtts),
+                      loss)
+
+
+def percentile(sorted_values, p):
+    """Percentile with linear interpolation.
+    :param sorted_values: Non empty, sorted list.
+    :param p: Percentile in [0, 100].
+    :return:
+    """
+    position = (len(sorted_values) - 1) * p / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] * (1.0 - fraction) + \
+        sorted_values[upper] * fraction
+
+
+class RttHistory(object):
+    """Fixed capacity ring buffer of round trip times. Timestamps and round
+    trip times live in preallocated arrays, lost packets in a bitmap, so the
+    memory per target is fixed (17 bytes and one bit per sample) no matter how
+    long the applet runs. Appending is O(1), statistics are computed over the
+    samples of the requested window only.
+    """
+    def __init__(self, capacity=None):
+        """Initialize.
+        :param capacity: Number of samples, default_capacity() if None.
+        """
+        if capacity is None:
+            capacity = default_capacity()
+        self.capacity = max(1, int(capacity))
+        self.timestamps = array('d', bytes(8 * self.capacity))
+        self.rtts = array('d', bytes(8 * self.capacity))
+        self.lost = bytearray((self.capacity + 7) // 8)
+        # index of the next sample to write
+        self.head = 0
+        self.count = 0
+        self.mutex = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, rtt, timestamp=None):
+        """Add a sample, overwrite the oldest one if the buffer is full.
+        :param rtt: Round trip time in ms, None for a lost packet.
+        :param timestamp: Seconds since the epoch, now if None.
+        :return:
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self.mutex:
+            index = self.head
+            self.timestamps[index] = timestamp
+            byte, bit = index >> 3, 1 << (index & 7)
+            if rtt is None:
+                self.rtts[index] = 0.0
+                self.lost[byte] |= bit
+            else:
+                self.rtts[index] = rtt
+                self.lost[byte] &= ~bit & 0xFF
+            self.head = (index + 1) % self.capacity
+            if self.count < self.capacity:
+                self.count += 1
+
+    def extend(self, samples, timestamp=None):
+        """Add several samples with the same timestamp.
+        :param samples: Round trip times in ms, None for lost packets.
+        :param timestamp: Seconds since the epoch, now if None.
+        :return:
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        for rtt in samples:
+            self.append(rtt, timestamp)
+
+    def window(self, seconds=None, now=None):
+        """Return the samples of the window in chronological order.
+        :param seconds: Length of the window, all samples if None.
+        :param now: End of the window, now if None.
+        :return: Tuple (list of round trip times, number of lost packets).
+        """
+        if now is None:
+            now = time.time()
+        start = None if seconds is None else now - seconds
+        rtts = []
+        lost = 0
+        with self.mutex:
+            index = self.head
+            for _ in range(0, self.count):
+                index = (index - 1) % self.capacity
+                if start is not None and self.timestamps[index] < start:
+                    break
+                if self.lost[index >> 3] & (1 << (index & 7)):
+                    lost += 1
+                else:
+                    rtts.append(self.rtts[index])
+        rtts.reverse()
+        return rtts, lost
+
+    def statistics(self, seconds=None, now=None):
+        """Compute the statistics of the window.
+        :param seconds: Length of the window, all samples if None.
+        :param now: End of the window, now if None.
+        :return: HistoryStatistics, None if the window is empty.
+        """
+        rtts, lost = self.window(seconds, now)
+        count = len(rtts) + lost
+        if count == 0:
+            return None
+        loss_rate = float(lost) / count
+        if not rtts:
+            return HistoryStatistics(count, loss_rate, 0.0, 0.0, 0.0, 0.0,
+                                     0.0, 0.0)
+        mean = sum(rtts) / len(rtts)
+        stddev = math.sqrt(sum((rtt - mean) ** 2 for rtt in rtts) / len(rtts))
+        # interarrival jitter estimate of RFC 3550, section 6.4.1
+        jitter = 0.0
+        for i in range(1, len(rtts)):
+            jitter += (abs(rtts[i] - rtts[i - 1]) - jitter) / 16.0
+        sorted_rtts = sorted(rtts)
+        return HistoryStatistics(count, loss_rate, mean, stddev,
+                                 percentile(sorted_rtts, 50.0),
+                                 percentile(sorted_rtts, 95.0),
+                                 percentile(sorted_rtts, 99.0),
+                                 jitter)
@@ -0,0 +1,268 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import errno
+import os
+import select
+import socket
+import struct
+import threading
+import time
+
+from .history import summarize
+from .ping_containers import PingStruct, RESULT_NO_RESPONSE
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP6_ECHO_REQUEST = 128
+ICMP6_ECHO_REPLY = 129
+
+IPPROTO_ICMPV6 = getattr(socket, "IPPROTO_ICMPV6", 58)
+
+_HEADER = struct.Struct("!BBHHH")
+_TIMESTAMP = struct.Struct("!d")
+_PAYLOAD_PADDING = b"any_ping_applet!" * 3
+
+
+class IcmpSocketError(Exception):
+    """Raised if neither an unprivileged (datagram) nor a raw ICMP socket can
+    be opened.
+    """
+    pass
+
+
+def checksum(data):
+    """Internet checksum (RFC 1071) of the given bytes.
+    :param data:
+    :return:
+    """
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack("!%dH" % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def open_socket(family):
+    """Open an ICMP socket for the given address family. Prefer the
+    unprivileged datagram socket (net.ipv4.ping_group_range) and fall back to a
+    raw socket if the process has the privileges for it.
+    :param family: socket.AF_INET or socket.AF_INET6.
+    :return: Tuple (socket, is_raw).
+    """
+    proto = socket.IPPROTO_ICMP if family == socket.AF_INET else \
+        IPPROTO_ICMPV6
+    errors = []
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(family, sock_type, proto)
+        except OSError as e:
+            errors.append(e)
+            continue
+        sock.setblocking(False)
+        return sock, sock_type == socket.SOCK_RAW
+    raise IcmpSocketError("cannot open ICMP socket: " +
+                          ", ".join(str(e) for e in errors))
+
+
+class IcmpProber(object):
+    """In-process ICMP echo prober. Fills the same PingStruct as the ping
+    subprocess without starting a process. Sockets are opened lazily per
+    address family and reused for every probe. Probes may overlap: one of
+    the waiting threads reads the socket at a time and hands every reply to
+    the waiter of its sequence number.
+    """
+    def __init__(self):
+        """Initialize.
+        """
+        self.identifier = os.getpid() & 0xFFFF
+        self.sequence = 0
+        # family -> (socket, is_raw)
+        self.sockets = {}
+        self.mutex = threading.Lock()
+        # sequence -> [source address, time received or None] of the echo
+        # requests waiting for their reply
+        self.waiters = {}
+        # set while a thread reads the socket of the family
+        self.readers = set()
+        self.condition = threading.Condition()
+
+    def close(self):
+        """Close all open sockets.
+        :return:
+        """
+        with self.mutex:
+            for sock, _ in self.sockets.values():
+                sock.close()
+            self.sockets = {}
+
+    def get_socket(self, family):
+        """Return the (socket, is_raw) tuple for the family, open it if needed.
+        :param family:
+        :return:
+        """
+        with self.mutex:
+            if family not in self.sockets:
+                self.sockets[family] = open_socket(family)
+            return self.sockets[family]
+
+    def next_sequence(self):
+        """Return the next echo sequence number.
+        :return:
+        """
+        with self.mutex:
+            self.sequence = (self.sequence + 1) & 0xFFFF
+            return self.sequence
+
+    def ping(self, address, count=1, timeout=1.0):
+        """Send count echo requests one after another and wait up to timeout
+        seconds for every reply.
+        :param address: Host name or IP address.
+        :param count: Number of echo requests.
+        :param timeout: Seconds to wait for each reply.
+        :return: PingStruct(result, min, max, avg, loss).
+        """
+        return self.ping_samples(address, count, timeout)[0]
+
+    def ping_samples(self, address, count=1, timeout=1.0):
+        """Like ping(), but return the round trip time of every echo request
+        as well.
+        :param address: Host name or IP address.
+        :param count: Number of echo requests.
+        :param timeout: Seconds to wait for each reply.
+        :return: Tuple (PingStruct, list of round trip times in ms, None for
+        lost packets).
+        """
+        try:
+            info = socket.getaddrinfo(address, None, 0, socket.SOCK_DGRAM)[0]
+        except (socket.gaierror, UnicodeError):
+            return PingStruct(RESULT_NO_RESPONSE, 0.0, 0.0, 0.0, 0.0), []
+        family, sockaddr = info[0], info[4]
+        sock, is_raw = self.get_socket(family)
+        samples = []
+        for _ in range(0, count):
+            try:
+                rtt = self.echo(sock, is_raw, family, sockaddr, timeout)
+            except OSError as e:
+                if e.errno in (errno.ENETUNREACH, errno.EHOSTUNREACH,
+                               errno.EADDRNOTAVAIL):
+                    return PingStruct(RESULT_NO_RESPONSE, 0.0, 0.0, 0.0,
+                                      0.0), []
+                raise
+            samples.append(rtt)
+        return summarize(samples), samples
+
+    def echo(self, sock, is_raw, family, sockaddr, timeout):
+        """Send one echo request and wait for the matching reply.
+        :return: Round trip time in ms or None on timeout.
+        """
+        if family == socket.AF_INET:
+            request_type = ICMP_ECHO_REQUEST
+        else:
+            request_type = ICMP6_ECHO_REQUEST
+        sequence = self.next_sequence()
+        with self.condition:
+            self.waiters[sequence] = [sockaddr[0], None]
+        try:
+            time_sent = time.monotonic()
+            payload = _TIMESTAMP.pack(time_sent) + _PAYLOAD_PADDING
+            header = _HEADER.pack(request_type, 0, 0, self.identifier,
+                                  sequence)
+            # the kernel computes the ICMPv6 checksum itself
+            if family == socket.AF_INET:
+                header = _HEADER.pack(request_type, 0,
+                                      checksum(header + payload),
+                                      self.identifier, sequence)
+            sock.sendto(header + payload, sockaddr)
+            time_received = self.wait_reply(sock, is_raw, family, sequence,
+                                            time_sent + timeout)
+        finally:
+            with self.condition:
+                del self.waiters[sequence]
+        if time_received is None:
+            return None
+        return (time_received - time_sent) * 1000.0
+
+    def wait_reply(self, sock, is_raw, family, sequence, deadline):
+        """Wait for the reply of an echo request. If no other thread reads
+        the socket this one does, until its own reply arrived.
+        :param sock:
+        :param is_raw:
+        :param family:
+        :param sequence:
+        :param deadline: time.monotonic() deadline.
+        :return: time.monotonic() of the reply, None on timeout.
+        """
+        while True:
+            with self.condition:
+                time_received = self.waiters[sequence][1]
+                if time_received is not None:
+                    return time_received
+                remaining = deadline - time.monotonic()
+                if remaining <= 0.0:
+                    return None
+                if family in self.readers:
+                    self.condition.wait(remaining)
+                    continue
+                self.readers.add(family)
+            replies = []
+            try:
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if readable:
+                    replies = self.receive(sock, is_raw, family)
+            finally:
+                with self.condition:
+                    self.readers.discard(family)
+                    for reply_sequence, source, reply_time in replies:
+                        waiter = self.waiters.get(reply_sequence)
+                        if waiter is not None and waiter[0] == source and \
+                                waiter[1] is None:
+                            waiter[1] = reply_time
+                    self.condition.notify_all()
+
+    def receive(self, sock, is_raw, family):
+        """Read the echo replies queued on the socket.
+        :param sock:
+        :param is_raw:
+        :param family:
+        :return: List of (sequence, source address, time.monotonic()).
+        """
+        reply_type = ICMP_ECHO_REPLY if family == socket.AF_INET \
+            else ICMP6_ECHO_REPLY
+        replies = []
+        while True:
+            try:
+                packet, source = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return replies
+            time_received = time.monotonic()
+            # raw IPv4 sockets deliver the IP header as well
+            if is_raw and family == socket.AF_INET:
+                packet = packet[(packet[0] & 0x0F) * 4:]
+            if len(packet) < _HEADER.size + _TIMESTAMP.size:
+                continue
+            icmp_type, _, _, identifier, reply_sequence = \
+                _HEADER.unpack_from(packet)
+            if icmp_type != reply_type:
+                continue
+            # datagram sockets rewrite the identifier, raw sockets see every
+            # echo reply of the host
+            if is_raw and identifier != self.identifier:
+                continue
+            replies.append((reply_sequence, source[0], time_received))
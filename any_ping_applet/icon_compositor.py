@@ -0,0 +1,182 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import copy
+import threading
+
+from collections import OrderedDict
+
+from . import resource
+
+DEFAULT_CACHE_SIZE = 64
+
+CHARACTER_WIDTH = 55
+DISK_WIDTH = 135
+
+# characters of a count in the summary icon, larger counts are capped
+SUMMARY_DIGITS = 3
+# status icons of the summary icon, see status_summary.SEVERITY
+SUMMARY_ICONS = ("icon_red", "icon_orange", "icon_green")
+
+
+class IconCompositor(object):
+    """Compose the indicator icon from the status icons of the ping objects.
+    The status icons of a theme are parsed once, the composed icons are
+    memoized by their signature (visible icons and labels) in a LRU cache.
+    """
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE):
+        """Initialize.
+        :param cache_size: Maximum number of composed icons kept.
+        """
+        self.cache_size = max(1, int(cache_size))
+        # (theme, icon name) -> children of the parsed svg root
+        self.fragments = {}
+        # signature -> svg bytes
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.mutex = threading.Lock()
+
+    @staticmethod
+    def signature(list_of_icon_tuple, theme):
+        """Return the part of the icon tuples that determines the icon.
+        :param list_of_icon_tuple:
+        :param theme:
+        :return: Hashable signature, None if no status is shown.
+        """
+        visible = tuple((item.icon, item.name if item.show_text else None)
+                        for item in list_of_icon_tuple if item.show_indicator)
+        if not visible:
+            return None
+        return theme, visible
+
+    def compose(self, list_of_icon_tuple, theme):
+        """Return the composed icon.
+        :param list_of_icon_tuple:
+        :param theme:
+        :return: SVG bytes, None if no status is shown.
+        """
+        return self.compose_signature(
+            self.signature(list_of_icon_tuple, theme))
+
+    @staticmethod
+    def summary_signature(counts, theme):
+        """Return the signature of the fixed-size summary icon, one disk per
+        status followed by its count.
+        :param counts: Number of ping objects per status, in the order of
+        status_summary.SEVERITY.
+        :param theme:
+        :return: Hashable signature, None if no status but grey (inactive) is
+        shown.
+        """
+        if not sum(counts[:len(SUMMARY_ICONS)]):
+            return None
+        cap = 10 ** SUMMARY_DIGITS - 1
+        # pad the counts, the width of the icon depends on the label length
+        visible = tuple((icon, str(min(count, cap)).ljust(SUMMARY_DIGITS))
+                        for icon, count in zip(SUMMARY_ICONS, counts))
+        return theme, visible
+
+    def compose_summary(self, counts, theme):
+        """Return the summary icon.
+        :param counts: Number of ping objects per status, in the order of
+        status_summary.SEVERITY.
+        :param theme:
+        :return: SVG bytes, None if no status but grey (inactive) is shown.
+        """
+        return self.compose_signature(self.summary_signature(counts, theme))
+
+    def compose_signature(self, signature):
+        """Return the icon of a signature, rendered or from the cache.
+        :param signature:
+        :return: SVG bytes, None if the signature is None.
+        """
+        if signature is None:
+            return None
+        with self.mutex:
+            svg = self.cache.get(signature)
+            if svg is not None:
+                self.cache.move_to_end(signature)
+                self.hits += 1
+                return svg
+            self.misses += 1
+            svg = self.render(signature)
+            self.cache[signature] = svg
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return svg
+
+    def fragment(self, theme, icon):
+        """Return a copy of the parsed status icon.
+        :param theme:
+        :param icon: Icon name, e.g. icon_green.
+        :return: svgutils GroupElement.
+        """
+        # svgutils is imported on first use, it is slow to import
+        import svgutils.transform as sg
+        key = (theme, icon)
+        if key not in self.fragments:
+            figure = sg.fromfile(resource.image_path(icon, theme))
+            self.fragments[key] = figure.root.getchildren()
+        return sg.GroupElement([copy.deepcopy(child)
+                                for child in self.fragments[key]])
+
+    def render(self, signature):
+        """Render the icon of a signature.
+        :param signature:
+        :return: SVG bytes.
+        """
+        import svgutils.transform as sg
+        theme, visible = signature
+        # count how many characters are required
+        char_count = sum(len(name) for _, name in visible if name is not None)
+        # create new SVG figure
+        width = len(visible) * DISK_WIDTH + char_count * CHARACTER_WIDTH
+        fig = sg.SVGFigure(str(width) + "px", "128px")
+        # generate the plots and texts
+        plots = []
+        texts = []
+        txt_position = 0
+        disk_position = 0
+        for icon, name in visible:
+            # get the name length
+            txt_length = 0
+            if name is not None:
+                txt_length = len(name) * CHARACTER_WIDTH
+            # get the plot
+            plot = self.fragment(theme, icon)
+            plot.moveto(disk_position, 0, scale=1.0)
+            # add the plot to the list
+            plots.append(plot)
+            # update next disk position
+            disk_position += DISK_WIDTH + txt_length
+            # update text position
+            txt_position += DISK_WIDTH
+            # generate text element
+            if name is not None:
+                txt = sg.TextElement(txt_position, 100, name, size=90,
+                                     weight="regular", font="Courier",
+                                     color="white")
+                # add the text to the list
+                texts.append(txt)
+            # update text position
+            txt_position += txt_length
+        # append plots and labels to figure
+        fig.append(plots)
+        fig.append(texts)
+        return fig.to_str()
@@ -0,0 +1,140 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import errno
+import hashlib
+import os
+import tempfile
+import threading
+
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+ICON_PREFIX = "icon-"
+ICON_SUFFIX = ".svg"
+
+
+def default_directory():
+    """Return the icon directory, in $XDG_RUNTIME_DIR (tmpfs) if available.
+    :return:
+    """
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if not base or not os.path.isdir(base):
+        base = tempfile.gettempdir()
+        # the temp directory is shared with other users
+        return os.path.join(base, "any_ping_applet-" + str(os.getuid()))
+    return os.path.join(base, "any_ping_applet")
+
+
+class IconStore(object):
+    """Content-addressed store of the composed indicator icons. The file name
+    is the hash of the icon, so an icon that was shown before is reused
+    without writing it again. New icons are written atomically (temp file
+    plus rename), the least recently used files are removed if the store
+    exceeds max_bytes.
+    """
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        """Initialize.
+        :param directory: Icon directory, default_directory() if None.
+        :param max_bytes: Size cap of the stored icons.
+        """
+        self.directory = directory if directory else default_directory()
+        self.max_bytes = max_bytes
+        # digest -> size, least recently used first
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.writes = 0
+        self.mutex = threading.Lock()
+        try:
+            os.makedirs(self.directory, 0o700)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+        self.scan()
+
+    def scan(self):
+        """Adopt the icons left in the directory by a previous run, oldest
+        first.
+        :return:
+        """
+        found = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.startswith(ICON_PREFIX) or \
+                    not file_name.endswith(ICON_SUFFIX):
+                continue
+            stat = os.stat(os.path.join(self.directory, file_name))
+            digest = file_name[len(ICON_PREFIX):-len(ICON_SUFFIX)]
+            found.append((stat.st_mtime, digest, stat.st_size))
+        for _, digest, size in sorted(found):
+            self.entries[digest] = size
+            self.total_bytes += size
+        self.evict()
+
+    def file_path(self, digest):
+        """Return the path of the icon with the given digest.
+        :param digest:
+        :return:
+        """
+        return os.path.join(self.directory, ICON_PREFIX + digest + ICON_SUFFIX)
+
+    def path(self, svg):
+        """Store the icon if needed and return its path.
+        :param svg: SVG bytes.
+        :return:
+        """
+        digest = hashlib.sha1(svg).hexdigest()
+        path = self.file_path(digest)
+        with self.mutex:
+            if digest in self.entries and os.path.isfile(path):
+                self.entries.move_to_end(digest)
+                return path
+            self.write(path, svg)
+            self.total_bytes += len(svg) - self.entries.pop(digest, 0)
+            self.entries[digest] = len(svg)
+            self.evict()
+        return path
+
+    def write(self, path, svg):
+        """Write the file atomically, readers see either no file or the
+        complete icon.
+        :param path:
+        :param svg:
+        :return:
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as icon_file:
+                icon_file.write(svg)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.writes += 1
+
+    def evict(self):
+        """Remove the least recently used icons until the store fits into
+        max_bytes. The most recent icon is always kept.
+        :return:
+        """
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            digest, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.file_path(digest))
+            except OSError:
+                pass
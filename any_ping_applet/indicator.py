@@ -33,18 +33,22 @@ except ImportError:
 
 from gi.repository import Gtk as gtk
 from gi.repository import AppIndicator3 as appindicator
-from gi.repository import Notify as notify
 from gi.repository import GObject
 
-import svgutils.transform as sg
-
 from . import config
+from . import history
+from . import reconfigure
+from . import resolver
 from . import resource
+from . import scheduler
 from . import theme
-from .about_dialog import AboutDialog
+from .icon_compositor import IconCompositor
+from .icon_store import IconStore
 from .ping_object import PingObject
-from .ping_containers import PingObjectTuple, IconTuple
-from .preferences_window import PreferencesWindow
+from .ping_containers import IconTuple, INDICATOR_MODE_SUMMARY
+from .ping_target import STATUS_NAMES
+from .status_summary import StatusSummary
+from .startup_profile import profiler
 
 APPINDICATOR_ID = 'any_ping_applet'
 
@@ -61,89 +65,174 @@ class AnyPingIndicator(GObject.GObject):
         GObject.threads_init()
         # initialize mutex
         self.mutex = threading.Lock()
-        # icon counter to get different icon names
-        self.icon_count = 0
-        # list of icon tuples
+        # status changes waiting for the next icon refresh, id -> icon tuple
+        self.pending_icon_tuples = {}
+        self.flush_source_id = None
+        # counters of the icon refresh
+        self.updates_received = 0
+        self.updates_coalesced = 0
+        self.icon_renders = 0
+        # path of the current indicator icon
+        self.icon_path = None
+        # parses the status icons once and memoizes composed icons
+        self.icon_compositor = IconCompositor(config.icon_cache_size)
+        # content-addressed icon files
+        self.icon_store = IconStore(config.icon_directory,
+                                    config.icon_directory_max_bytes)
+        # list of icon tuples and the index of every id in it
         self.list_of_icon_tuple = []
+        self.icon_tuple_index = {}
+        # status counts and worst ping objects of the summary icon
+        self.status_summary = StatusSummary()
+        self.worst_menu_items = []
+        # prometheus endpoint, started if a port is configured
+        self.metrics_exporter = None
+        # on-disk history of the results
+        self.timeseries_store = None
+        # reloads the config file when it changes
+        self.config_watcher = None
+        # limit the number of probes in flight
+        scheduler.configure(config.max_concurrent_probes,
+                            config.schedule_jitter, config.overlap_probes)
+        # resolved addresses are cached
+        resolver.configure(config.dns_cache_ttl)
+        # samples kept per target
+        history.set_default_capacity(config.history_size)
         # get ping objects from config
-        self.ping_objects_tuple = config.ping_object_tuples
-        self.ping_objects = []
-        count = 0
-        for item in self.ping_objects_tuple:
-            self.ping_objects.append(PingObject(count,
-                                                item.name,
-                                                item.address,
-                                                item.update_rate,
-                                                item.number_of_pings,
-                                                item.show_indicator,
-                                                item.show_text,
-                                                item.is_activated))
-            self.ping_objects[count].set_ping_warning(config.ping_warning)
-            count += 1
+        with profiler.phase("create ping objects"):
+            self.ping_objects_tuple = config.ping_object_tuples
+            self.ping_objects = []
+            count = 0
+            for item in self.ping_objects_tuple:
+                self.ping_objects.append(PingObject(config.target_ids[count],
+                                                    item.name,
+                                                    item.address,
+                                                    item.update_rate,
+                                                    item.number_of_pings,
+                                                    item.show_indicator,
+                                                    item.show_text,
+                                                    item.is_activated,
+                                                    item.backend,
+                                                    item.streaming,
+                                                    item.adaptive,
+                                                    item.min_update_rate,
+                                                    item.max_update_rate,
+                                                    item.probe_type,
+                                                    item.port))
+                self.ping_objects[count].set_ping_warning(config.ping_warning)
+                count += 1
         # update list of icon tuples
         self.update_list_of_icon_tuples()
         # init windows variables
         self.preferences_window = None
+        # settings by id and ping warning when the preferences were opened
+        self.preferences_base = None
         self.about_dialog = None
-        # check autostart
-        self.check_autostart()
-        # initialize notification
-        notify.init(APPINDICATOR_ID)
+        # notifications are initialized on first use
+        self.is_notify_initialized = False
         # initialize and build indicator menu
-        self.menu = gtk.Menu()
-        self.build_menu()
-        # initialize indicator
-        self.indicator = appindicator.Indicator.new(APPINDICATOR_ID,
-                resource.image_path("icon_red", theme.THEME),
-                appindicator.IndicatorCategory.SYSTEM_SERVICES)
-        self.indicator.set_status(appindicator.IndicatorStatus.ACTIVE)
-        self.indicator.set_menu(self.menu)
-        # update indicator icon
-        self.update_indicator_icon()
+        with profiler.phase("build menu"):
+            self.menu = gtk.Menu()
+            self.build_menu()
+        # initialize indicator, show the static icon first
+        with profiler.phase("create indicator"):
+            self.indicator = appindicator.Indicator.new(APPINDICATOR_ID,
+                    resource.image_path("icon_red", theme.THEME),
+                    appindicator.IndicatorCategory.SYSTEM_SERVICES)
+            self.indicator.set_status(appindicator.IndicatorStatus.ACTIVE)
+            self.indicator.set_menu(self.menu)
         # start ping objects
-        self.start_ping_objects()
+        with profiler.phase("start probing"):
+            if config.metrics_port:
+                from .metrics_exporter import MetricsExporter
+                self.metrics_exporter = MetricsExporter(
+                    config.metrics_port, config.metrics_address,
+                    window=config.statistics_window)
+                self.metrics_exporter.add_collector(self.icon_counters)
+                self.metrics_exporter.start()
+            if config.timeseries_store:
+                from .timeseries import TimeSeriesStore
+                self.timeseries_store = TimeSeriesStore(
+                    config.timeseries_directory)
+                self.timeseries_store.start()
+            self.start_ping_objects()
+            if config.config_reload:
+                from .config_watcher import ConfigWatcher
+                self.config_watcher = ConfigWatcher(config.file_path(),
+                                                    self.on_config_changed)
+                self.config_watcher.start()
+        # compose the indicator icon and check autostart once the main loop
+        # runs
+        GObject.idle_add(self.finish_startup)
+
+    def finish_startup(self):
+        """Work deferred until the indicator is shown and probing.
+        :return: False, to be called only once.
+        """
+        with profiler.phase("first indicator icon"):
+            self.mutex.acquire()
+            self.update_indicator_icon()
+            self.mutex.release()
+        with profiler.phase("check autostart"):
+            self.check_autostart()
+        profiler.report()
+        return False
 
-    def start_ping_objects(self):
-        """Start all ping objects.
+    def start_ping_objects(self, ping_objects=None, relabeled=()):
+        """Start ping objects and export the results of all.
+        :param ping_objects: Ping objects to start, all if None.
+        :param relabeled: Ping objects whose name or address changed.
         :return:
         """
-        for item in self.ping_objects:
+        if ping_objects is None:
+            ping_objects = self.ping_objects
+        reconfigure.update_sinks(
+            (self.metrics_exporter, self.timeseries_store),
+            self.ping_objects, relabeled)
+        for item in ping_objects:
             item.connect("update", self.update_indicator_icon_slot)
             if item.is_activated:
                 item.start()
 
-    def stop_ping_objects(self):
-        """Stop all ping objects.
+    def stop_ping_objects(self, ping_objects=None):
+        """Stop ping objects.
+        :param ping_objects: Ping objects to stop, all if None.
         :return:
         """
-        for item in self.ping_objects:
+        if ping_objects is None:
+            ping_objects = self.ping_objects
+        for item in ping_objects:
             item.disconnect_by_func(self.update_indicator_icon_slot)
             item.stop()
 
     def update_list_of_icon_tuples(self):
-        """Update list of icon tuples.
+        """Update list of icon tuples. Ping objects already in the list keep
+        their icon.
         :return:
         """
+        icons = dict((t.id, t.icon) for t in self.list_of_icon_tuple)
         self.list_of_icon_tuple = []
+        self.icon_tuple_index = {}
         for item in self.ping_objects:
-            t = IconTuple(item.id, item.name, "icon_grey",
+            t = IconTuple(item.id, item.name, icons.get(item.id, "icon_grey"),
                           item.show_indicator, item.show_text)
+            self.icon_tuple_index[item.id] = len(self.list_of_icon_tuple)
             self.list_of_icon_tuple.append(t)
+        self.status_summary.reset(self.list_of_icon_tuple)
 
     def update_indicator_icon(self):
-        """Update the indicator icon depending on the list of icon tuples.
+        """Update the indicator icon depending on the list of icon tuples, or
+        on the status counts in summary mode.
         :return:
         """
-        # count how many ping status go into the icon
-        # count how many characters are required
-        count = 0
-        char_count = 0
-        for i in range(0, len(self.list_of_icon_tuple)):
-            if self.list_of_icon_tuple[i].show_indicator:
-                count += 1
-                if self.list_of_icon_tuple[i].show_text:
-                    char_count += len(self.list_of_icon_tuple[i].name)
-        if count == 0:
+        if config.indicator_mode == INDICATOR_MODE_SUMMARY:
+            svg = self.icon_compositor.compose_summary(
+                self.status_summary.counts(), theme.THEME)
+        else:
+            svg = self.icon_compositor.compose(self.list_of_icon_tuple,
+                                               theme.THEME)
+        if svg is None:
+            self.icon_path = None
             # update indicator icon
             GObject.idle_add(
                 self.indicator.set_icon,
@@ -151,66 +240,22 @@ class AnyPingIndicator(GObject.GObject):
                 priority=GObject.PRIORITY_DEFAULT
             )
             return
-        # create new SVG figure
-        character_width = 55
-        disk_width = 135
-        width = count * disk_width + char_count * character_width
-        fig = sg.SVGFigure(str(width) + "px", "128px")
-        # generate the plots and texts
-        plots = []
-        texts = []
-        txt_position = 0
-        disk_position = 0
-        for i in range(0, len(self.list_of_icon_tuple)):
-            if self.list_of_icon_tuple[i].show_indicator:
-                # get the name length
-                txt_length = 0
-                if self.list_of_icon_tuple[i].show_text:
-                    txt_length = len(self.list_of_icon_tuple[i].name) * \
-                                 character_width
-                # load the figure from file
-                fig_1 = sg.fromfile(
-                    resource.image_path(self.list_of_icon_tuple[i].icon,
-                                        theme.THEME))
-                # get the plot
-                plot_1 = fig_1.getroot()
-                plot_1.moveto(disk_position, 0, scale=1.0)
-                # add the plot to the list
-                plots.append(plot_1)
-                # update next disk position
-                disk_position += disk_width + txt_length
-                # update text position
-                txt_position += disk_width
-                # generate text element
-                if self.list_of_icon_tuple[i].show_text:
-                    txt = sg.TextElement(txt_position, 100,
-                                         self.list_of_icon_tuple[i].name,
-                                         size=90, weight="regular", font="Courier",
-                                         color="white")
-                    # add the text to the list
-                    texts.append(txt)
-                # update text position
-                txt_position += txt_length
-
-        # append plots and labels to figure
-        fig.append(plots)
-        fig.append(texts)
-        # print(fig.to_str().decode("utf-8"))
-        # save generated SVG files
-        fig.save("/tmp/any_ping_indicator" + str(self.icon_count) + ".svg")
+        # store generated SVG file, known icons are not written again
+        icon_path = self.icon_store.path(svg)
+        if icon_path == self.icon_path:
+            return
+        self.icon_path = icon_path
         # update indicator icon
         GObject.idle_add(
             self.indicator.set_icon,
-            "/tmp/any_ping_indicator" + str(self.icon_count) + ".svg",
+            icon_path,
             priority=GObject.PRIORITY_DEFAULT
         )
-        # update icon count
-        self.icon_count += 1
-        self.icon_count %= 5
 
     def update_indicator_icon_slot(self, ping_object, id, name, icon,
                                    show_indicator, show_text):
-        """Function to update the indicator icon with new ping object status.
+        """Queue a new ping object status for the next indicator icon refresh.
+        Called in the probing threads.
         :param ping_object: Unused, but provided by the signal call. It is not
         thread save to use this object.
         :param id: ID of the ping object.
@@ -222,25 +267,83 @@ class AnyPingIndicator(GObject.GObject):
         """
         # acquire mutex
         self.mutex.acquire()
+        # the latest state per ping object wins
+        self.updates_received += 1
+        if id in self.pending_icon_tuples:
+            self.updates_coalesced += 1
+        self.pending_icon_tuples[id] = IconTuple(id, name, icon,
+                                                 show_indicator, show_text)
+        # flush at most once per refresh interval
+        if self.flush_source_id is None:
+            self.flush_source_id = GObject.timeout_add(
+                int(1000.0 / config.icon_refresh_rate),
+                self.flush_icon_updates)
+        # release mutex
+        self.mutex.release()
+
+    def icon_counters(self):
+        """Return the counters of the icon refresh as metrics: the status
+        updates received, the ones replaced by a newer update before the
+        refresh and the icons rendered.
+        :return: List of (name, type, help, value).
+        """
+        return [("any_ping_icon_updates_received_total", "counter",
+                 "Status updates received by the indicator.",
+                 self.updates_received),
+                ("any_ping_icon_updates_coalesced_total", "counter",
+                 "Status updates replaced before the icon refresh.",
+                 self.updates_coalesced),
+                ("any_ping_icon_renders_total", "counter",
+                 "Indicator icons rendered.", self.icon_renders)]
+
+    def flush_icon_updates(self):
+        """Apply the pending status changes and update the indicator icon once.
+        Called by a GLib timeout in the main loop.
+        :return: False, the timeout is one-shot.
+        """
+        # acquire mutex
+        self.mutex.acquire()
+        self.flush_source_id = None
+        pending_icon_tuples = self.pending_icon_tuples
+        self.pending_icon_tuples = {}
+        # summary mode, only the changed ping objects are touched, the list
+        # keeps their state for the next update_list_of_icon_tuples()
+        if config.indicator_mode == INDICATOR_MODE_SUMMARY:
+            is_changed = False
+            for icon_tuple in pending_icon_tuples.values():
+                index = self.icon_tuple_index.get(icon_tuple.id)
+                if index is None:
+                    # removed ping object
+                    continue
+                self.list_of_icon_tuple[index] = icon_tuple
+                if self.status_summary.update(icon_tuple):
+                    is_changed = True
+            if is_changed:
+                self.icon_renders += 1
+                self.update_indicator_icon()
+                self.update_worst_menu_items()
+            self.mutex.release()
+            return False
         # copy the icon tuple list
         list_of_icon_tuple = copy.copy(self.list_of_icon_tuple)
-        # update the list entry that is matching the id
+        # update the list entries that are matching the ids
         for i in range(0, len(list_of_icon_tuple)):
-            if list_of_icon_tuple[i].id == id:
-                list_of_icon_tuple[i] = IconTuple(id, name, icon,
-                                                  show_indicator, show_text)
-                break
+            if list_of_icon_tuple[i].id in pending_icon_tuples:
+                list_of_icon_tuple[i] = \
+                    pending_icon_tuples[list_of_icon_tuple[i].id]
         # check if list is different,
         # if not, no update required, release mutex and return
         if list_of_icon_tuple == self.list_of_icon_tuple:
             self.mutex.release()
-            return
+            return False
         # assign updated list
         self.list_of_icon_tuple = list_of_icon_tuple
         # update indicator icon
+        self.icon_renders += 1
         self.update_indicator_icon()
         # release mutex
         self.mutex.release()
+        return False
 
     def run(self):
         """Run the GTK main loop.
@@ -258,21 +361,25 @@ class AnyPingIndicator(GObject.GObject):
         item_joke = gtk.MenuItem('Joke')
         item_joke.connect('activate', self.joke)
         self.menu.append(item_joke)
+        # worst ping objects of the summary mode
+        self.worst_menu_items = []
+        if config.indicator_mode == INDICATOR_MODE_SUMMARY and \
+                config.summary_top_k > 0:
+            self.menu.append(gtk.SeparatorMenuItem("Worst"))
+            for _ in range(0, config.summary_top_k):
+                item_worst = gtk.MenuItem("")
+                item_worst.set_sensitive(False)
+                self.worst_menu_items.append(item_worst)
+                self.menu.append(item_worst)
         # separator
         self.menu.append(gtk.SeparatorMenuItem("Pings"))
         # ping states
         i = 0
         for item in self.ping_objects:
-            img_name = "icon_red"
-            state = " no response."
-            if not item.is_activated:
-                img_name = "icon_grey"
-                state = " inactive."
-            img = gtk.Image()
-            img.set_from_file(resource.image_path(img_name, theme.THEME))
-            item.menu_item.set_label("Ping: " + item.address + state)
-            item.menu_item.set_image(img)
-            item.menu_item.set_always_show_image(True)
+            # the menu item of a kept ping object is still in the old menu
+            parent = item.menu_item.get_parent()
+            if parent is not None:
+                parent.remove(item.menu_item)
             self.menu.append(item.menu_item)
             # generate submenu
             submenu = gtk.Menu()
@@ -323,6 +430,24 @@ class AnyPingIndicator(GObject.GObject):
         self.menu.append(item_quit)
         # show menu
         self.menu.show_all()
+        self.update_worst_menu_items()
+
+    def update_worst_menu_items(self):
+        """Show the worst ping objects in the menu of the summary mode. Only
+        the k worst are looked at, unused items are hidden.
+        :return:
+        """
+        worst = self.status_summary.worst(len(self.worst_menu_items))
+        for i in range(0, len(self.worst_menu_items)):
+            item = self.worst_menu_items[i]
+            if i >= len(worst):
+                item.set_visible(False)
+                continue
+            _, name, icon = worst[i]
+            label = name + ": " + STATUS_NAMES[icon]
+            if item.get_label() != label:
+                item.set_label(label)
+            item.set_visible(True)
 
     def check_autostart(self):
         """
@@ -353,6 +478,10 @@ class AnyPingIndicator(GObject.GObject):
         """
         if self.preferences_window is not None:
             return
+        from .preferences_window import PreferencesWindow
+        self.preferences_base = (
+            dict((item.id, item.settings()) for item in self.ping_objects),
+            config.ping_warning)
         self.preferences_window = PreferencesWindow(
             resource.image_path_type("icon.png", theme.THEME),
             self.ping_objects, config.autostart, config.ping_warning)
@@ -366,6 +495,7 @@ class AnyPingIndicator(GObject.GObject):
         """
         if self.about_dialog is not None:
             return
+        from .about_dialog import AboutDialog
         self.about_dialog = AboutDialog(
             resource.image_path_type("icon.png", theme.THEME))
         self.about_dialog.connect('response', self.close_about)
@@ -373,21 +503,63 @@ class AnyPingIndicator(GObject.GObject):
 
     def close_preferences(self, preference_window, event):
         """Called when the preference window is closed. Destroy (close) the
-        window. Update the menu and restart the ping threads. Store the
-        configuration.
+        window. Update the menu, start the added and stop the removed ping
+        objects, the others keep probing. Store the configuration.
         :param preference_window:
         :param event:
         :return:
         """
         # update config
-        self.ping_objects = preference_window.preferences
         config.autostart = preference_window.autostart
         config.ping_warning = preference_window.ping_warning
         # close preference window
         self.preferences_window.destroy()
         self.preferences_window = None
+        self.apply_changes(preference_window.changes)
+        # keep the changes of other programs made meanwhile
+        self.merge_config()
+        # check autostart
+        self.check_autostart()
+        # store config
+        self.store_config()
+
+    def merge_config(self):
+        """Merge a change of the config file, made while the preferences
+        were open, into the ping objects edited in the preferences.
+        :return:
+        """
+        base, base_ping_warning = self.preferences_base
+        self.preferences_base = None
+        try:
+            reloaded = config.reload()
+        except (OSError, ValueError) as e:
+            print("config not merged: " + str(e))
+            return
+        if reloaded is None:
+            return
+        entries, ping_warning, content = reloaded
+        print("config changed while the preferences were open, merged")
+        if config.ping_warning == base_ping_warning:
+            config.ping_warning = ping_warning
+        self.apply_entries(reconfigure.merge(
+            base, [(item.id, item.settings()) for item in self.ping_objects],
+            reconfigure.match(self.ping_objects, entries)),
+            config.ping_warning)
+        config.applied(content)
+
+    def apply_changes(self, changes):
+        """Show the changed list of ping objects: update the icon and the
+        menu, start the added and stop the removed ping objects. Runs in the
+        main loop.
+        :param changes: TargetChanges, already applied to the ping objects.
+        :return:
+        """
+        self.ping_objects = changes.targets
         # refresh indicator
         self.mutex.acquire()
+        # drop the pending status changes of the removed ping objects
+        for item in changes.removed:
+            self.pending_icon_tuples.pop(item.id, None)
         # update list of icon tuples
         self.update_list_of_icon_tuples()
         # update indicator icon
@@ -397,12 +569,54 @@ class AnyPingIndicator(GObject.GObject):
         # set indicator menu
         self.indicator.set_menu(self.menu)
         self.mutex.release()
-        # start ping threads
-        self.start_ping_objects()
-        # check autostart
-        self.check_autostart()
-        # store config
-        self.store_config()
+        # start and stop ping threads
+        self.stop_ping_objects(changes.removed)
+        self.start_ping_objects(changes.added, changes.relabeled)
+
+    def on_config_changed(self):
+        """Called by the config watcher thread when the config file changed.
+        Read and validate it in this thread, apply it in the main loop.
+        :return:
+        """
+        try:
+            reloaded = config.reload()
+        except (OSError, ValueError) as e:
+            print("config not reloaded: " + str(e))
+            return
+        if reloaded is not None:
+            GObject.idle_add(self.apply_config, *reloaded)
+
+    def apply_config(self, entries, ping_warning, content):
+        """Apply the targets of a reloaded config as minimal change of the
+        running ping objects. Runs in the main loop.
+        :param entries: List of (id, PingObjectTuple).
+        :param ping_warning:
+        :param content: Content of the config file, see config.applied().
+        :return: False, to be called only once.
+        """
+        if self.preferences_window is not None:
+            # merged when the preferences are closed
+            print("config changed while the preferences are open, deferred")
+            return False
+        self.apply_entries(reconfigure.match(self.ping_objects, entries),
+                           ping_warning)
+        config.applied(content)
+        return False
+
+    def apply_entries(self, entries, ping_warning):
+        """Change the running ping objects to the given targets.
+        :param entries: List of (id, PingObjectTuple) for reconfigure.diff().
+        :param ping_warning:
+        :return:
+        """
+        changes = reconfigure.diff(self.ping_objects, entries,
+                                   PingObject.from_settings)
+        reconfigure.apply(changes, ping_warning)
+        config.ping_object_tuples = [item.settings()
+                                     for item in changes.targets]
+        config.target_ids = [item.id for item in changes.targets]
+        config.ping_warning = ping_warning
+        self.apply_changes(changes)
 
     def close_about(self, _0, _1):
         """Called when the about window is closed. Destroy (close) the window.
@@ -428,6 +642,10 @@ class AnyPingIndicator(GObject.GObject):
         :param _:
         :return:
         """
+        from gi.repository import Notify as notify
+        if not self.is_notify_initialized:
+            notify.init(APPINDICATOR_ID)
+            self.is_notify_initialized = True
         notify.Notification.new("<b>Joke</b>", self.fetch_joke(),
                                 resource.image_path_type("chuck_norris_2.jpg",
                                                          theme.THEME)).show()
@@ -435,25 +653,23 @@ class AnyPingIndicator(GObject.GObject):
     def update_config(self, _):
         self.store_config()
 
-    def store_config(self):
+    def store_config(self, is_delayed=True):
         """Store the current configuration.
+        :param is_delayed: Write in the background, coalesced with the
+        following changes, instead of now.
         :return:
         """
         # create a new list from the ping object list
         ping_object_tuples = []
         for item in self.ping_objects:
-            t = PingObjectTuple(item.name,
-                                item.address,
-                                item.update_rate,
-                                item.number_of_pings,
-                                item.show_indicator,
-                                item.is_activated,
-                                item.show_text)
-            ping_object_tuples.append(t)
+            ping_object_tuples.append(item.settings())
         # assign the list to config and store to file
-        config.ping_object_tuples = []
         config.ping_object_tuples = ping_object_tuples
-        config.persist()
+        config.target_ids = [item.id for item in self.ping_objects]
+        if is_delayed:
+            config.schedule_persist()
+        else:
+            config.persist()
 
     def quit(self, source):
         """Exit the indicator. Stop all the ping objects. Store the current
@@ -461,20 +677,33 @@ class AnyPingIndicator(GObject.GObject):
         :param source:
         :return:
         """
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
         # stop all ping objects
         for item in self.ping_objects:
             item.stop()
+        scheduler.default_scheduler().shutdown()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        if self.timeseries_store is not None:
+            self.timeseries_store.close()
         #
-        notify.uninit()
+        if self.is_notify_initialized:
+            from gi.repository import Notify as notify
+            notify.uninit()
         # store config
-        self.store_config()
+        self.store_config(False)
         # exit
         gtk.main_quit()
 
 
 def main():
     signal.signal(signal.SIGINT, signal.SIG_DFL)
-    AnyPingIndicator().run()
+    with profiler.phase("load config"):
+        config.load()
+    with profiler.phase("initialize indicator"):
+        any_ping_indicator = AnyPingIndicator()
+    any_ping_indicator.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import argparse
+
+from .startup_profile import profiler
+
+
+def parse_arguments(argv=None):
+    """Parse the command line.
+    :param argv: Arguments, sys.argv[1:] if None.
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="any_ping_applet",
+                                     description="Any Ping Indicator")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print the duration of the startup phases")
+    parser.add_argument("--headless", action="store_true",
+                        help="probe without display, print the results as "
+                             "JSON lines")
+    parser.add_argument("--socket", metavar="PATH",
+                        help="with --headless, publish the results on this "
+                             "unix domain socket instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Entry point of bin/any_ping_applet. Heavy modules are imported here,
+    after the arguments are parsed, so their import time can be profiled.
+    :param argv:
+    :return:
+    """
+    args = parse_arguments(argv)
+    if args.headless:
+        from . import headless
+        headless.main(args.socket)
+        return
+    profiler.enabled = args.profile_startup
+    # includes the import of GTK and AppIndicator3
+    with profiler.phase("import indicator"):
+        from . import indicator
+    indicator.main()
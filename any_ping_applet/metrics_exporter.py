@@ -0,0 +1,409 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import copy
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from .history import DEFAULT_STATISTICS_WINDOW
+from .ping_containers import RESULT_FAILED, RESULT_NO_RESPONSE, \
+    RESULT_UNRESOLVED
+
+# upper bounds of the rtt histogram buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (name, type, help) of the metric families, in output order
+FAMILIES = (
+    ("any_ping_rtt_min_seconds", "gauge",
+     "Minimum round trip time of the latest probe."),
+    ("any_ping_rtt_avg_seconds", "gauge",
+     "Average round trip time of the latest probe."),
+    ("any_ping_rtt_max_seconds", "gauge",
+     "Maximum round trip time of the latest probe."),
+    ("any_ping_packet_loss_ratio", "gauge",
+     "Packet loss of the latest probe."),
+    ("any_ping_rtt_seconds", "histogram",
+     "Round trip times of the single echo requests."),
+    ("any_ping_probes_total", "counter",
+     "Number of probes."),
+    ("any_ping_probe_failures_total", "counter",
+     "Number of probes without any reply."),
+    ("any_ping_resolve_seconds", "gauge",
+     "Latency of the last name resolution of the address."),
+    ("any_ping_resolve_failures_total", "counter",
+     "Number of probes whose address could not be resolved."),
+    ("any_ping_probe_interval_seconds", "gauge",
+     "Current interval between two probes, adapted if the rate is adaptive."),
+    ("any_ping_probe_timeouts_total", "counter",
+     "Number of probes killed at their deadline."),
+    ("any_ping_deadline_misses_total", "counter",
+     "Number of deadlines at which the previous probe was still running."),
+    ("any_ping_window_rtt_seconds", "gauge",
+     "Round trip time quantiles of the statistics window."),
+    ("any_ping_window_jitter_seconds", "gauge",
+     "Interarrival jitter (RFC 3550) of the statistics window."),
+    ("any_ping_window_loss_ratio", "gauge",
+     "Packet loss of the statistics window."),
+)
+
+
+def escape_label(value):
+    """Escape a label value of the text exposition format.
+    :param value:
+    :return:
+    """
+    return value.replace("\\", "\\\\").replace("\n", "\\n") \
+        .replace("\"", "\\\"")
+
+
+def format_float(value):
+    """Format a sample value.
+    :param value:
+    :return:
+    """
+    return repr(float(value))
+
+
+class TargetMetrics(object):
+    """Metrics of one target and its serialized lines per family.
+    """
+    def __init__(self, target, buckets, window=DEFAULT_STATISTICS_WINDOW):
+        """Initialize.
+        :param target: PingTarget.
+        :param buckets: Upper bounds of the histogram buckets in seconds.
+        :param window: Seconds of the history the window statistics cover.
+        """
+        self.target = target
+        self.window = window
+        # the id tells apart targets of the same name and address
+        self.labels = "id=\"" + str(target.id) + \
+            "\",name=\"" + escape_label(target.name) + \
+            "\",address=\"" + escape_label(target.address) + "\""
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.rtt_count = 0
+        self.rtt_sum = 0.0
+        self.probes = 0
+        self.failures = 0
+        self.resolve_failures = 0
+        self.resolve_latency = None
+        self.interval = None
+        self.timeouts = 0
+        self.deadline_misses = 0
+        self.result = None
+        # number of observed results, tells if a copy is still current
+        self.version = 0
+        # family index -> serialized lines
+        self.chunks = None
+
+    def observe(self, result, samples, resolve_latency=None, interval=None,
+                timeouts=0, deadline_misses=0):
+        """Add a result and its samples.
+        :param result: PingStruct.
+        :param samples: Round trip times in ms, None for lost packets.
+        :param resolve_latency: Latency of the name resolution in ms.
+        :param interval: Seconds until the next probe.
+        :param timeouts: Probes of the target killed at their deadline.
+        :param deadline_misses: Deadlines of the target at which the previous
+        probe was still running.
+        :return:
+        """
+        self.result = result
+        self.resolve_latency = resolve_latency
+        self.interval = interval
+        self.timeouts = timeouts
+        self.deadline_misses = deadline_misses
+        self.probes += 1
+        if result.result in (RESULT_FAILED, RESULT_NO_RESPONSE,
+                             RESULT_UNRESOLVED):
+            self.failures += 1
+        if result.result == RESULT_UNRESOLVED:
+            self.resolve_failures += 1
+        for rtt in samples:
+            if rtt is None:
+                continue
+            rtt /= 1000.0
+            self.rtt_count += 1
+            self.rtt_sum += rtt
+            for i in range(0, len(self.buckets)):
+                if rtt <= self.buckets[i]:
+                    self.bucket_counts[i] += 1
+                    break
+        self.version += 1
+        self.chunks = None
+
+    def copy(self):
+        """Return a copy to serialize without blocking observe().
+        :return: TargetMetrics.
+        """
+        metrics = copy.copy(self)
+        metrics.bucket_counts = list(self.bucket_counts)
+        return metrics
+
+    def serialize(self):
+        """Return the lines of every family, serialized again only if the
+        metrics changed since the last call.
+        :return: Tuple of strings, one per family.
+        """
+        if self.chunks is not None:
+            return self.chunks
+        labels = "{" + self.labels + "}"
+        if self.result is None:
+            gauges = ("", "", "", "")
+        else:
+            gauges = tuple(
+                name + labels + " " + format_float(value) + "\n"
+                for name, value in (
+                    ("any_ping_rtt_min_seconds", self.result.min / 1000.0),
+                    ("any_ping_rtt_avg_seconds", self.result.avg / 1000.0),
+                    ("any_ping_rtt_max_seconds", self.result.max / 1000.0),
+                    ("any_ping_packet_loss_ratio", self.result.loss / 100.0)))
+        histogram = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            cumulative += count
+            histogram.append("any_ping_rtt_seconds_bucket{" + self.labels +
+                             ",le=\"" + format_float(bound) + "\"} " +
+                             str(cumulative) + "\n")
+        histogram.append("any_ping_rtt_seconds_bucket{" + self.labels +
+                         ",le=\"+Inf\"} " + str(self.rtt_count) + "\n")
+        histogram.append("any_ping_rtt_seconds_sum" + labels + " " +
+                         format_float(self.rtt_sum) + "\n")
+        histogram.append("any_ping_rtt_seconds_count" + labels + " " +
+                         str(self.rtt_count) + "\n")
+        self.chunks = gauges + (
+            "".join(histogram),
+            "any_ping_probes_total" + labels + " " + str(self.probes) + "\n",
+            "any_ping_probe_failures_total" + labels + " " +
+            str(self.failures) + "\n",
+            "" if self.resolve_latency is None else
+            "any_ping_resolve_seconds" + labels + " " +
+            format_float(self.resolve_latency / 1000.0) + "\n",
+            "any_ping_resolve_failures_total" + labels + " " +
+            str(self.resolve_failures) + "\n",
+            "" if self.interval is None else
+            "any_ping_probe_interval_seconds" + labels + " " +
+            format_float(self.interval) + "\n",
+            "any_ping_probe_timeouts_total" + labels + " " +
+            str(self.timeouts) + "\n",
+            "any_ping_deadline_misses_total" + labels + " " +
+            str(self.deadline_misses) + "\n") + self.serialize_window()
+        return self.chunks
+
+    def serialize_window(self):
+        """Return the lines of the window statistics, computed from the
+        history of the target.
+        :return: Tuple of strings, one per window family.
+        """
+        statistics = self.target.history.statistics(self.window)
+        if statistics is None:
+            return "", "", ""
+        labels = "{" + self.labels + "}"
+        loss = "any_ping_window_loss_ratio" + labels + " " + \
+            format_float(statistics.loss_rate) + "\n"
+        if statistics.loss_rate >= 1.0:
+            return "", "", loss
+        quantiles = "".join(
+            "any_ping_window_rtt_seconds{" + self.labels + ",quantile=\"" +
+            quantile + "\"} " + format_float(value / 1000.0) + "\n"
+            for quantile, value in (("0.5", statistics.p50),
+                                    ("0.95", statistics.p95),
+                                    ("0.99", statistics.p99)))
+        return (quantiles,
+                "any_ping_window_jitter_seconds" + labels + " " +
+                format_float(statistics.jitter / 1000.0) + "\n",
+                loss)
+
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MetricsExporter(object):
+    """HTTP endpoint in the Prometheus text format. Probing threads only
+    update the metrics of their target. A serializer thread rebuilds the
+    snapshot at most every snapshot_interval seconds, scrapes are answered
+    with the latest snapshot and never wait for the probes or the GTK main
+    loop.
+    """
+    def __init__(self, port, address="127.0.0.1", snapshot_interval=1.0,
+                 buckets=DEFAULT_BUCKETS, window=DEFAULT_STATISTICS_WINDOW):
+        """Initialize.
+        :param port: TCP port of the endpoint.
+        :param address: Bind address, localhost by default.
+        :param snapshot_interval: Seconds between snapshot rebuilds.
+        :param buckets: Upper bounds of the histogram buckets in seconds.
+        :param window: Seconds of the history the window statistics cover.
+        """
+        self.port = port
+        self.address = address
+        self.snapshot_interval = snapshot_interval
+        self.buckets = tuple(buckets)
+        self.window = window
+        # target -> TargetMetrics
+        self.metrics = {}
+        # functions returning metrics besides the targets
+        self.collectors = []
+        self.snapshot = b""
+        self.is_dirty = True
+        self.mutex = threading.Lock()
+        self.stop_event = threading.Event()
+        self.server = None
+        self.threads = []
+
+    def set_targets(self, targets):
+        """Export the given targets, drop the series of all others.
+        :param targets: List of PingTarget.
+        :return:
+        """
+        with self.mutex:
+            for target in list(self.metrics):
+                if target not in targets:
+                    target.remove_listener(self.observe)
+                    del self.metrics[target]
+            for target in targets:
+                if target not in self.metrics:
+                    self.metrics[target] = TargetMetrics(target, self.buckets,
+                                                         self.window)
+                    target.add_listener(self.observe)
+            self.is_dirty = True
+
+    def add_collector(self, collector):
+        """Export metrics that belong to no target.
+        :param collector: Function returning a list of (name, type, help,
+        value), called in the serializer thread.
+        :return:
+        """
+        with self.mutex:
+            self.collectors.append(collector)
+            self.is_dirty = True
+
+    def observe(self, target):
+        """Listener of the targets, called in the probing threads.
+        :param target:
+        :return:
+        """
+        with self.mutex:
+            metrics = self.metrics.get(target)
+            if metrics is None:
+                return
+            metrics.observe(target.result, target.samples,
+                            target.resolve_latency,
+                            target.effective_update_rate,
+                            target.probe_timeouts, target.deadline_misses)
+            self.is_dirty = True
+
+    def serialize(self):
+        """Build the snapshot from the (cached) lines of every target. The
+        changed metrics are copied under the lock and serialized after it is
+        released, the probing threads only wait for the copies.
+        :return: Bytes.
+        """
+        with self.mutex:
+            self.is_dirty = False
+            # (metrics, its cached lines or a copy to serialize)
+            items = [(metrics, metrics.chunks if metrics.chunks is not None
+                      else metrics.copy())
+                     for metrics in self.metrics.values()]
+            # probe budget of all targets
+            probe_rate = sum(1.0 / metrics.interval
+                             for metrics in self.metrics.values()
+                             if metrics.interval)
+            collectors = list(self.collectors)
+        chunks = [item.serialize() if isinstance(item, TargetMetrics)
+                  else item for _, item in items]
+        with self.mutex:
+            # cache the lines unless a result arrived meanwhile
+            for (metrics, item), chunk in zip(items, chunks):
+                if isinstance(item, TargetMetrics) and \
+                        metrics.version == item.version:
+                    metrics.chunks = chunk
+        lines = ["# HELP any_ping_probe_rate Probes per second of all "
+                 "targets.\n",
+                 "# TYPE any_ping_probe_rate gauge\n",
+                 "any_ping_probe_rate " + format_float(probe_rate) + "\n"]
+        for collector in collectors:
+            for name, metric_type, help_text, value in collector():
+                lines.append("# HELP " + name + " " + help_text + "\n")
+                lines.append("# TYPE " + name + " " + metric_type + "\n")
+                lines.append(name + " " + format_float(value) + "\n")
+        for index, (name, metric_type, help_text) in enumerate(FAMILIES):
+            lines.append("# HELP " + name + " " + help_text + "\n")
+            lines.append("# TYPE " + name + " " + metric_type + "\n")
+            lines.extend(chunk[index] for chunk in chunks)
+        return "".join(lines).encode("utf-8")
+
+    def run_serializer(self):
+        """Serializer thread.
+        :return:
+        """
+        while not self.stop_event.is_set():
+            if self.is_dirty:
+                self.snapshot = self.serialize()
+            self.stop_event.wait(self.snapshot_interval)
+
+    def start(self):
+        """Start the HTTP server and the serializer thread.
+        :return:
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                snapshot = exporter.snapshot
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(snapshot)))
+                self.end_headers()
+                self.wfile.write(snapshot)
+
+            def log_message(self, *_):
+                pass
+
+        self.server = _HTTPServer((self.address, self.port), Handler)
+        self.snapshot = self.serialize()
+        self.threads = [
+            threading.Thread(target=self.server.serve_forever,
+                             name="any_ping_metrics"),
+            threading.Thread(target=self.run_serializer,
+                             name="any_ping_metrics_serializer")]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        """Stop the HTTP server and the serializer thread.
+        :return:
+        """
+        if self.server is None:
+            return
+        self.stop_event.set()
+        self.server.shutdown()
+        self.server.server_close()
+        for thread in self.threads:
+            thread.join()
+        self.server = None
+        self.threads = []
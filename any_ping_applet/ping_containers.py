@@ -18,13 +18,52 @@
 
 from collections import namedtuple
 
+RESULT_OK = 0
+RESULT_FAILED = 1
+RESULT_NO_RESPONSE = 2
+# some, but not all echo requests were answered
+RESULT_PARTIAL = 3
+# the host name of the target could not be resolved
+RESULT_UNRESOLVED = 4
+
+# probe backends
+BACKEND_SUBPROCESS = "subprocess"
+BACKEND_NATIVE = "native"
+BACKEND_BATCH = "batch"
+
+# probe types, icmp uses the backends above
+PROBE_ICMP = "icmp"
+PROBE_TCP = "tcp"
+PROBE_UDP = "udp"
+PROBE_HTTP = "http"
+
+# interval range of the adaptive probe rate in seconds
+DEFAULT_MIN_UPDATE_RATE = 1.0
+DEFAULT_MAX_UPDATE_RATE = 60.0
+
+# indicator icon modes
+INDICATOR_MODE_TARGETS = "targets"
+INDICATOR_MODE_SUMMARY = "summary"
+
+PingStruct = namedtuple("PingStruct", "result min max avg loss")
+
 PingObjectTuple = namedtuple("PingObjectTuple", "name "
                                                 "address "
                                                 "update_rate "
                                                 "number_of_pings "
                                                 "show_indicator "
                                                 "is_activated "
-                                                "show_text")
+                                                "show_text "
+                                                "backend "
+                                                "streaming "
+                                                "adaptive "
+                                                "min_update_rate "
+                                                "max_update_rate "
+                                                "probe_type "
+                                                "port")
+PingObjectTuple.__new__.__defaults__ = (BACKEND_SUBPROCESS, False, False,
+                                        DEFAULT_MIN_UPDATE_RATE,
+                                        DEFAULT_MAX_UPDATE_RATE, PROBE_ICMP, 0)
 
 IconTuple = namedtuple("IconTuple", "id "
                                     "name "
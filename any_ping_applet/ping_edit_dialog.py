@@ -58,6 +58,16 @@ class PingEditDialog(gtk.Dialog):
             builder.get_object("radiobutton_activate_yes")
         self.radiobutton_activate_no = \
             builder.get_object("radiobutton_activate_no")
+        self.comboboxtext_backend = builder.get_object("comboboxtext_backend")
+        self.checkbutton_streaming = builder.get_object("checkbutton_streaming")
+        self.checkbutton_adaptive = builder.get_object("checkbutton_adaptive")
+        self.spinbutton_min_update_rate = \
+            builder.get_object("spinbutton_min_update_rate")
+        self.spinbutton_max_update_rate = \
+            builder.get_object("spinbutton_max_update_rate")
+        self.comboboxtext_probe_type = \
+            builder.get_object("comboboxtext_probe_type")
+        self.spinbutton_port = builder.get_object("spinbutton_port")
 
         # set data
         self.entry_name.set_text(preference[0])
@@ -76,6 +86,13 @@ class PingEditDialog(gtk.Dialog):
             self.radiobutton_activate_yes.set_active(True)
         else:
             self.radiobutton_activate_no.set_active(True)
+        self.comboboxtext_backend.set_active_id(preference[7])
+        self.checkbutton_streaming.set_active(preference[8])
+        self.checkbutton_adaptive.set_active(preference[9])
+        self.spinbutton_min_update_rate.set_value(preference[10])
+        self.spinbutton_max_update_rate.set_value(preference[11])
+        self.comboboxtext_probe_type.set_active_id(preference[12])
+        self.spinbutton_port.set_value(preference[13])
 
         # show dialog
         self.show_all()
@@ -17,32 +17,43 @@
 ################################################################################
 
 import copy
-import os
-import signal
-import subprocess
-import threading
-import time
-
-from collections import namedtuple
 
 from gi.repository import Gtk as gtk
+from gi.repository import GdkPixbuf
 from gi.repository import GObject
 
 from . import resource
 from . import theme
+from .ping_containers import BACKEND_SUBPROCESS, DEFAULT_MIN_UPDATE_RATE, \
+    DEFAULT_MAX_UPDATE_RATE, PROBE_ICMP
+from .ping_target import PingTarget
+
+__pixbufs = {}
 
-RESULT_OK = 0
-RESULT_FAILED = 1
-RESULT_NO_RESPONSE = 2
 
-PingStruct = namedtuple("PingStruct", "result min max avg loss")
+def pixbuf(icon):
+    """Return the cached pixbuf of a status icon. Only call it in the main
+    loop.
+    :param icon: Icon name, e.g. icon_green.
+    :return: GdkPixbuf.Pixbuf.
+    """
+    key = (theme.THEME, icon)
+    if key not in __pixbufs:
+        __pixbufs[key] = GdkPixbuf.Pixbuf.new_from_file(
+            resource.image_path(icon, theme.THEME))
+    return __pixbufs[key]
 
 
-class PingObject(GObject.GObject):
-    """Ping class.
+class PingObject(PingTarget, GObject.GObject):
+    """Ping class. GTK presentation of a PingTarget: the indicator menu item
+    and the update signal for the indicator icon.
     """
     def __init__(self, id, name, address, update_rate, number_of_pings,
-                 show_indicator, show_text, is_activated=None):
+                 show_indicator, show_text, is_activated=None,
+                 backend=BACKEND_SUBPROCESS, streaming=False, adaptive=False,
+                 min_update_rate=DEFAULT_MIN_UPDATE_RATE,
+                 max_update_rate=DEFAULT_MAX_UPDATE_RATE,
+                 probe_type=PROBE_ICMP, port=0):
         """Initialize.
         :param id:
         :param address:
@@ -50,184 +61,46 @@ class PingObject(GObject.GObject):
         :param number_of_pings:
         :param show_indicator:
         :param is_activated:
+        :param backend: BACKEND_SUBPROCESS or BACKEND_NATIVE.
+        :param streaming: Keep one ping process alive instead of starting a
+        new one every update_rate seconds. Streaming always uses the ping
+        process.
+        :param adaptive: Adapt the interval to the results.
+        :param min_update_rate:
+        :param max_update_rate:
+        :param probe_type: PROBE_ICMP, PROBE_TCP, PROBE_UDP or PROBE_HTTP.
+        :param port: Port of the non ICMP probes, 0 for the default.
         """
         # init gobject
         GObject.GObject.__init__(self)
         GObject.type_register(PingObject)
         GObject.threads_init()
-        # ping object properties
-        self.id = id
-        self.name = name
-        if not self.name:
-            self.name = address
-        self.address = address
-        self.update_rate = update_rate
-        self.number_of_pings = number_of_pings
-        self.show_indicator = show_indicator
-        self.show_text = show_text
-        if is_activated is None:
-            self.is_activated = True
-        else:
-            self.is_activated = is_activated
-        self.icon = "icon_red"
-        if not self.is_activated:
-            self.icon = "icon_grey"
-        self.ping_warning = 50.0
-        # indicator menu item
-        self.menu_item = gtk.ImageMenuItem("Ping: " + address)
-        # result
-        self.result = PingStruct(RESULT_NO_RESPONSE, 0.0, 0.0, 0.0, 0.0)
-        # gtk image for menu item
-        self.image = gtk.Image()
-        self.image.set_from_file(resource.image_path("icon_gray", theme.THEME))
-        # ping state
-        self.state = "Ping: " + self.address + " initializing."
-        # store subprocess
-        self.process = None
-        # mutex
-        self.mutex = threading.Lock()
-        # thread
-        self.thread = None
-        self.is_running = False
-        # interruptable sleep function
-        self.stop_event = threading.Event()
-        # current time
-        self.time_last = time.time()
+        # init probing core
+        PingTarget.__init__(self, id, name, address, update_rate,
+                            number_of_pings, show_indicator, show_text,
+                            is_activated, backend, streaming, adaptive,
+                            min_update_rate, max_update_rate, probe_type,
+                            port)
+        # indicator menu item and its gtk image, the image is reused
+        label = "Ping: " + self.address + self.print_name() + self.state
+        self.menu_item = gtk.ImageMenuItem(label)
+        self.image = gtk.Image.new_from_pixbuf(pixbuf(self.icon))
+        self.menu_item.set_image(self.image)
+        self.menu_item.set_always_show_image(True)
+        # latest and applied (label, icon) of the menu item
+        self.menu_state = (label, self.icon)
+        self.applied_menu_state = self.menu_state
+        self.is_menu_update_queued = False
 
     # signal definition returns (id, name, icon name, show_indicator)
     __gsignals__ = {
         'update': (GObject.SIGNAL_RUN_FIRST, None, (int, str, str, bool, bool,))
     }
 
-    def set_ping_warning(self, ping_warning):
-        """
-        Set new ping warning value.
-        :param ping_warning:
-        :return:
-        """
-        self.ping_warning = ping_warning
-
-    def loop(self):
-        """Ping loop that runs in a thread.
-        :return:
-        """
-        while self.is_running:
-            if not self.is_activated:
-                self.rate_sleep(self.update_rate)
-                continue
-            self.update()
-            self.rate_sleep(self.update_rate)
-
-    def rate_sleep(self, rate):
-        """Sleep the rest of the time.
-        :param rate:
-        :return:
-        """
-        elapsed = time.time() - self.time_last
-        time_sleep = rate - elapsed
-        if time_sleep > 0.0:
-            # interruptable sleeping function
-            if self.stop_event is not None:
-                self.stop_event.wait(time_sleep)
-        self.time_last = time.time()
-
-    def stop(self):
-        """Join the thread. Kill the running subprocess and interrupt the sleeping.
+    def publish(self):
+        """Emit a signal to update the indicator icon. Update the menu item.
         :return:
         """
-        self.is_running = False
-        if self.thread is not None:
-            # kill subprocess
-            if self.process is not None:
-                print("kill process")
-                try:
-                    os.killpg(os.getpgid(self.process.pid), signal.SIGTERM)
-                except ProcessLookupError as e:
-                    print(e)
-            # interrupt sleeping
-            self.stop_event.set()
-            self.stop_event = None
-            self.thread.join()
-            self.thread = None
-
-    def start(self):
-        """Start the thread (loop).
-        :return:
-        """
-        if self.thread is None:
-            if self.stop_event is None:
-                self.stop_event = threading.Event()
-            self.is_running = True
-            self.thread = threading.Thread(target=self.loop)
-            self.thread.setDaemon(True)
-            self.thread.start()
-
-    def update(self):
-        """Ping the address. Update the menu item. Emit a signal to update the
-        indicator icon.
-        :return:
-        """
-        # ping by using subprocess
-        self.process = subprocess.Popen(['ping', '-c',
-                                         str(self.number_of_pings),
-                                         self.address],
-                                        stdout=subprocess.PIPE,
-                                        stderr=subprocess.PIPE,
-                                        preexec_fn=os.setsid)
-        # wait for the result
-        output = self.process.communicate()
-        result = self.process.wait()
-        self.process = None
-        # create result
-        if result == 0:
-            output = output[0].decode("utf-8")
-            output = output.split('\n')
-            xmit_stats = output[len(output) - 3].split(",")
-            timing_stats = output[len(output) - 2].split("=")[1].split("/")
-            loss = float(xmit_stats[2].split("%")[0])
-            min = float(timing_stats[0])
-            avg = float(timing_stats[1])
-            max = float(timing_stats[2])
-
-            self.result = PingStruct(RESULT_OK, min, max, avg, loss)
-        elif result == 2:
-            self.result = PingStruct(RESULT_NO_RESPONSE, 0.0, 0.0, 0.0, 0.0)
-        else:
-            self.result = PingStruct(RESULT_FAILED, 0.0, 0.0, 0.0, 0.0)
-        # update menu item properties (image and state)
-        self.image = gtk.Image()
-        if self.is_activated:
-            if self.result.result == RESULT_OK:
-                if self.result.avg > self.ping_warning:
-                    self.icon = "icon_orange"
-                    img_str = resource.image_path(self.icon, theme.THEME)
-                else:
-                    self.icon = "icon_green"
-                    img_str = resource.image_path(self.icon, theme.THEME)
-                self.image.set_from_file(img_str)
-                self.state = " min: " + \
-                             "{:.2f}".format(self.result.min) + "," + \
-                             " avg: " + \
-                             "{:.2f}".format(self.result.avg) + "," + \
-                             " max: " + \
-                             "{:.2f}".format(self.result.max) + "," + \
-                             " package loss: " + \
-                             "{:.1f}".format(self.result.loss)
-            elif self.result.result == RESULT_FAILED:
-                self.icon = "icon_red"
-                img_str = resource.image_path(self.icon, theme.THEME)
-                self.image.set_from_file(img_str)
-                self.state = " failed."
-            elif self.result.result == RESULT_NO_RESPONSE:
-                self.icon = "icon_red"
-                img_str = resource.image_path(self.icon, theme.THEME)
-                self.image.set_from_file(img_str)
-                self.state = " no response."
-        else:
-            self.icon = "icon_grey"
-            img_str = resource.image_path(self.icon, theme.THEME)
-            self.image.set_from_file(img_str)
-            self.state = " inactive."
         # emit signal to update indicator icon
         self.emit('update', copy.copy(self.id),
                   copy.copy(self.name),
@@ -236,25 +109,37 @@ class PingObject(GObject.GObject):
                   copy.copy(self.show_text))
         # update menu item
         self.update_menu_item()
+        PingTarget.publish(self)
 
     def update_menu_item(self):
-        """Update the menu item.
+        """Queue an update of the menu item if its label or icon changed. At
+        most one update per item is queued at a time, it applies the latest
+        state.
         :return:
         """
-        GObject.idle_add(
-            self.menu_item.set_label,
-            "Ping: " + self.address + self.print_name() + self.state,
-            priority=GObject.PRIORITY_HIGH
-        )
-        GObject.idle_add(
-            self.menu_item.set_image,
-            self.image,
-            priority=GObject.PRIORITY_HIGH
-        )
-        GObject.idle_add(
-            self.menu_item.show,
-            priority=GObject.PRIORITY_HIGH
-        )
+        label = "Ping: " + self.address + self.print_name() + self.state
+        with self.mutex:
+            self.menu_state = (label, self.icon)
+            if self.menu_state == self.applied_menu_state or \
+                    self.is_menu_update_queued:
+                return
+            self.is_menu_update_queued = True
+        GObject.idle_add(self.apply_menu_item)
+
+    def apply_menu_item(self):
+        """Apply the latest state to the menu item. Runs in the main loop.
+        :return: False, to be called only once.
+        """
+        with self.mutex:
+            self.is_menu_update_queued = False
+            label, icon = self.menu_state
+            applied_label, applied_icon = self.applied_menu_state
+            self.applied_menu_state = self.menu_state
+        if label != applied_label:
+            self.menu_item.set_label(label)
+        if icon != applied_icon:
+            self.image.set_from_pixbuf(pixbuf(icon))
+        return False
 
     def on_show_indicator(self, item):
         """Emit signal to update indicator icon.
@@ -288,14 +173,10 @@ class PingObject(GObject.GObject):
         self.is_activated = item.get_active()
         if self.is_activated:
             self.icon = "icon_red"
-            img_str = resource.image_path(self.icon, theme.THEME)
-            self.image.set_from_file(img_str)
             self.state = " waiting..."
         else:
             self.stop()
             self.icon = "icon_grey"
-            img_str = resource.image_path(self.icon, theme.THEME)
-            self.image.set_from_file(img_str)
             self.state = " inactive."
 
         self.update_menu_item()
@@ -308,9 +189,3 @@ class PingObject(GObject.GObject):
 
         if self.is_activated:
             self.start()
-
-    def print_name(self):
-        if self.name != self.address:
-            return " (" + self.name + ")"
-        else:
-            return ""
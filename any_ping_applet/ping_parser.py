@@ -0,0 +1,128 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import os
+import re
+
+from collections import namedtuple
+
+from .ping_containers import PingStruct, RESULT_OK, RESULT_PARTIAL, \
+    RESULT_FAILED, RESULT_NO_RESPONSE
+
+# run ping with this environment to get untranslated output
+PING_ENVIRONMENT = dict(os.environ, LC_ALL="C")
+
+PARSE_OK = 0
+PARSE_PARTIAL = 1
+PARSE_FAILED = 2
+PARSE_NO_SUMMARY = 3
+
+# The patterns work on bytes, the stdout returned by communicate() is parsed
+# without decoding it. They rely on numbers and separators only, not on the
+# English words, so localized output (iputils, busybox, BSD) is understood.
+
+ParseResult = namedtuple("ParseResult", "status "
+                                        "transmitted "
+                                        "received "
+                                        "loss "
+                                        "min "
+                                        "avg "
+                                        "max "
+                                        "rtts")
+
+# "3 packets transmitted, 2 received, +1 errors, 33.3333% packet loss, ..."
+# "3 Pakete übertragen, 2 empfangen, 33,3333% Paketverlust, ..."
+_SUMMARY = re.compile(
+    rb"^(\d+)[^\d\n]+(\d+)[^%\n]*?(\d+(?:[.,]\d+)?)%", re.MULTILINE)
+# "rtt min/avg/max/mdev = 10.1/10.2/10.3/0.1 ms"
+# "round-trip min/avg/max = 10.1/10.2/10.3 ms"
+_TIMING = re.compile(rb"=\s*([0-9.]+)/([0-9.]+)/([0-9.]+)")
+# "64 bytes from 8.8.8.8: icmp_seq=1 ttl=117 time=10.3 ms"
+# "64 bytes from 8.8.8.8: seq=0 ttl=117 time=10.311 ms"
+# "64 Bytes von 8.8.8.8: icmp_seq=1 ttl=117 Zeit=10.3 ms"
+_REPLY = re.compile(
+    rb"(?:icmp_)?seq=(\d+)[^\n]*?[=<]\s*([0-9.]+)\s*ms", re.MULTILINE)
+_SEQUENCE = re.compile(rb"(?:icmp_)?seq=(\d+)")
+
+
+def parse(output):
+    """Parse the complete output of a finished ping run.
+    :param output: Bytes or memoryview of stdout.
+    :return: ParseResult.
+    """
+    rtts = [float(m.group(2)) for m in _REPLY.finditer(output)]
+    match = _SUMMARY.search(output)
+    if match is None:
+        return ParseResult(PARSE_NO_SUMMARY, 0, len(rtts), 0.0, 0.0, 0.0,
+                           0.0, rtts)
+    transmitted = int(match.group(1))
+    received = int(match.group(2))
+    loss = float(match.group(3).replace(b",", b"."))
+    if received == 0:
+        return ParseResult(PARSE_FAILED, transmitted, received, loss, 0.0,
+                           0.0, 0.0, rtts)
+    status = PARSE_OK if received >= transmitted else PARSE_PARTIAL
+    match = _TIMING.search(output, match.end())
+    if match is not None:
+        rtt_min = float(match.group(1))
+        rtt_avg = float(match.group(2))
+        rtt_max = float(match.group(3))
+    elif rtts:
+        rtt_min = min(rtts)
+        rtt_avg = sum(rtts) / len(rtts)
+        rtt_max = max(rtts)
+    else:
+        rtt_min = rtt_avg = rtt_max = 0.0
+    return ParseResult(status, transmitted, received, loss, rtt_min, rtt_avg,
+                       rtt_max, rtts)
+
+
+def parse_reply(line):
+    """Parse one line of a running ping process.
+    :param line: Bytes of one output line.
+    :return: Tuple (sequence, rtt in ms or None if the packet was lost) or
+    None if the line does not belong to an echo request.
+    """
+    match = _REPLY.search(line)
+    if match is not None:
+        return int(match.group(1)), float(match.group(2))
+    match = _SEQUENCE.search(line)
+    if match is not None:
+        return int(match.group(1)), None
+    return None
+
+
+def to_ping_struct(parsed, returncode):
+    """Convert the parse result to a PingStruct.
+    :param parsed: ParseResult.
+    :param returncode: Exit code of ping, only used without a summary.
+    :return: PingStruct.
+    """
+    if parsed.status == PARSE_OK:
+        return PingStruct(RESULT_OK, parsed.min, parsed.max, parsed.avg,
+                          parsed.loss)
+    if parsed.status == PARSE_PARTIAL:
+        return PingStruct(RESULT_PARTIAL, parsed.min, parsed.max, parsed.avg,
+                          parsed.loss)
+    if parsed.status == PARSE_FAILED:
+        return PingStruct(RESULT_FAILED, 0.0, 0.0, 0.0, parsed.loss)
+    # no summary, e.g. unknown host
+    if returncode == 2:
+        return PingStruct(RESULT_NO_RESPONSE, 0.0, 0.0, 0.0, 0.0)
+    return PingStruct(RESULT_FAILED, 0.0, 0.0, 0.0, 0.0)
+
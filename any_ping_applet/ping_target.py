@@ -0,0 +1,505 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import os
+import signal
+import subprocess
+import threading
+
+from . import ping_parser
+from . import probers
+from . import resolver
+from . import scheduler
+from .adaptive_rate import AdaptiveRate
+from .history import RttHistory
+from .icmp import IcmpProber, IcmpSocketError
+from .ping_containers import PingObjectTuple, PingStruct, RESULT_OK, \
+    RESULT_PARTIAL, RESULT_FAILED, RESULT_NO_RESPONSE, RESULT_UNRESOLVED, \
+    BACKEND_SUBPROCESS, BACKEND_NATIVE, DEFAULT_MIN_UPDATE_RATE, \
+    DEFAULT_MAX_UPDATE_RATE, PROBE_ICMP
+
+# status of a target by its icon name
+STATUS_NAMES = {
+    "icon_green": "ok",
+    "icon_orange": "warning",
+    "icon_red": "failed",
+    "icon_grey": "inactive"
+}
+
+# ping sends one echo request per second
+PING_INTERVAL = 1.0
+# seconds to wait for a single reply of the in-process probes
+REPLY_TIMEOUT = 1.0
+# seconds a ping process may overrun its deadline before it is killed
+DEADLINE_GRACE = 1.0
+
+# settings of how the target probes, changing one reschedules the target
+PROBE_SETTINGS = frozenset(("address", "update_rate", "number_of_pings",
+                            "backend", "streaming", "adaptive",
+                            "min_update_rate", "max_update_rate",
+                            "probe_type", "port"))
+# settings of what the target probes, changing one clears the history
+SERVICE_SETTINGS = frozenset(("address", "probe_type", "port"))
+# settings of the interval, streamed and batched targets keep update_rate
+RATE_SETTINGS = frozenset(("update_rate", "adaptive", "min_update_rate",
+                           "max_update_rate", "backend", "streaming",
+                           "probe_type"))
+
+
+class PingTarget(object):
+    """Probing core of a ping target: probes the address, keeps the result
+    and its history and derives the status (icon name and state text). It
+    does not depend on GTK, the presentation subclasses override publish().
+    """
+    def __init__(self, id, name, address, update_rate, number_of_pings,
+                 show_indicator, show_text, is_activated=None,
+                 backend=BACKEND_SUBPROCESS, streaming=False, adaptive=False,
+                 min_update_rate=DEFAULT_MIN_UPDATE_RATE,
+                 max_update_rate=DEFAULT_MAX_UPDATE_RATE,
+                 probe_type=PROBE_ICMP, port=0):
+        """Initialize.
+        :param id:
+        :param address:
+        :param update_rate:
+        :param number_of_pings:
+        :param show_indicator:
+        :param is_activated:
+        :param backend: BACKEND_SUBPROCESS or BACKEND_NATIVE.
+        :param streaming: Keep one ping process alive instead of starting a
+        new one every update_rate seconds. Streaming always uses the ping
+        process.
+        :param adaptive: Adapt the interval between min_update_rate and
+        max_update_rate to the results. Has no effect on streaming and batch
+        targets, they keep update_rate.
+        :param min_update_rate:
+        :param max_update_rate:
+        :param probe_type: PROBE_ICMP (ping with the backend) or PROBE_TCP,
+        PROBE_UDP, PROBE_HTTP (in-process probers, the address of PROBE_HTTP
+        can be an URL).
+        :param port: Port of the non ICMP probes, 0 for the default.
+        """
+        # ping object properties
+        self.id = id
+        self.name = name
+        if not self.name:
+            self.name = address
+        self.address = address
+        self.update_rate = update_rate
+        self.number_of_pings = number_of_pings
+        self.show_indicator = show_indicator
+        self.show_text = show_text
+        self.backend = backend
+        self.streaming = streaming
+        self.adaptive = adaptive
+        self.min_update_rate = min_update_rate
+        self.max_update_rate = max_update_rate
+        self.probe_type = probe_type
+        self.port = port
+        # in-process prober of the non ICMP probe types
+        self.prober = None
+        if probe_type != PROBE_ICMP:
+            self.prober = probers.create(probe_type, address, port)
+        # interval until the next probe
+        self.adaptive_rate = self.create_adaptive_rate()
+        self.effective_update_rate = update_rate
+        if is_activated is None:
+            self.is_activated = True
+        else:
+            self.is_activated = is_activated
+        self.icon = "icon_red"
+        if not self.is_activated:
+            self.icon = "icon_grey"
+        self.ping_warning = 50.0
+        # result
+        self.result = PingStruct(RESULT_NO_RESPONSE, 0.0, 0.0, 0.0, 0.0)
+        # samples of the latest result
+        self.samples = []
+        # round trip times of the single echo requests
+        self.history = RttHistory()
+        # ping state
+        self.state = " no response."
+        if not self.is_activated:
+            self.state = " inactive."
+        # resolution of the address, latency in ms
+        self.resolved_address = None
+        self.resolve_latency = None
+        self.resolve_error = None
+        # process of the streaming probe
+        self.process = None
+        # ping processes of the probes in flight, more than one if probes
+        # overlap
+        self.processes = set()
+        # probes killed at their deadline
+        self.probe_timeouts = 0
+        # deadlines at which the previous probe was still running
+        self.deadline_misses = 0
+        # overlapping probes publish in the order they were started
+        self.probe_sequence = 0
+        self.published_sequence = 0
+        self.sequence_mutex = threading.Lock()
+        # in-process prober for the native backend
+        self.icmp_prober = None
+        self.is_native_available = True
+        # callbacks called with the target after every result
+        self.listeners = []
+        # mutex
+        self.mutex = threading.Lock()
+        # scheduled by the probe scheduler
+        self.is_running = False
+
+    @classmethod
+    def from_settings(cls, id, settings):
+        """Create a target.
+        :param id:
+        :param settings: PingObjectTuple.
+        :return:
+        """
+        return cls(id, settings.name, settings.address, settings.update_rate,
+                   settings.number_of_pings, settings.show_indicator,
+                   settings.show_text, settings.is_activated,
+                   settings.backend, settings.streaming, settings.adaptive,
+                   settings.min_update_rate, settings.max_update_rate,
+                   settings.probe_type, settings.port)
+
+    def settings(self):
+        """Return the settings of the target.
+        :return: PingObjectTuple.
+        """
+        return PingObjectTuple(self.name, self.address, self.update_rate,
+                               self.number_of_pings, self.show_indicator,
+                               self.is_activated, self.show_text,
+                               self.backend, self.streaming, self.adaptive,
+                               self.min_update_rate, self.max_update_rate,
+                               self.probe_type, self.port)
+
+    def reconfigure(self, settings, ping_warning=None):
+        """Apply edited settings in place. The target is only rescheduled if
+        a setting of the probe changed, and keeps its history unless the
+        probed service changed.
+        :param settings: PingObjectTuple.
+        :param ping_warning: New ping warning, None to keep it.
+        :return: True if anything changed.
+        """
+        current = self.settings()
+        changed = set(field for field in settings._fields
+                      if getattr(settings, field) != getattr(current, field))
+        if ping_warning is not None and ping_warning != self.ping_warning:
+            changed.add("ping_warning")
+            self.ping_warning = ping_warning
+        if not changed:
+            return False
+        was_running = self.is_running
+        if was_running and (changed & PROBE_SETTINGS or
+                            not settings.is_activated):
+            self.stop()
+        for field in settings._fields:
+            setattr(self, field, getattr(settings, field))
+        if not self.name:
+            self.name = self.address
+        if changed & SERVICE_SETTINGS:
+            self.prober = None
+            if self.probe_type != PROBE_ICMP:
+                self.prober = probers.create(self.probe_type, self.address,
+                                             self.port)
+            self.result = PingStruct(RESULT_NO_RESPONSE, 0.0, 0.0, 0.0, 0.0)
+            self.samples = []
+            self.history = RttHistory()
+            self.resolved_address = None
+            self.resolve_latency = None
+            self.resolve_error = None
+        if changed & RATE_SETTINGS:
+            self.adaptive_rate = self.create_adaptive_rate()
+            self.effective_update_rate = self.update_rate
+        self.update_status()
+        self.publish()
+        if self.is_activated and not self.is_running and \
+                (was_running or "is_activated" in changed):
+            self.start()
+        return True
+
+    def create_adaptive_rate(self):
+        """Return the adaptive rate of the target, None if the rate is fixed.
+        Streamed and batched targets are probed at update_rate by the
+        scheduler, their rate is never adapted.
+        :return:
+        """
+        if not self.adaptive or scheduler.is_streaming(self) or \
+                scheduler.is_batched(self):
+            return None
+        return AdaptiveRate(self.update_rate, self.min_update_rate,
+                            self.max_update_rate)
+
+    def set_ping_warning(self, ping_warning):
+        """
+        Set new ping warning value.
+        :param ping_warning:
+        :return:
+        """
+        self.ping_warning = ping_warning
+
+    def add_listener(self, listener):
+        """Call listener(target) after every result. Listeners are called in
+        the probing threads.
+        :param listener:
+        :return:
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Remove a listener added with add_listener().
+        :param listener:
+        :return:
+        """
+        self.listeners.remove(listener)
+
+    def stop(self):
+        """Remove the object from the scheduler. Kill the running subprocess
+        and wait for the running probe.
+        :return:
+        """
+        if self.is_running:
+            self.is_running = False
+            # kill subprocesses
+            processes = list(self.processes)
+            if self.process is not None:
+                processes.append(self.process)
+            for process in processes:
+                print("kill process")
+                try:
+                    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+                except ProcessLookupError as e:
+                    print(e)
+            scheduler.default_scheduler().remove(self)
+        with self.mutex:
+            icmp_prober = self.icmp_prober
+            self.icmp_prober = None
+        if icmp_prober is not None:
+            icmp_prober.close()
+
+    def start(self):
+        """Add the object to the scheduler.
+        :return:
+        """
+        if not self.is_running:
+            self.is_running = True
+            scheduler.default_scheduler().add(self)
+
+    def update(self):
+        """Ping the address and publish the result. The result of a probe
+        that finished after a later started one is dropped.
+        :return:
+        """
+        with self.sequence_mutex:
+            self.probe_sequence += 1
+            sequence = self.probe_sequence
+        # ping
+        result, samples = self.probe()
+        with self.sequence_mutex:
+            if sequence < self.published_sequence:
+                return
+            self.published_sequence = sequence
+            self.set_result(result, samples)
+
+    def probe_deadline(self):
+        """Return the seconds a probe may take: the interval, at least the
+        time ping needs to send number_of_pings echo requests.
+        :return:
+        """
+        return max(self.effective_update_rate,
+                   self.number_of_pings * PING_INTERVAL)
+
+    def reply_timeout(self):
+        """Return the seconds the in-process probes wait for a reply, all
+        number_of_pings replies fit into the deadline.
+        :return:
+        """
+        return min(REPLY_TIMEOUT,
+                   self.probe_deadline() / max(1, self.number_of_pings))
+
+    def set_result(self, result, samples=None):
+        """Store the result and its samples, update the status and publish it.
+        :param result: PingStruct.
+        :param samples: Round trip times in ms of the single echo requests,
+        None for lost packets.
+        :return:
+        """
+        self.result = result
+        self.samples = samples or []
+        if samples:
+            self.history.extend(samples)
+        icon = self.icon
+        self.update_status()
+        if self.adaptive_rate is not None:
+            self.effective_update_rate = self.adaptive_rate.update(
+                result, self.ping_warning, self.icon != icon)
+        self.publish()
+
+    def update_status(self):
+        """Derive icon and state from the result.
+        :return:
+        """
+        if self.is_activated:
+            if self.result.result in (RESULT_OK, RESULT_PARTIAL):
+                if self.result.avg > self.ping_warning or \
+                        self.result.result == RESULT_PARTIAL:
+                    self.icon = "icon_orange"
+                else:
+                    self.icon = "icon_green"
+                self.state = " min: " + \
+                             "{:.2f}".format(self.result.min) + "," + \
+                             " avg: " + \
+                             "{:.2f}".format(self.result.avg) + "," + \
+                             " max: " + \
+                             "{:.2f}".format(self.result.max) + "," + \
+                             " package loss: " + \
+                             "{:.1f}".format(self.result.loss)
+            elif self.result.result == RESULT_FAILED:
+                self.icon = "icon_red"
+                self.state = " failed."
+            elif self.result.result == RESULT_NO_RESPONSE:
+                self.icon = "icon_red"
+                self.state = " no response."
+            elif self.result.result == RESULT_UNRESOLVED:
+                self.icon = "icon_red"
+                self.state = " name resolution failed."
+        else:
+            self.icon = "icon_grey"
+            self.state = " inactive."
+
+    def publish(self):
+        """Hand the new status to the listeners.
+        :return:
+        """
+        for listener in self.listeners:
+            listener(self)
+
+    def status_name(self):
+        """Return the status as word (ok, warning, failed, inactive).
+        :return:
+        """
+        return STATUS_NAMES[self.icon]
+
+    def resolve(self):
+        """Resolve the address with the shared DNS cache.
+        :return: IP address, None if the resolution failed.
+        """
+        host = self.address if self.prober is None else self.prober.host
+        resolution = resolver.default_cache().lookup(host)
+        self.resolved_address = resolution.ip
+        self.resolve_latency = resolution.latency
+        self.resolve_error = resolution.error
+        return resolution.ip
+
+    @staticmethod
+    def unresolved_result():
+        """Result of a probe whose address could not be resolved. It has no
+        samples, a resolution failure is not packet loss.
+        :return: Tuple (PingStruct, samples).
+        """
+        return PingStruct(RESULT_UNRESOLVED, 0.0, 0.0, 0.0, 0.0), []
+
+    def probe(self):
+        """Ping the address with the configured backend. The native backend
+        falls back to the ping subprocess if no ICMP socket can be opened.
+        Host names are resolved by the DNS cache, the backends probe the IP
+        address. Every backend finishes within probe_deadline().
+        :return: Tuple (PingStruct, list of round trip times in ms, None for
+        lost packets).
+        """
+        address = self.resolve()
+        if address is None:
+            return self.unresolved_result()
+        if self.prober is not None:
+            return self.prober.probe(address, self.number_of_pings,
+                                     self.reply_timeout())
+        if self.backend == BACKEND_NATIVE and self.is_native_available:
+            # overlapping probes share the prober, not its sockets
+            with self.mutex:
+                if self.icmp_prober is None:
+                    self.icmp_prober = IcmpProber()
+                icmp_prober = self.icmp_prober
+            try:
+                result, samples = icmp_prober.ping_samples(
+                    address, self.number_of_pings, self.reply_timeout())
+                if not samples:
+                    samples = [None] * self.number_of_pings
+                return result, samples
+            except IcmpSocketError as e:
+                print(e)
+                self.is_native_available = False
+        return self.probe_subprocess(address)
+
+    def ping_command(self, address=None):
+        """Return the arguments of the ping subprocess. ping sends
+        number_of_pings echo requests and waits at most the reply timeout
+        (-W) for each, so it exits within the deadline. A deadline (-w) would
+        make ping send until number_of_pings replies arrived.
+        :param address: Address to ping, the configured one if None.
+        :return: List of str.
+        """
+        # -W takes whole seconds on older iputils
+        return ['ping', '-c', str(self.number_of_pings),
+                '-W', str(max(1, int(self.reply_timeout()))),
+                address or self.address]
+
+    def probe_subprocess(self, address=None):
+        """Ping the address by using the ping subprocess. ping exits within
+        the deadline, a process that hangs anyway is killed and the probe
+        counts as no response.
+        :param address: Address to ping, the configured one if None.
+        :return: Tuple (PingStruct, list of round trip times in ms, None for
+        lost packets).
+        """
+        deadline = self.probe_deadline()
+        # ping by using subprocess
+        process = subprocess.Popen(self.ping_command(address),
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   env=ping_parser.PING_ENVIRONMENT,
+                                   preexec_fn=os.setsid)
+        self.processes.add(process)
+        # wait for the result
+        try:
+            output = process.communicate(timeout=deadline + DEADLINE_GRACE)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            process.communicate()
+            self.processes.discard(process)
+            self.probe_timeouts += 1
+            return PingStruct(RESULT_NO_RESPONSE, 0.0, 0.0, 0.0, 0.0), \
+                [None] * self.number_of_pings
+        result = process.wait()
+        self.processes.discard(process)
+        # create result, partial loss is told apart from failure by the
+        # summary, not by the exit code
+        parsed = ping_parser.parse(memoryview(output[0]))
+        if parsed.status == ping_parser.PARSE_NO_SUMMARY:
+            samples = [None] * self.number_of_pings
+        else:
+            samples = parsed.rtts[:parsed.received] + \
+                [None] * (parsed.transmitted - parsed.received)
+        return ping_parser.to_ping_struct(parsed, result), samples
+
+    def print_name(self):
+        if self.name != self.address:
+            return " (" + self.name + ")"
+        else:
+            return ""
@@ -17,14 +17,68 @@
 ################################################################################
 
 import os
+import threading
 
 from gi.repository import Gtk as gtk
 from gi.repository import Gdk as gdk
+from gi.repository import GObject
 
+from . import bulk_import
+from . import reconfigure
 from . import resource
+from .ping_containers import PingObjectTuple, BACKEND_SUBPROCESS, \
+    DEFAULT_MIN_UPDATE_RATE, DEFAULT_MAX_UPDATE_RATE, PROBE_ICMP, \
+    RESULT_OK, RESULT_PARTIAL, RESULT_FAILED, RESULT_NO_RESPONSE
 from .ping_object import PingObject
 from .ping_edit_dialog import PingEditDialog
 
+# columns of the list store after the settings
+COLUMN_ID = 14
+COLUMN_RTT = 15
+COLUMN_LOSS = 16
+
+# titles and widths of the visible columns
+COLUMNS = [("Name", 120), ("Address", 120), ("Update Rate", 90),
+           ("Number of Pings", 110), ("Show Indicator", 100),
+           ("Show Text", 80), ("Activate", 70), ("Backend", 90),
+           ("Streaming", 80), ("Adaptive", 80), ("Min Rate", 70),
+           ("Max Rate", 70), ("Probe", 60), ("Port", 60), (None, 0),
+           ("RTT", 80), ("Loss", 70)]
+
+# interval of the RTT and loss updates in milliseconds
+STATS_INTERVAL = 1000
+
+# settings of imported targets the source does not set
+IMPORT_TEMPLATE = PingObjectTuple("", "", 1.0, 1, True, True, True)
+# reasons of skipped targets listed after an import
+MAX_SKIPPED_SHOWN = 10
+
+
+def target_stats(result):
+    """Return the RTT and the loss shown for a result, -1 if unknown.
+    :param result: PingStruct.
+    :return:
+    """
+    if result.result in (RESULT_OK, RESULT_PARTIAL):
+        return result.avg, result.loss
+    if result.result in (RESULT_FAILED, RESULT_NO_RESPONSE):
+        return -1.0, 100.0
+    return -1.0, -1.0
+
+
+def settings_row(settings, id=-1):
+    """Return the list store row of a PingObjectTuple.
+    :param settings:
+    :param id: Id of the ping object, -1 for added rows.
+    :return:
+    """
+    return [settings.name, settings.address, settings.update_rate,
+            settings.number_of_pings, settings.show_indicator,
+            settings.show_text, settings.is_activated, settings.backend,
+            settings.streaming, settings.adaptive, settings.min_update_rate,
+            settings.max_update_rate, settings.probe_type, settings.port, id,
+            -1.0, -1.0]
+
 
 class PreferencesWindow(gtk.Window):
     """Preferences class.
@@ -46,25 +100,56 @@ class PreferencesWindow(gtk.Window):
         self.preferences = preferences
         self.autostart = autostart
         self.ping_warning = ping_warning
-        # generate the list
-        list_ping_objects = []
+        # changes of the ping objects, set on close
+        self.changes = None
+        # running import
+        self.importer = None
+        # lower case text of the search entry
+        self.search_text = ""
+        # set once the list is sorted by a column
+        self.is_sorted = False
+        # latest RTT and loss by id, filled by the probing threads and shown
+        # in batches by the main loop
+        self.stats = {}
+        self.stats_mutex = threading.Lock()
+        # id -> row reference of the ping objects
+        self.rows = {}
+        # initialize the list store, the hidden column is the id of the ping
+        # object, -1 for added rows, the last two the RTT and the loss, -1 if
+        # unknown
+        self.store = gtk.ListStore(str, str, float, int, bool, bool, bool,
+                                   str, bool, bool, float, float, str, int,
+                                   int, float, float)
         for item in preferences:
-            t = (item.name, item.address, item.update_rate,
-                 item.number_of_pings, item.show_indicator, item.show_text,
-                 item.is_activated)
-            list_ping_objects.append(t)
-        # initialize the list store
-        self.store = gtk.ListStore(str, str, float, int, bool, bool, bool)
-        for ref in list_ping_objects:
-            self.store.append(list(ref))
-        # initialize the tree view
-        self.tree_view = gtk.TreeView.new_with_model(self.store)
-        for i, column_title in enumerate(
-                ["Name", "Address", "Update Rate", "Number of Pings",
-                 "Show Indicator", "Show Text", "Activate"]):
+            tree_iter = self.store.append(
+                settings_row(item.settings(), item.id))
+            self.rows[item.id] = gtk.TreeRowReference.new(
+                self.store, self.store.get_path(tree_iter))
+        # filter by the search text, sort by the clicked column
+        self.filter = self.store.filter_new()
+        self.filter.set_visible_func(self.filter_visible)
+        self.sort = gtk.TreeModelSort(model=self.filter)
+        self.sort.connect("sort-column-changed", self.on_sort_column_changed)
+        # initialize the tree view, all rows have the same height so only the
+        # visible ones are measured and drawn
+        self.tree_view = gtk.TreeView.new_with_model(self.sort)
+        for i, (column_title, width) in enumerate(COLUMNS):
+            if column_title is None:
+                continue
             renderer = gtk.CellRendererText()
             column = gtk.TreeViewColumn(column_title, renderer, text=i)
+            if i == COLUMN_RTT:
+                column.set_cell_data_func(renderer, self.render_rtt)
+            elif i == COLUMN_LOSS:
+                column.set_cell_data_func(renderer, self.render_loss)
+            column.set_sort_column_id(i)
+            column.set_sizing(gtk.TreeViewColumnSizing.FIXED)
+            column.set_fixed_width(width)
+            column.set_resizable(True)
             self.tree_view.append_column(column)
+        self.tree_view.set_fixed_height_mode(True)
+        self.scrolled_window = gtk.ScrolledWindow()
+        self.scrolled_window.add(self.tree_view)
         # gui
         builder = gtk.Builder()
         file_path = os.path.dirname(os.path.abspath(__file__))
@@ -75,13 +160,18 @@ class PreferencesWindow(gtk.Window):
         self.add(self.box1)
         # get second box for the tree
         self.box2 = builder.get_object('box2')
-        self.box2.pack_start(self.tree_view, True, True, 0)
+        self.box2.pack_start(self.scrolled_window, True, True, 0)
         # get elements
         self.button_add = builder.get_object("button_add")
         self.button_remove = builder.get_object("button_remove")
         self.button_edit = builder.get_object("button_edit")
         self.button_up = builder.get_object("button_up")
         self.button_down = builder.get_object("button_down")
+        self.button_unsort = builder.get_object("button_unsort")
+        self.button_import = builder.get_object("button_import")
+        self.button_import_cidr = builder.get_object("button_import_cidr")
+        self.entry_cidr = builder.get_object("entry_cidr")
+        self.progressbar_import = builder.get_object("progressbar_import")
         self.checkbutton_autostart = builder.get_object("checkbutton_autostart")
         self.spinbutton_ping_warning = \
             builder.get_object("spinbutton_ping_warning")
@@ -93,6 +183,7 @@ class PreferencesWindow(gtk.Window):
         self.button_edit.set_sensitive(False)
         self.button_up.set_sensitive(False)
         self.button_down.set_sensitive(False)
+        self.button_unsort.set_sensitive(False)
         # connect signal to slots
         handlers = {
             "on_button_add_clicked": self.on_button_add_clicked,
@@ -100,43 +191,67 @@ class PreferencesWindow(gtk.Window):
             "on_button_edit_clicked": self.on_button_edit_clicked,
             "on_button_up_clicked": self.on_button_up_clicked,
             "on_button_down_clicked": self.on_button_down_clicked,
-            "on_button_close_clicked": self.on_button_close_clicked
+            "on_button_unsort_clicked": self.on_button_unsort_clicked,
+            "on_button_close_clicked": self.on_button_close_clicked,
+            "on_button_import_clicked": self.on_button_import_clicked,
+            "on_button_import_cidr_clicked":
+                self.on_button_import_cidr_clicked,
+            "on_search_changed": self.on_search_changed
         }
         builder.connect_signals(handlers)
         # handle list selection
         self.selection = None
         select = self.tree_view.get_selection()
         select.connect("changed", self.on_tree_selection_changed)
+        # show the RTT and the loss
+        for item in preferences:
+            item.add_listener(self.observe)
+        self.stats_timer = GObject.timeout_add(STATS_INTERVAL,
+                                               self.update_stats)
         # show gui
         self.show_all()
 
     def on_close(self, _0, _1):
-        """Called when the windows is closed. Generate a new list of ping
-        objects.
+        """Called when the windows is closed. Update the list of ping
+        objects: unchanged ones keep running, edited ones are updated in
+        place, removed ones are stopped and added ones are created (not
+        started).
         :param _0:
         :param _1:
         :return:
         """
+        if self.importer is not None:
+            self.importer.cancel()
+            self.importer = None
+        for item in self.preferences:
+            item.remove_listener(self.observe)
+        if self.stats_timer is not None:
+            GObject.source_remove(self.stats_timer)
+            self.stats_timer = None
         self.autostart = self.checkbutton_autostart.get_active()
         self.ping_warning = self.spinbutton_ping_warning.get_value()
-        # generate new ping objects
-        for item in self.preferences:
-            item.stop()
-        self.preferences = []
-        count = 0
+        entries = []
         for item in self.store:
-            self.preferences.append(PingObject(count, item[0], item[1], item[2],
-                                               item[3], item[4], item[5],
-                                               item[6]))
-            self.preferences[count].set_ping_warning(self.ping_warning)
-            count += 1
+            settings = PingObjectTuple(item[0], item[1], item[2], item[3],
+                                       item[4], item[6], item[5], item[7],
+                                       item[8], item[9], item[10], item[11],
+                                       item[12], item[13])
+            entries.append((item[COLUMN_ID] if item[COLUMN_ID] >= 0 else None,
+                            settings))
+        self.changes = reconfigure.diff(self.preferences, entries,
+                                        PingObject.from_settings)
+        reconfigure.apply(self.changes, self.ping_warning)
+        self.preferences = self.changes.targets
 
     def on_button_add_clicked(self, _):
         """Called on add button clicked. Add a new item to the list.
         :param _:
         :return:
         """
-        self.add_edit_ping(("", "", 1.0, 1, True, True, True), True)
+        self.add_edit_ping(("", "", 1.0, 1, True, True, True,
+                            BACKEND_SUBPROCESS, False, False,
+                            DEFAULT_MIN_UPDATE_RATE, DEFAULT_MAX_UPDATE_RATE,
+                            PROBE_ICMP, 0, -1, -1.0, -1.0), True)
 
     def on_button_remove_clicked(self, _):
         """Called on remove button clicked. Remove the selected item from the
@@ -144,9 +259,9 @@ class PreferencesWindow(gtk.Window):
         :param _:
         :return:
         """
-        if self.selection is None or len(self.store) == 1:
+        tree_iter = self.selected_iter()
+        if tree_iter is None or len(self.store) == 1:
             return
-        model, tree_iter = self.selection.get_selected()
         self.store.remove(tree_iter)
 
     def on_button_edit_clicked(self, _):
@@ -154,12 +269,15 @@ class PreferencesWindow(gtk.Window):
         :param _:
         :return:
         """
-        if self.selection is None:
+        tree_iter = self.selected_iter()
+        if tree_iter is None:
             return
-        model, tree_iter = self.selection.get_selected()
+        model = self.store
         t = (model[tree_iter][0], model[tree_iter][1], model[tree_iter][2],
              model[tree_iter][3], model[tree_iter][4], model[tree_iter][5],
-             model[tree_iter][6])
+             model[tree_iter][6], model[tree_iter][7], model[tree_iter][8],
+             model[tree_iter][9], model[tree_iter][10], model[tree_iter][11],
+             model[tree_iter][12], model[tree_iter][13])
         self.add_edit_ping(t, False)
 
     def on_button_up_clicked(self, _):
@@ -167,7 +285,10 @@ class PreferencesWindow(gtk.Window):
         :param _:
         :return:
         """
-        model, tree_iter = self.selection.get_selected()
+        tree_iter = self.selected_iter()
+        if tree_iter is None:
+            return
+        model = self.store
         tree_iter_2 = model.get_iter(
             gtk.TreePath(str(int(model.get_path(tree_iter).to_string()) - 1)))
         model.swap(tree_iter, tree_iter_2)
@@ -180,13 +301,25 @@ class PreferencesWindow(gtk.Window):
         :param _:
         :return:
         """
-        model, tree_iter = self.selection.get_selected()
+        tree_iter = self.selected_iter()
+        if tree_iter is None:
+            return
+        model = self.store
         tree_iter_2 = model.get_iter(
             gtk.TreePath(str(int(model.get_path(tree_iter).to_string()) + 1)))
         model.swap(tree_iter, tree_iter_2)
 
         self.check_button_sensitive()
 
+    def on_button_unsort_clicked(self, _):
+        """Called on manual order button clicked. Undo the sorting by a
+        column, the rows can be moved again.
+        :param _:
+        :return:
+        """
+        self.sort.set_sort_column_id(gtk.TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID,
+                                     gtk.SortType.ASCENDING)
+
     def on_button_close_clicked(self, _):
         """Called on close button clicked. Emit close signal.
         :param _:
@@ -208,16 +341,20 @@ class PreferencesWindow(gtk.Window):
         Depending on the selected item.
         :return:
         """
-        if self.selection is None:
-            return
+        tree_iter = self.selected_iter()
+        model = self.store
 
-        model, tree_iter = self.selection.get_selected()
-
-        self.button_edit.set_sensitive(True)
-        self.button_up.set_sensitive(True)
-        self.button_down.set_sensitive(True)
-        self.button_remove.set_sensitive(True)
+        self.button_edit.set_sensitive(tree_iter is not None)
+        self.button_up.set_sensitive(tree_iter is not None)
+        self.button_down.set_sensitive(tree_iter is not None)
+        self.button_remove.set_sensitive(tree_iter is not None)
 
+        if tree_iter is None:
+            return
+        # the rows can only be moved in the order of the list store
+        if self.is_sorted or self.search_text:
+            self.button_up.set_sensitive(False)
+            self.button_down.set_sensitive(False)
         if model.get_path(tree_iter) == gtk.TreePath("0"):
             self.button_up.set_sensitive(False)
         if model.get_path(tree_iter) == gtk.TreePath(str(len(model) - 1)):
@@ -242,13 +379,23 @@ class PreferencesWindow(gtk.Window):
             show_indicator = dialog.radiobutton_yes.get_active()
             show_text = dialog.radiobutton_show_text_yes.get_active()
             is_activated = dialog.radiobutton_activate_yes.get_active()
+            backend = dialog.comboboxtext_backend.get_active_id()
+            streaming = dialog.checkbutton_streaming.get_active()
+            adaptive = dialog.checkbutton_adaptive.get_active()
+            min_update_rate = dialog.spinbutton_min_update_rate.get_value()
+            max_update_rate = dialog.spinbutton_max_update_rate.get_value()
+            probe_type = dialog.comboboxtext_probe_type.get_active_id()
+            port = dialog.spinbutton_port.get_value_as_int()
             if is_adding:
                 if address is not "":
                     t = (name, address, update_rate, number_of_pins,
-                         show_indicator, show_text, is_activated)
+                         show_indicator, show_text, is_activated, backend,
+                         streaming, adaptive, min_update_rate,
+                         max_update_rate, probe_type, port, -1, -1.0, -1.0)
                     self.store.append(t)
             else:
-                model, tree_iter = self.selection.get_selected()
+                model = self.store
+                tree_iter = self.selected_iter()
                 model[tree_iter][0] = dialog.entry_name.get_text()
                 model[tree_iter][1] = dialog.entry_address.get_text()
                 model[tree_iter][2] = \
@@ -260,9 +407,234 @@ class PreferencesWindow(gtk.Window):
                     dialog.radiobutton_show_text_yes.get_active()
                 model[tree_iter][6] = \
                     dialog.radiobutton_activate_yes.get_active()
+                model[tree_iter][7] = \
+                    dialog.comboboxtext_backend.get_active_id()
+                model[tree_iter][8] = dialog.checkbutton_streaming.get_active()
+                model[tree_iter][9] = dialog.checkbutton_adaptive.get_active()
+                model[tree_iter][10] = \
+                    dialog.spinbutton_min_update_rate.get_value()
+                model[tree_iter][11] = \
+                    dialog.spinbutton_max_update_rate.get_value()
+                model[tree_iter][12] = \
+                    dialog.comboboxtext_probe_type.get_active_id()
+                model[tree_iter][13] = dialog.spinbutton_port.get_value_as_int()
         elif response == gtk.ResponseType.CANCEL:
             print("cancel")
 
         self.check_button_sensitive()
 
         dialog.destroy()
+
+    def selected_iter(self):
+        """Return the list store iter of the selected item.
+        :return: None if no item is selected.
+        """
+        if self.selection is None:
+            return None
+        model, tree_iter = self.selection.get_selected()
+        if tree_iter is None:
+            return None
+        tree_iter = self.sort.convert_iter_to_child_iter(tree_iter)
+        return self.filter.convert_iter_to_child_iter(tree_iter)
+
+    def filter_visible(self, model, tree_iter, _):
+        """Visible function of the filter, show the items whose name or
+        address contains the search text.
+        :param model:
+        :param tree_iter:
+        :param _:
+        :return:
+        """
+        if not self.search_text:
+            return True
+        return self.search_text in model[tree_iter][0].lower() or \
+            self.search_text in model[tree_iter][1].lower()
+
+    def on_search_changed(self, entry):
+        """Called when the search text changed. Filter the list.
+        :param entry:
+        :return:
+        """
+        self.search_text = entry.get_text().strip().lower()
+        self.filter.refilter()
+
+        self.check_button_sensitive()
+
+    def on_sort_column_changed(self, _):
+        """Called when the list is sorted by a column or back in the order of
+        the list store.
+        :param _:
+        :return:
+        """
+        # None or negative if unsorted
+        sort_column_id = self.sort.get_sort_column_id()[0]
+        self.is_sorted = sort_column_id is not None and sort_column_id >= 0
+        self.button_unsort.set_sensitive(self.is_sorted)
+
+        self.check_button_sensitive()
+
+    def render_rtt(self, column, renderer, model, tree_iter, _):
+        """Cell data function of the RTT column.
+        :param column:
+        :param renderer:
+        :param model:
+        :param tree_iter:
+        :param _:
+        :return:
+        """
+        rtt = model[tree_iter][COLUMN_RTT]
+        renderer.set_property(
+            "text", "{:.2f} ms".format(rtt) if rtt >= 0 else "-")
+
+    def render_loss(self, column, renderer, model, tree_iter, _):
+        """Cell data function of the loss column.
+        :param column:
+        :param renderer:
+        :param model:
+        :param tree_iter:
+        :param _:
+        :return:
+        """
+        loss = model[tree_iter][COLUMN_LOSS]
+        renderer.set_property(
+            "text", "{:.1f} %".format(loss) if loss >= 0 else "-")
+
+    def observe(self, target):
+        """Listener of the ping objects, called in the probing threads. Keep
+        the latest RTT and loss until the next update of the list.
+        :param target:
+        :return:
+        """
+        stats = target_stats(target.result)
+        with self.stats_mutex:
+            self.stats[target.id] = stats
+
+    def update_stats(self):
+        """Show the RTT and the loss collected since the last call, all rows
+        at once. Runs in the main loop.
+        :return: True to keep the timer.
+        """
+        with self.stats_mutex:
+            stats = self.stats
+            self.stats = {}
+        for id, (rtt, loss) in stats.items():
+            row = self.rows.get(id)
+            if row is None or not row.valid():
+                continue
+            tree_iter = self.store.get_iter(row.get_path())
+            if self.store[tree_iter][COLUMN_RTT] != rtt or \
+                    self.store[tree_iter][COLUMN_LOSS] != loss:
+                self.store.set(tree_iter, [COLUMN_RTT, COLUMN_LOSS],
+                               [rtt, loss])
+        return True
+
+    def on_button_import_clicked(self, _):
+        """Called on import button clicked. Import the targets of a CSV or
+        hosts file.
+        :param _:
+        :return:
+        """
+        dialog = gtk.FileChooserDialog(
+            "Import targets", self, gtk.FileChooserAction.OPEN,
+            (gtk.STOCK_CANCEL, gtk.ResponseType.CANCEL,
+             gtk.STOCK_OPEN, gtk.ResponseType.OK))
+        response = dialog.run()
+        path = dialog.get_filename()
+        dialog.destroy()
+
+        if response == gtk.ResponseType.OK and path is not None:
+            self.start_import(bulk_import.kind_of_file(path), path)
+
+    def on_button_import_cidr_clicked(self, _):
+        """Called on import range button clicked. Import the hosts of the
+        entered range.
+        :param _:
+        :return:
+        """
+        text = self.entry_cidr.get_text().strip()
+        if text == "":
+            return
+        self.start_import(bulk_import.IMPORT_CIDR, text)
+
+    def start_import(self, kind, source):
+        """Import targets in the background, the rows are added in chunks.
+        :param kind:
+        :param source:
+        :return:
+        """
+        if self.importer is not None:
+            return
+        self.button_import.set_sensitive(False)
+        self.button_import_cidr.set_sensitive(False)
+        self.progressbar_import.set_fraction(0.0)
+        self.progressbar_import.set_text("Importing...")
+        self.progressbar_import.show()
+        self.importer = bulk_import.Importer(
+            kind, source, IMPORT_TEMPLATE,
+            lambda targets, fraction: GObject.idle_add(
+                self.add_imported, targets, fraction),
+            lambda count, error, skipped: GObject.idle_add(
+                self.finish_import, count, error, skipped),
+            known_addresses=[item[1] for item in self.store])
+        self.importer.start()
+
+    def add_imported(self, targets, fraction):
+        """Add a chunk of imported targets. Runs in the main loop.
+        :param targets: List of PingObjectTuple.
+        :param fraction: Fraction of the source read.
+        :return: False, called once.
+        """
+        if self.importer is None:
+            return False
+        for settings in targets:
+            self.store.append(settings_row(settings))
+        self.progressbar_import.set_fraction(fraction)
+        self.progressbar_import.set_text(
+            "{:.0f} %".format(100.0 * fraction))
+        return False
+
+    def finish_import(self, count, error, skipped):
+        """Called at the end of an import. Runs in the main loop. Show the
+        error or the skipped targets.
+        :param count: Number of imported targets.
+        :param error: Error message or None.
+        :param skipped: Reasons of the skipped targets.
+        :return: False, called once.
+        """
+        if self.importer is None:
+            return False
+        self.importer = None
+        self.progressbar_import.hide()
+        self.button_import.set_sensitive(True)
+        self.button_import_cidr.set_sensitive(True)
+        print("imported " + str(count) + " targets")
+
+        self.check_button_sensitive()
+
+        if error is not None:
+            self.show_message(gtk.MessageType.ERROR, "Import failed",
+                              error)
+        elif skipped:
+            lines = skipped[:MAX_SKIPPED_SHOWN]
+            if len(skipped) > MAX_SKIPPED_SHOWN:
+                lines.append("and " + str(len(skipped) - MAX_SKIPPED_SHOWN) +
+                             " more")
+            self.show_message(
+                gtk.MessageType.WARNING,
+                "Imported " + str(count) + " targets, skipped " +
+                str(len(skipped)) + " invalid ones", "\n".join(lines))
+        return False
+
+    def show_message(self, message_type, text, secondary_text):
+        """Show a message dialog and wait until it is closed.
+        :param message_type: gtk.MessageType.
+        :param text:
+        :param secondary_text:
+        :return:
+        """
+        dialog = gtk.MessageDialog(transient_for=self, modal=True,
+                                   message_type=message_type,
+                                   buttons=gtk.ButtonsType.OK, text=text)
+        dialog.format_secondary_text(secondary_text)
+        dialog.run()
+        dialog.destroy()
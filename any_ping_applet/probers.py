@@ -0,0 +1,249 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import errno
+import select
+import socket
+import ssl
+import time
+
+from urllib.parse import urlsplit
+
+from .history import summarize
+from .ping_containers import PROBE_TCP, PROBE_UDP, PROBE_HTTP
+
+DEFAULT_TIMEOUT = 1.0
+
+# ports used if the target has none
+DEFAULT_PORTS = {PROBE_TCP: 80, PROBE_UDP: 7, PROBE_HTTP: 80}
+HTTPS_PORT = 443
+
+UDP_PAYLOAD = b"any_ping_applet"
+
+
+def wait(sock, is_write, deadline):
+    """Wait until the non-blocking socket is writable or readable.
+    :param sock:
+    :param is_write:
+    :param deadline: time.monotonic() deadline.
+    :return: False on timeout.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return False
+    if is_write:
+        _, ready, _ = select.select([], [sock], [], remaining)
+    else:
+        ready, _, _ = select.select([sock], [], [], remaining)
+    return bool(ready)
+
+
+def connect(ip, port, deadline):
+    """Open a non-blocking TCP connection.
+    :param ip:
+    :param port:
+    :param deadline: time.monotonic() deadline.
+    :return: Connected socket, None on timeout or error.
+    """
+    sock = None
+    try:
+        info = socket.getaddrinfo(ip, port, 0, socket.SOCK_STREAM)[0]
+        sock = socket.socket(info[0], socket.SOCK_STREAM)
+        sock.setblocking(False)
+        result = sock.connect_ex(info[4])
+        if result not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            sock.close()
+            return None
+        if not wait(sock, True, deadline) or \
+                sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) != 0:
+            sock.close()
+            return None
+    except OSError:
+        if sock is not None:
+            sock.close()
+        return None
+    return sock
+
+
+class Prober(object):
+    """In-process probe of a service on a target. probe() runs count single
+    measurements and summarizes them as PingStruct, like the ICMP backends,
+    so the status logic of the target is the same for every probe type.
+    """
+    def __init__(self, address, port=0):
+        """Initialize.
+        :param address: Host name or IP address.
+        :param port: Port, the default of the probe type if 0.
+        """
+        self.host = address
+        self.port = port
+
+    def probe(self, ip, count=1, timeout=DEFAULT_TIMEOUT):
+        """Measure count times.
+        :param ip: Resolved address of the host.
+        :param count:
+        :param timeout: Seconds to wait for each measurement.
+        :return: Tuple (PingStruct, list of latencies in ms, None for failed
+        measurements).
+        """
+        samples = [self.measure(ip, timeout) for _ in range(0, count)]
+        return summarize(samples), samples
+
+    def measure(self, ip, timeout):
+        """Single measurement.
+        :param ip:
+        :param timeout:
+        :return: Latency in ms, None if it failed.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class TcpProber(Prober):
+    """TCP connect time. A refused connection counts as failed, the service
+    is down.
+    """
+    def __init__(self, address, port=0):
+        Prober.__init__(self, address, port or DEFAULT_PORTS[PROBE_TCP])
+
+    def measure(self, ip, timeout):
+        time_start = time.monotonic()
+        sock = connect(ip, self.port, time_start + timeout)
+        if sock is None:
+            return None
+        rtt = (time.monotonic() - time_start) * 1000.0
+        sock.close()
+        return rtt
+
+
+class UdpProber(Prober):
+    """Round trip time of a datagram to a UDP echo service (port 7 by
+    default). The connected socket reports an ICMP port unreachable as
+    refused.
+    """
+    def __init__(self, address, port=0):
+        Prober.__init__(self, address, port or DEFAULT_PORTS[PROBE_UDP])
+
+    def measure(self, ip, timeout):
+        try:
+            info = socket.getaddrinfo(ip, self.port, 0, socket.SOCK_DGRAM)[0]
+            sock = socket.socket(info[0], socket.SOCK_DGRAM)
+        except OSError:
+            return None
+        sock.setblocking(False)
+        try:
+            sock.connect(info[4])
+            time_start = time.monotonic()
+            deadline = time_start + timeout
+            sock.send(UDP_PAYLOAD)
+            while wait(sock, False, deadline):
+                if sock.recv(2048) == UDP_PAYLOAD:
+                    return (time.monotonic() - time_start) * 1000.0
+            return None
+        except OSError:
+            return None
+        finally:
+            sock.close()
+
+
+class HttpProber(Prober):
+    """Time until the status line of a HEAD request arrived, connect and TLS
+    handshake included. The address is a host name or a http(s) URL. Server
+    errors (5xx) count as failed.
+    """
+    def __init__(self, address, port=0):
+        if "://" not in address:
+            address = "http://" + address
+        url = urlsplit(address)
+        self.is_https = url.scheme == "https"
+        default_port = HTTPS_PORT if self.is_https \
+            else DEFAULT_PORTS[PROBE_HTTP]
+        Prober.__init__(self, url.hostname or "",
+                        port or url.port or default_port)
+        self.path = url.path or "/"
+        if url.query:
+            self.path += "?" + url.query
+        self.ssl_context = None
+        if self.is_https:
+            self.ssl_context = ssl.create_default_context()
+
+    def request(self):
+        """Return the bytes of the request.
+        :return:
+        """
+        host = self.host
+        if ":" in host:
+            host = "[" + host + "]"
+        return ("HEAD " + self.path + " HTTP/1.1\r\n"
+                "Host: " + host + ":" + str(self.port) + "\r\n"
+                "User-Agent: any_ping_applet\r\n"
+                "Connection: close\r\n\r\n").encode("ascii")
+
+    def measure(self, ip, timeout):
+        time_start = time.monotonic()
+        deadline = time_start + timeout
+        sock = connect(ip, self.port, deadline)
+        if sock is None:
+            return None
+        try:
+            if self.is_https:
+                # the handshake blocks, bounded by the rest of the timeout
+                sock.setblocking(True)
+                sock.settimeout(max(0.001, deadline - time.monotonic()))
+                sock = self.ssl_context.wrap_socket(
+                    sock, server_hostname=self.host)
+                sock.setblocking(False)
+            sock.sendall(self.request())
+            response = b""
+            while b"\r\n" not in response:
+                # tls can hold decrypted bytes select does not see
+                is_pending = self.is_https and sock.pending()
+                if not is_pending and not wait(sock, False, deadline):
+                    return None
+                try:
+                    data = sock.recv(1024)
+                except (ssl.SSLWantReadError, BlockingIOError):
+                    continue
+                if not data:
+                    return None
+                response += data
+            rtt = (time.monotonic() - time_start) * 1000.0
+            status = response.split(b"\r\n", 1)[0].split()
+            if len(status) < 2 or not status[0].startswith(b"HTTP/") or \
+                    not status[1].isdigit() or int(status[1]) >= 500:
+                return None
+            return rtt
+        except (OSError, ValueError):
+            return None
+        finally:
+            sock.close()
+
+
+PROBERS = {PROBE_TCP: TcpProber, PROBE_UDP: UdpProber, PROBE_HTTP: HttpProber}
+
+
+def create(probe_type, address, port=0):
+    """Return the prober of a probe type.
+    :param probe_type: PROBE_TCP, PROBE_UDP or PROBE_HTTP.
+    :param address:
+    :param port:
+    :return: Prober.
+    """
+    return PROBERS[probe_type](address, port)
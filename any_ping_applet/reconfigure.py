@@ -0,0 +1,181 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+from collections import namedtuple
+
+# result of diff(): the targets in the new order, the added ones (not
+# started), the removed ones (still running), the changed ones as list of
+# (target, settings) and the changed ones whose name or address changes
+TargetChanges = namedtuple("TargetChanges",
+                           "targets added removed changed relabeled")
+
+
+def normalize(settings):
+    """Return the settings as a target holds them, a target without name is
+    named by its address.
+    :param settings: PingObjectTuple.
+    :return:
+    """
+    if settings.name:
+        return settings
+    return settings._replace(name=settings.address)
+
+
+def match(targets, entries):
+    """Pair the targets of a config that have no id with the running
+    targets not referenced by id: a target with equal settings first, then
+    one with the same name, then one with the same address. Each running
+    target is paired once.
+    :param targets: Running targets.
+    :param entries: List of (id, PingObjectTuple), id None if missing.
+    :return: List of (id, PingObjectTuple) for diff(), id None if no target
+    was paired.
+    """
+    ids = [id for id, _ in entries]
+    settings_list = [normalize(settings) for _, settings in entries]
+    referenced = set(ids)
+    unpaired = [target for target in targets if target.id not in referenced]
+    for key in ("settings", "name", "address"):
+        available = {}
+        for target in unpaired:
+            settings = target.settings()
+            value = settings if key == "settings" else getattr(settings, key)
+            available.setdefault(value, []).append(target)
+        for i, settings in enumerate(settings_list):
+            if ids[i] is not None:
+                continue
+            value = settings if key == "settings" else getattr(settings, key)
+            candidates = available.get(value)
+            if candidates:
+                ids[i] = candidates.pop(0).id
+        paired = set(ids)
+        unpaired = [target for target in unpaired if target.id not in paired]
+    return list(zip(ids, settings_list))
+
+
+def merge(base, ours, theirs):
+    """Three-way merge of the targets edited in the preferences (ours)
+    with the ones of the config file, changed meanwhile by another program
+    (theirs). A target changed or removed by one side only gets that change,
+    on a conflict ours wins. Targets added by them are appended.
+    :param base: Dictionary id -> PingObjectTuple when the editing started.
+    :param ours: List of (id, PingObjectTuple).
+    :param theirs: List of (id, PingObjectTuple), ids paired by match().
+    :return: List of (id, PingObjectTuple) for diff().
+    """
+    their_settings = dict((id, normalize(settings))
+                          for id, settings in theirs if id is not None)
+    our_ids = set(id for id, _ in ours)
+    merged = []
+    for id, settings in ours:
+        if id in base and normalize(settings) == normalize(base[id]):
+            if id not in their_settings:
+                # removed by them
+                continue
+            settings = their_settings[id]
+        merged.append((id, settings))
+    for id, settings in theirs:
+        if id is None or id not in base:
+            merged.append((None if id in our_ids else id, settings))
+    return merged
+
+
+def next_id(targets):
+    """Return an id no target has.
+    :param targets:
+    :return:
+    """
+    return max([target.id for target in targets] + [-1]) + 1
+
+
+def diff(targets, entries, create):
+    """Match the new list of targets to the running targets by id. Targets
+    keep their id as long as they exist, so a moved or edited target is the
+    same object afterwards.
+    :param targets: Running targets.
+    :param entries: List of (id, PingObjectTuple) in the new order. A new
+    target gets its id if no running target has it, an unused one if the
+    id is None.
+    :param create: create(id, settings), returns a new target without
+    starting it.
+    :return: TargetChanges.
+    """
+    by_id = dict((target.id, target) for target in targets)
+    new_id = max([next_id(targets) - 1] +
+                 [id for id, _ in entries if id is not None]) + 1
+    new_targets = []
+    added = []
+    changed = []
+    relabeled = []
+    for id, settings in entries:
+        settings = normalize(settings)
+        target = by_id.pop(id, None) if id is not None else None
+        if target is None:
+            if id is None:
+                id = new_id
+                new_id += 1
+            target = create(id, settings)
+            added.append(target)
+        else:
+            current = target.settings()
+            if settings != current:
+                changed.append((target, settings))
+            if settings.name != current.name or \
+                    settings.address != current.address:
+                relabeled.append(target)
+        new_targets.append(target)
+    removed = [target for target in targets if target.id in by_id]
+    return TargetChanges(new_targets, added, removed, changed, relabeled)
+
+
+def apply(changes, ping_warning=None):
+    """Stop the removed targets and update the kept ones in place. Starting
+    the added targets is left to the caller, which connects them first.
+    :param changes: TargetChanges.
+    :param ping_warning: New ping warning of all targets, None to keep it.
+    :return:
+    """
+    for target in changes.removed:
+        target.stop()
+    settings = dict(changes.changed)
+    added = set(target.id for target in changes.added)
+    for target in changes.targets:
+        if target.id in added:
+            if ping_warning is not None:
+                target.set_ping_warning(ping_warning)
+            continue
+        target.reconfigure(settings.get(target, target.settings()),
+                           ping_warning)
+
+
+def update_sinks(sinks, targets, relabeled=()):
+    """Hand the targets to the metrics exporter and the time series store.
+    Relabeled targets are dropped and added again, their series move to the
+    new labels.
+    :param sinks: MetricsExporter, TimeSeriesStore or None.
+    :param targets:
+    :param relabeled:
+    :return:
+    """
+    for sink in sinks:
+        if sink is None:
+            continue
+        if relabeled:
+            sink.set_targets([target for target in targets
+                              if target not in relabeled])
+        sink.set_targets(targets)
@@ -0,0 +1,175 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import ipaddress
+import queue
+import socket
+import threading
+import time
+
+from collections import namedtuple
+
+DEFAULT_TTL = 300.0
+# failed resolutions are retried sooner
+DEFAULT_NEGATIVE_TTL = 30.0
+
+# ip is None if the resolution failed, latency in ms, expires and resolved
+# (time of the last successful resolution) in time.monotonic() seconds
+Resolution = namedtuple("Resolution", "ip error latency expires resolved")
+
+__default_cache = None
+__default_cache_mutex = threading.Lock()
+
+
+def is_ip_address(address):
+    """Return True if the address needs no resolution.
+    :param address:
+    :return:
+    """
+    try:
+        ipaddress.ip_address(address)
+        return True
+    except ValueError:
+        return False
+
+
+def resolve(address, ttl, negative_ttl):
+    """Resolve a host name with the system resolver.
+    :param address:
+    :param ttl: Seconds a successful resolution is valid.
+    :param negative_ttl: Seconds a failed resolution is valid.
+    :return: Resolution.
+    """
+    time_start = time.monotonic()
+    try:
+        infos = socket.getaddrinfo(address, None, 0, socket.SOCK_RAW)
+        latency = (time.monotonic() - time_start) * 1000.0
+        now = time.monotonic()
+        return Resolution(infos[0][4][0], None, latency, now + ttl, now)
+    except (socket.gaierror, socket.herror, UnicodeError) as e:
+        latency = (time.monotonic() - time_start) * 1000.0
+        return Resolution(None, str(e), latency,
+                          time.monotonic() + negative_ttl, None)
+
+
+class DnsCache(object):
+    """Cache of resolved target addresses. A host name is resolved once in
+    the calling thread, afterwards expired entries, failed ones included, are
+    served while a background thread resolves them again, so the resolver
+    latency (or its timeout if the DNS server is down) is not added to the
+    probes. The resolver does not tell the TTL of a record, all entries live
+    ttl seconds.
+    """
+    def __init__(self, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        """Initialize.
+        :param ttl: Seconds a successful resolution is used without refresh,
+        0 refreshes on every lookup.
+        :param negative_ttl: Seconds a failed resolution is used.
+        """
+        self.ttl = ttl
+        self.negative_ttl = min(negative_ttl, ttl)
+        # address -> Resolution
+        self.entries = {}
+        # addresses queued for a background refresh
+        self.refreshing = set()
+        self.queue = queue.Queue()
+        self.mutex = threading.Lock()
+        self.thread = None
+
+    def lookup(self, address):
+        """Return the resolution of an address, from the cache if possible.
+        :param address: Host name or IP address.
+        :return: Resolution.
+        """
+        if is_ip_address(address):
+            return Resolution(address, None, 0.0, float("inf"), None)
+        now = time.monotonic()
+        with self.mutex:
+            entry = self.entries.get(address)
+            if entry is not None and now < entry.expires:
+                return entry
+            if entry is not None:
+                # serve the expired entry, refresh in the background; a
+                # failure is reported until a refresh succeeds
+                if address not in self.refreshing:
+                    self.refreshing.add(address)
+                    self.start()
+                    self.queue.put(address)
+                return entry
+        entry = resolve(address, self.ttl, self.negative_ttl)
+        with self.mutex:
+            self.entries[address] = entry
+        return entry
+
+    def start(self):
+        """Start the refresh thread, called with the mutex held.
+        :return:
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run,
+                                           name="any_ping_resolver")
+            self.thread.daemon = True
+            self.thread.start()
+
+    def run(self):
+        """Refresh thread.
+        :return:
+        """
+        while True:
+            address = self.queue.get()
+            entry = resolve(address, self.ttl, self.negative_ttl)
+            with self.mutex:
+                old_entry = self.entries.get(address)
+                # a failed refresh keeps the last known address for up to
+                # one more ttl, retried every negative_ttl
+                if entry.ip is None and old_entry is not None and \
+                        old_entry.ip is not None and \
+                        time.monotonic() - old_entry.resolved < 2 * self.ttl:
+                    entry = old_entry._replace(
+                        latency=entry.latency,
+                        expires=time.monotonic() + self.negative_ttl)
+                self.entries[address] = entry
+                self.refreshing.discard(address)
+
+    def clear(self):
+        """Forget all entries.
+        :return:
+        """
+        with self.mutex:
+            self.entries = {}
+
+
+def configure(ttl):
+    """Set the TTL of the default cache.
+    :param ttl:
+    :return:
+    """
+    cache = default_cache()
+    cache.ttl = ttl
+    cache.negative_ttl = min(DEFAULT_NEGATIVE_TTL, ttl)
+
+
+def default_cache():
+    """Return the cache shared by all ping targets.
+    :return:
+    """
+    global __default_cache
+    with __default_cache_mutex:
+        if __default_cache is None:
+            __default_cache = DnsCache()
+        return __default_cache
@@ -0,0 +1,452 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import asyncio
+import math
+import os
+import random
+import signal
+import threading
+
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from . import batch_probe
+from .ping_containers import BACKEND_BATCH, PROBE_ICMP
+from .ping_parser import PING_ENVIRONMENT
+from .streaming import PingStream, ping_command
+
+DEFAULT_MAX_CONCURRENT_PROBES = 16
+# random offset of every probe as fraction of the interval, at most 0.5
+DEFAULT_JITTER = 0.0
+MAX_JITTER = 0.5
+
+# fractional part of the golden ratio, successive multiples of it are
+# evenly spread over [0, 1) for any number of ping objects
+PHASE_STEP = 0.6180339887498949
+
+__default_scheduler = None
+__default_scheduler_mutex = threading.Lock()
+
+
+class ProbeScheduler(object):
+    """One asyncio event loop, running in a single thread, owns the timer of
+    every ping object. The blocking probes run in a fixed pool of worker
+    threads, the pool size caps the number of concurrent probes.
+
+    A scheduled object needs the attributes update_rate, is_activated and
+    effective_update_rate (the interval until the next probe, update_rate
+    unless it adapts the rate) and an update() method that probes and
+    publishes the result. Objects with the attribute streaming set instead
+    keep one ping process alive, every reply or timeout is published with
+    set_result(result, samples). The address of the process is resolved once
+    per start with resolve().
+
+    Every timer starts at its own phase of the interval, so the probes of
+    objects with the same rate do not fire together, and follows deadlines
+    on the monotonic loop clock. A probe that overruns skips the missed
+    deadlines instead of drifting. With overlap_probes set the next probe
+    starts on schedule instead while the slow one drains (every probe ends
+    at its own deadline). Both count deadline_misses of the object. An
+    optional jitter moves every single probe by a random fraction of the
+    interval.
+
+    Objects with the batch backend share one timer per (update_rate,
+    number_of_pings) bucket, all due objects of a bucket are probed by one
+    fping process.
+    """
+    def __init__(self, max_concurrent_probes=DEFAULT_MAX_CONCURRENT_PROBES,
+                 jitter=DEFAULT_JITTER, overlap_probes=False):
+        """Initialize.
+        :param max_concurrent_probes: Maximum number of probes in flight.
+        :param jitter: Random offset of every probe as fraction of the
+        interval.
+        :param overlap_probes: Start the next probe of an object on schedule
+        while the previous one is still running.
+        """
+        self.max_concurrent_probes = max(1, int(max_concurrent_probes))
+        self.jitter = min(max(0.0, jitter), MAX_JITTER)
+        self.overlap_probes = overlap_probes
+        # number of timers started, selects the phase of the next one
+        self.phase_count = 0
+        self.loop = None
+        self.thread = None
+        self.executor = None
+        # ping object -> asyncio task (only touched in the loop thread)
+        self.tasks = {}
+        # ping object -> concurrent futures of its probes, done ones are
+        # pruned when the next is tracked
+        self.in_flight = {}
+        # (update_rate, number_of_pings) -> ping objects of the batch backend
+        # (only touched in the loop thread)
+        self.buckets = {}
+        # (update_rate, number_of_pings) -> asyncio task of the bucket
+        self.bucket_tasks = {}
+        # cleared if fping is missing, the buckets then probe one by one
+        self.is_batch_available = True
+        self.mutex = threading.Lock()
+
+    def start(self):
+        """Start the event loop thread and the worker pool.
+        :return:
+        """
+        with self.mutex:
+            if self.thread is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrent_probes,
+                thread_name_prefix="any_ping_probe")
+            self.thread = threading.Thread(target=self.run,
+                                           name="any_ping_scheduler")
+            self.thread.daemon = True
+            self.thread.start()
+
+    def run(self):
+        """Event loop thread.
+        :return:
+        """
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def shutdown(self):
+        """Cancel all timers, stop the event loop and the worker pool.
+        :return:
+        """
+        with self.mutex:
+            if self.thread is None:
+                return
+            for ping_object in list(self.tasks):
+                self.remove(ping_object)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.thread = None
+            self.executor.shutdown(wait=False)
+            self.executor = None
+            self.loop.close()
+            self.loop = None
+
+    def add(self, ping_object):
+        """Schedule the ping object. Thread safe.
+        :param ping_object:
+        :return:
+        """
+        self.start()
+        self.loop.call_soon_threadsafe(self._add, ping_object)
+
+    def remove(self, ping_object):
+        """Cancel the timer of the ping object and wait until its running
+        probes (if any) finished. Thread safe, must not be called from a
+        worker thread.
+        :param ping_object:
+        :return:
+        """
+        if self.loop is None:
+            return
+        done = threading.Event()
+        self.loop.call_soon_threadsafe(self._remove, ping_object, done)
+        done.wait()
+        # a queued probe is dropped, a running one is waited for
+        for future in self.in_flight.pop(ping_object, ()):
+            # a batch is shared with other objects and never cancelled
+            if is_batched(ping_object) or not future.cancel():
+                try:
+                    future.result()
+                except CancelledError:
+                    # the batch was still queued when its bucket was emptied
+                    pass
+
+    def _add(self, ping_object):
+        if ping_object in self.tasks:
+            return
+        if is_batched(ping_object):
+            key = (ping_object.update_rate, ping_object.number_of_pings)
+            self.buckets.setdefault(key, set()).add(ping_object)
+            if key not in self.bucket_tasks:
+                self.bucket_tasks[key] = self.loop.create_task(
+                    self.run_bucket(key))
+            # the bucket task is shared, removing the object must not cancel
+            # it
+            self.tasks[ping_object] = None
+            return
+        self.tasks[ping_object] = self.loop.create_task(
+            self.run_ping_object(ping_object))
+
+    def _remove(self, ping_object, done):
+        if ping_object in self.tasks and self.tasks[ping_object] is None:
+            del self.tasks[ping_object]
+            key = (ping_object.update_rate, ping_object.number_of_pings)
+            bucket = self.buckets.get(key, set())
+            bucket.discard(ping_object)
+            if not bucket:
+                self.buckets.pop(key, None)
+                task = self.bucket_tasks.pop(key, None)
+                if task is not None:
+                    task.cancel()
+            done.set()
+            return
+        task = self.tasks.pop(ping_object, None)
+        if task is None:
+            done.set()
+            return
+        task.add_done_callback(lambda _: done.set())
+        task.cancel()
+
+    def first_deadline(self, interval):
+        """Return the first deadline of a new timer, at the next phase.
+        :param interval:
+        :return: Loop time.
+        """
+        self.phase_count += 1
+        phase = (self.phase_count * PHASE_STEP) % 1.0
+        return self.loop.time() + phase * interval
+
+    def next_deadline(self, deadline, interval, ping_objects=()):
+        """Return the deadline one interval after the last one. Deadlines
+        already passed are skipped, the phase is kept.
+        :param deadline: Last deadline.
+        :param interval:
+        :param ping_objects: Objects that count the skipped deadlines as
+        deadline_misses.
+        :return: Loop time.
+        """
+        deadline += interval
+        now = self.loop.time()
+        if deadline < now:
+            skipped = int(math.ceil((now - deadline) / interval))
+            deadline += skipped * interval
+            for ping_object in ping_objects:
+                ping_object.deadline_misses += skipped
+        return deadline
+
+    def track(self, ping_object, future):
+        """Remember a submitted probe of the ping object, remove() waits for
+        it. Runs in the loop thread.
+        :param ping_object:
+        :param future: Concurrent future of the probe.
+        :return:
+        """
+        futures = [item for item in self.in_flight.get(ping_object, ())
+                   if not item.done()]
+        futures.append(future)
+        self.in_flight[ping_object] = futures
+
+    async def sleep_until(self, deadline, interval):
+        """Sleep until the deadline, moved by the jitter.
+        :param deadline: Loop time.
+        :param interval:
+        :return:
+        """
+        if self.jitter:
+            deadline += random.uniform(-self.jitter, self.jitter) * interval
+        await asyncio.sleep(max(0.0, deadline - self.loop.time()))
+
+    async def run_ping_object(self, ping_object):
+        """Timer of one ping object. Probe at every deadline.
+        :param ping_object:
+        :return:
+        """
+        if is_streaming(ping_object):
+            await self.run_ping_stream(ping_object)
+            return
+        deadline = self.first_deadline(ping_object.effective_update_rate)
+        while True:
+            interval = ping_object.effective_update_rate
+            await self.sleep_until(deadline, interval)
+            if ping_object.is_activated:
+                future = self.executor.submit(self.probe, ping_object)
+                self.track(ping_object, future)
+                future = asyncio.wrap_future(future, loop=self.loop)
+                if self.overlap_probes:
+                    # wait until the next deadline at most
+                    done, _ = await asyncio.wait(
+                        [future], timeout=max(
+                            0.0, deadline + interval - self.loop.time()))
+                    if not done:
+                        # the next probe starts while this one drains
+                        ping_object.deadline_misses += 1
+                        deadline += interval
+                        continue
+                else:
+                    await future
+            # the interval of an adaptive object changes with its results
+            deadline = self.next_deadline(deadline,
+                                          ping_object.effective_update_rate,
+                                          (ping_object,))
+
+    async def run_bucket(self, key):
+        """Timer of one bucket of batch objects. Probe all activated objects
+        of the bucket at once, then sleep the rest of the update rate.
+        :param key: (update_rate, number_of_pings)
+        :return:
+        """
+        update_rate, number_of_pings = key
+        deadline = self.first_deadline(update_rate)
+        while True:
+            await self.sleep_until(deadline, update_rate)
+            ping_objects = [item for item in self.buckets.get(key, ())
+                            if item.is_activated]
+            if ping_objects and self.is_batch_available:
+                future = self.executor.submit(self.probe_batch, ping_objects,
+                                              number_of_pings, update_rate)
+                for item in ping_objects:
+                    self.track(item, future)
+                await asyncio.wrap_future(future, loop=self.loop)
+            elif ping_objects:
+                futures = []
+                for item in ping_objects:
+                    future = self.executor.submit(self.probe, item)
+                    self.track(item, future)
+                    futures.append(asyncio.wrap_future(future, loop=self.loop))
+                await asyncio.gather(*futures, return_exceptions=True)
+            deadline = self.next_deadline(deadline, update_rate,
+                                          ping_objects)
+
+    async def run_ping_stream(self, ping_object):
+        """Keep one ping process alive for the ping object and publish a
+        result per reply or timeout. The process is restarted if it exits and
+        killed when the task is cancelled.
+        :param ping_object:
+        :return:
+        """
+        # spread the starts of the processes like the timers
+        await asyncio.sleep(max(0.0, self.first_deadline(
+            ping_object.update_rate) - self.loop.time()))
+        while True:
+            if not ping_object.is_activated:
+                await asyncio.sleep(ping_object.update_rate)
+                continue
+            address = await self.loop.run_in_executor(self.executor,
+                                                      ping_object.resolve)
+            if address is None:
+                await self.loop.run_in_executor(
+                    self.executor, ping_object.set_result,
+                    *ping_object.unresolved_result())
+                await asyncio.sleep(ping_object.update_rate)
+                continue
+            stream = PingStream(ping_object.number_of_pings)
+            process = await asyncio.create_subprocess_exec(
+                *ping_command(address, ping_object.update_rate),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                env=PING_ENVIRONMENT,
+                start_new_session=True)
+            ping_object.process = process
+            try:
+                while True:
+                    line = await process.stdout.readline()
+                    if not line:
+                        break
+                    samples = stream.feed(line)
+                    if samples:
+                        await self.loop.run_in_executor(
+                            self.executor, ping_object.set_result,
+                            stream.result(), samples)
+            finally:
+                ping_object.process = None
+                if process.returncode is None:
+                    try:
+                        os.killpg(process.pid, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+                await process.wait()
+            # the process exited on its own, do not restart in a busy loop
+            await asyncio.sleep(ping_object.update_rate)
+
+    def probe(self, ping_object):
+        """Run the probe in a worker thread.
+        :param ping_object:
+        :return:
+        """
+        try:
+            ping_object.update()
+        except Exception as e:
+            print(e)
+
+    def probe_batch(self, ping_objects, number_of_pings, update_rate):
+        """Run one fping process for a bucket in a worker thread and hand
+        every object its result.
+        :param ping_objects:
+        :param number_of_pings:
+        :param update_rate:
+        :return:
+        """
+        try:
+            results = batch_probe.probe(ping_objects, number_of_pings,
+                                        update_rate)
+            for ping_object, (result, samples) in results.items():
+                ping_object.set_result(result, samples)
+        except FileNotFoundError as e:
+            # fping is not installed
+            print(e)
+            self.is_batch_available = False
+        except Exception as e:
+            # e.g. out of file descriptors, only this round fails
+            print(e)
+
+
+def is_batched(ping_object):
+    """Return True if the object is probed in a bucket with others.
+    :param ping_object:
+    :return:
+    """
+    return getattr(ping_object, "backend", None) == BACKEND_BATCH and \
+        not getattr(ping_object, "streaming", False) and is_icmp(ping_object)
+
+
+def is_streaming(ping_object):
+    """Return True if the object keeps a ping process alive.
+    :param ping_object:
+    :return:
+    """
+    return getattr(ping_object, "streaming", False) and is_icmp(ping_object)
+
+
+def is_icmp(ping_object):
+    """Return True if the object pings, the other probe types neither
+    stream nor batch.
+    :param ping_object:
+    :return:
+    """
+    return getattr(ping_object, "probe_type", PROBE_ICMP) == PROBE_ICMP
+
+
+def configure(max_concurrent_probes, jitter=DEFAULT_JITTER,
+              overlap_probes=False):
+    """Set the probe cap, the jitter and the overlap of the default
+    scheduler. The probe cap has no effect on a running scheduler.
+    :param max_concurrent_probes:
+    :param jitter: Random offset of every probe as fraction of the interval.
+    :param overlap_probes: Start the next probe on schedule while the
+    previous one is still running.
+    :return:
+    """
+    default_scheduler().max_concurrent_probes = \
+        max(1, int(max_concurrent_probes))
+    default_scheduler().jitter = min(max(0.0, jitter), MAX_JITTER)
+    default_scheduler().overlap_probes = overlap_probes
+
+
+def default_scheduler():
+    """Return the scheduler shared by all ping objects.
+    :return:
+    """
+    global __default_scheduler
+    with __default_scheduler_mutex:
+        if __default_scheduler is None:
+            __default_scheduler = ProbeScheduler()
+        return __default_scheduler
@@ -0,0 +1,74 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import sys
+import time
+
+from contextlib import contextmanager
+
+
+class StartupProfiler(object):
+    """Collects the duration of the startup phases (imports, config,
+    indicator initialization, first icon) and prints them once the main
+    loop runs.
+    """
+    def __init__(self):
+        """Initialize.
+        """
+        self.enabled = False
+        self.time_start = time.perf_counter()
+        # list of (name, duration in seconds, time since start in seconds)
+        self.phases = []
+        self.is_reported = False
+
+    @contextmanager
+    def phase(self, name):
+        """Measure the phase executed in the with block.
+        :param name:
+        :return:
+        """
+        time_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            time_end = time.perf_counter()
+            if self.enabled:
+                self.phases.append((name, time_end - time_start,
+                                    time_end - self.time_start))
+
+    def report(self, stream=None):
+        """Print the phases, only the first call prints.
+        :param stream: Output stream, stderr if None.
+        :return: False, to be usable as idle callback.
+        """
+        if not self.enabled or self.is_reported:
+            return False
+        self.is_reported = True
+        if stream is None:
+            stream = sys.stderr
+        stream.write("startup profile:\n")
+        for name, duration, since_start in self.phases:
+            stream.write("  {:<28} {:>9.1f} ms  (at {:>9.1f} ms)\n".format(
+                name, duration * 1000.0, since_start * 1000.0))
+        stream.write("  {:<28} {:>9.1f} ms\n".format(
+            "total", (time.perf_counter() - self.time_start) * 1000.0))
+        stream.flush()
+        return False
+
+
+profiler = StartupProfiler()
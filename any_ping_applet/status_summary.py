@@ -0,0 +1,98 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+from collections import OrderedDict
+
+# status icons, worst first
+SEVERITY = ("icon_red", "icon_orange", "icon_green", "icon_grey")
+
+
+class StatusSummary(object):
+    """Number of shown ping objects per status icon and their order by
+    severity, kept up to date one status change at a time. A change costs
+    O(1), the k worst objects are read in O(k).
+    """
+    def __init__(self, list_of_icon_tuple=()):
+        """Initialize.
+        :param list_of_icon_tuple: Initial status of the ping objects.
+        """
+        # id -> icon of the shown ping objects
+        self.icons = {}
+        # icon -> id -> name, in the order the objects got the status
+        self.buckets = dict((icon, OrderedDict()) for icon in SEVERITY)
+        self.reset(list_of_icon_tuple)
+
+    def reset(self, list_of_icon_tuple):
+        """Forget all ping objects and add the given ones.
+        :param list_of_icon_tuple:
+        :return:
+        """
+        self.icons = {}
+        for bucket in self.buckets.values():
+            bucket.clear()
+        for item in list_of_icon_tuple:
+            self.update(item)
+
+    def update(self, icon_tuple):
+        """Apply the new status of a ping object.
+        :param icon_tuple: IconTuple.
+        :return: True if the counts changed.
+        """
+        icon = icon_tuple.icon if icon_tuple.show_indicator else None
+        if icon not in self.buckets:
+            icon = None
+        old_icon = self.icons.get(icon_tuple.id)
+        if old_icon == icon:
+            if icon is not None:
+                # keep the name up to date
+                self.buckets[icon][icon_tuple.id] = icon_tuple.name
+            return False
+        if old_icon is not None:
+            del self.buckets[old_icon][icon_tuple.id]
+            del self.icons[icon_tuple.id]
+        if icon is not None:
+            self.buckets[icon][icon_tuple.id] = icon_tuple.name
+            self.icons[icon_tuple.id] = icon
+        return True
+
+    def count(self, icon):
+        """Return the number of shown ping objects with the status icon.
+        :param icon:
+        :return:
+        """
+        return len(self.buckets[icon])
+
+    def counts(self):
+        """Return the number of shown ping objects per status icon.
+        :return: Tuple in SEVERITY order.
+        """
+        return tuple(len(self.buckets[icon]) for icon in SEVERITY)
+
+    def worst(self, k):
+        """Return the k ping objects with the worst status, failed before
+        warning, the longest failing first.
+        :param k:
+        :return: List of (id, name, icon).
+        """
+        worst = []
+        for icon in SEVERITY:
+            for id, name in self.buckets[icon].items():
+                if len(worst) >= k:
+                    return worst
+                worst.append((id, name, icon))
+        return worst
@@ -0,0 +1,80 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+from collections import deque
+
+from .history import summarize
+from .ping_parser import parse_reply
+
+
+def ping_command(address, update_rate):
+    """Command line of the long-lived ping process. -O reports every
+    unanswered request, -n skips the reverse lookups.
+    :param address:
+    :param update_rate: Interval between echo requests in seconds.
+    :return:
+    """
+    return ['ping', '-n', '-O', '-i', "{:.3f}".format(update_rate), address]
+
+
+class PingStream(object):
+    """Incremental parser for the output of a long-lived ping process. Every
+    reply or timeout adds a sample to a window of the last window_size
+    samples, the window is summarized as PingStruct.
+    """
+    def __init__(self, window_size):
+        """Initialize.
+        :param window_size: Number of samples in the window.
+        """
+        # round trip times in ms, None for lost packets
+        self.window = deque(maxlen=max(1, int(window_size)))
+        self.last_sequence = None
+        # round trip time of the latest reply, None if it was lost
+        self.last_rtt = None
+
+    def feed(self, line):
+        """Parse one line of output.
+        :param line: Bytes of one output line.
+        :return: List of the samples the line added to the window (round trip
+        times in ms, None for lost packets).
+        """
+        reply = parse_reply(line)
+        if reply is None:
+            return []
+        sequence, rtt = reply
+        if self.last_sequence is None:
+            lost = 0
+        else:
+            # sequence numbers are 16 bit and wrap around, late or
+            # duplicated replies are ignored
+            diff = (sequence - self.last_sequence) & 0xFFFF
+            if diff == 0 or diff > 0x8000:
+                return []
+            lost = diff - 1
+        self.last_sequence = sequence
+        samples = [None] * min(lost, self.window.maxlen)
+        samples.append(rtt)
+        self.window.extend(samples)
+        self.last_rtt = rtt
+        return samples
+
+    def result(self):
+        """Summarize the window.
+        :return: PingStruct.
+        """
+        return summarize(self.window)
@@ -16,8 +16,6 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.         #
 ################################################################################
 
-from gi.repository import Gdk as gdk
-
 THEME_DARK = ""  # TODO dark
 THEME_LIGHT = ""  # TODO light
 
@@ -33,6 +31,7 @@ def _luminance(r, g, b, base=256):
 def __pixel_at(x, y):
     """Returns (r, g, b) color code for a pixel with given
     coordinates (each value is in 0..256 limits)"""
+    from gi.repository import Gdk as gdk
     root_window = gdk.get_default_root_window()
     buf = gdk.pixbuf_get_from_window(root_window, x, y, 1, 1)
     pixels = buf.get_pixels()
@@ -53,4 +52,15 @@ def _get_theme():
     return THEME_LIGHT if luminance >= 0.5 else THEME_DARK
 
 
-THEME = _get_theme()
+__theme = None
+
+
+def __getattr__(name):
+    """Probe the theme on first access of THEME instead of at import time."""
+    global __theme
+    if name == "THEME":
+        if __theme is None:
+            __theme = _get_theme()
+        return __theme
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__,
+                                                                    name))
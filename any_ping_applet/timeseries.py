@@ -0,0 +1,627 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import errno
+import hashlib
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+
+from collections import namedtuple
+
+from .ping_containers import RESULT_FAILED, RESULT_NO_RESPONSE, \
+    RESULT_UNRESOLVED
+
+LEVEL_RAW = "raw"
+LEVEL_MINUTE = "minute"
+LEVEL_HOUR = "hour"
+LEVELS = (LEVEL_RAW, LEVEL_MINUTE, LEVEL_HOUR)
+
+# seconds per bucket of the rollup levels
+BUCKET_SECONDS = {LEVEL_MINUTE: 60, LEVEL_HOUR: 3600}
+
+# seconds the records of a level are kept
+DEFAULT_RETENTION = {LEVEL_RAW: 24 * 3600,
+                     LEVEL_MINUTE: 30 * 24 * 3600,
+                     LEVEL_HOUR: 365 * 24 * 3600}
+
+# records per segment file
+SEGMENT_RECORDS = 8192
+
+SEGMENT_SUFFIX = ".seg"
+
+# timestamp, probes, failed probes, min, avg, max (ms) and loss (%); a raw
+# record is a single probe
+RECORD = struct.Struct("<dIIffff")
+
+TimeSeriesRecord = namedtuple("TimeSeriesRecord",
+                              "timestamp probes failures min avg max loss")
+
+
+def default_directory():
+    """Return the store directory in $XDG_DATA_HOME (~/.local/share).
+    :return:
+    """
+    base = os.environ.get("XDG_DATA_HOME")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "any_ping_applet", "timeseries")
+
+
+def target_key(target):
+    """Return the directory name of the series of a target.
+    :param target: PingTarget.
+    :return:
+    """
+    return hashlib.sha1((target.name + "\0" + target.address)
+                        .encode("utf-8")).hexdigest()[:16]
+
+
+def make_directory(path):
+    """Create a directory and its parents if missing.
+    :param path:
+    :return:
+    """
+    try:
+        os.makedirs(path, 0o700)
+    except OSError as exception:
+        if exception.errno != errno.EEXIST:
+            raise
+
+
+def remove_empty_directory(path):
+    """Remove a directory if it is empty.
+    :param path:
+    :return:
+    """
+    try:
+        os.rmdir(path)
+    except OSError as exception:
+        if exception.errno not in (errno.ENOTEMPTY, errno.EEXIST,
+                                   errno.ENOTDIR, errno.ENOENT):
+            raise
+
+
+class Segment(object):
+    """Preallocated, memory-mapped file of fixed-width records in time order.
+    Unused records are zero, so the number of records is found by a binary
+    search for the first zero timestamp.
+    """
+    def __init__(self, path, capacity=SEGMENT_RECORDS):
+        """Open or create a segment.
+        :param path:
+        :param capacity: Number of records of a new segment.
+        """
+        self.path = path
+        self.start = float(os.path.basename(path)[:-len(SEGMENT_SUFFIX)])
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            size = os.fstat(fd).st_size
+            if size == 0:
+                size = capacity * RECORD.size
+                os.ftruncate(fd, size)
+            self.capacity = size // RECORD.size
+            self.map = mmap.mmap(fd, self.capacity * RECORD.size)
+        finally:
+            os.close(fd)
+        self.count = self.bisect(lambda timestamp: timestamp == 0.0,
+                                 self.capacity)
+
+    def timestamp(self, index):
+        """Return the timestamp of a record.
+        :param index:
+        :return:
+        """
+        return struct.unpack_from("<d", self.map, index * RECORD.size)[0]
+
+    def bisect(self, predicate, end):
+        """Return the first index in [0, end) whose timestamp satisfies the
+        (monotonic) predicate, end if none does.
+        :param predicate:
+        :param end:
+        :return:
+        """
+        low = 0
+        high = end
+        while low < high:
+            middle = (low + high) // 2
+            if predicate(self.timestamp(middle)):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def last_timestamp(self):
+        """Return the timestamp of the newest record, the segment start if
+        empty.
+        :return:
+        """
+        if self.count == 0:
+            return self.start
+        return self.timestamp(self.count - 1)
+
+    def append(self, record):
+        """Append a record.
+        :param record: TimeSeriesRecord.
+        :return:
+        """
+        RECORD.pack_into(self.map, self.count * RECORD.size, *record)
+        self.count += 1
+
+    def last(self):
+        """Return the newest record, None if empty.
+        :return: TimeSeriesRecord.
+        """
+        if self.count == 0:
+            return None
+        return TimeSeriesRecord._make(
+            RECORD.unpack_from(self.map, (self.count - 1) * RECORD.size))
+
+    def replace_last(self, record):
+        """Overwrite the newest record.
+        :param record: TimeSeriesRecord.
+        :return:
+        """
+        RECORD.pack_into(self.map, (self.count - 1) * RECORD.size, *record)
+
+    def read(self, start, end):
+        """Return the records in [start, end].
+        :param start: Timestamp.
+        :param end: Timestamp.
+        :return: List of TimeSeriesRecord.
+        """
+        first = self.bisect(lambda timestamp: timestamp >= start, self.count)
+        records = []
+        for index in range(first, self.count):
+            record = TimeSeriesRecord._make(
+                RECORD.unpack_from(self.map, index * RECORD.size))
+            if record.timestamp > end:
+                break
+            records.append(record)
+        return records
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.close()
+
+
+class Series(object):
+    """Records of one target at one level, split into segment files named
+    after their first timestamp. Only the newest segment stays mapped.
+    """
+    def __init__(self, directory, capacity=SEGMENT_RECORDS):
+        """Initialize.
+        :param directory:
+        :param capacity: Records per segment.
+        """
+        self.directory = directory
+        self.capacity = capacity
+        self.segment = None
+        self.is_dirty = False
+        make_directory(directory)
+
+    def segment_paths(self):
+        """Return the paths of the segments, oldest first.
+        :return:
+        """
+        names = [file_name for file_name in os.listdir(self.directory)
+                 if file_name.endswith(SEGMENT_SUFFIX)]
+        names.sort(key=lambda file_name:
+                   float(file_name[:-len(SEGMENT_SUFFIX)]))
+        return [os.path.join(self.directory, file_name) for file_name in names]
+
+    def open_newest(self):
+        """Map the newest segment if none is mapped yet.
+        :return:
+        """
+        if self.segment is None:
+            paths = self.segment_paths()
+            if paths:
+                self.segment = Segment(paths[-1], self.capacity)
+
+    def append(self, record):
+        """Append a record, rotate to a new segment if the current one is
+        full.
+        :param record: TimeSeriesRecord.
+        :return:
+        """
+        self.open_newest()
+        if self.segment is not None and \
+                record.timestamp < self.segment.last_timestamp():
+            # clock went back, keep the records in time order
+            record = record._replace(timestamp=self.segment.last_timestamp())
+        if self.segment is None or self.segment.is_full():
+            if self.segment is not None:
+                self.segment.flush()
+                self.segment.close()
+            self.segment = Segment(
+                os.path.join(self.directory,
+                             repr(record.timestamp) + SEGMENT_SUFFIX),
+                self.capacity)
+        self.segment.append(record)
+        self.is_dirty = True
+
+    def merge(self, record):
+        """Append a rollup record, or add it to the newest record if that
+        is of the same bucket, e.g. written by a close before a restart.
+        :param record: TimeSeriesRecord.
+        :return:
+        """
+        self.open_newest()
+        last = self.segment.last() if self.segment is not None else None
+        if last is None or last.timestamp != record.timestamp:
+            self.append(record)
+            return
+        rollup = Rollup(record.timestamp)
+        rollup.add(last)
+        rollup.add(record)
+        self.segment.replace_last(rollup.record())
+        self.is_dirty = True
+
+    def flush(self):
+        """Write the mapped pages of the current segment to disk.
+        :return:
+        """
+        if self.segment is not None and self.is_dirty:
+            self.segment.flush()
+            self.is_dirty = False
+
+    def query(self, start, end):
+        """Return the records in [start, end]. Only the segments overlapping
+        the range are mapped, and only the pages of the range are read.
+        :param start: Timestamp.
+        :param end: Timestamp.
+        :return: List of TimeSeriesRecord.
+        """
+        paths = self.segment_paths()
+        records = []
+        for index in range(0, len(paths)):
+            segment_start = float(os.path.basename(
+                paths[index])[:-len(SEGMENT_SUFFIX)])
+            if segment_start > end:
+                break
+            if index + 1 < len(paths) and float(os.path.basename(
+                    paths[index + 1])[:-len(SEGMENT_SUFFIX)]) < start:
+                continue
+            if self.segment is not None and self.segment.path == paths[index]:
+                records.extend(self.segment.read(start, end))
+                continue
+            segment = Segment(paths[index], self.capacity)
+            try:
+                records.extend(segment.read(start, end))
+            finally:
+                segment.close()
+        return records
+
+    def expire(self, before, keep_newest=True):
+        """Remove the segments whose records are all older than before.
+        :param before: Timestamp.
+        :param keep_newest: Keep the newest segment, which is still written.
+        :return:
+        """
+        paths = self.segment_paths()
+        # a segment ends where the next one starts
+        for index in range(0, len(paths) - 1):
+            if float(os.path.basename(
+                    paths[index + 1])[:-len(SEGMENT_SUFFIX)]) >= before:
+                return
+            os.remove(paths[index])
+        if keep_newest or not paths:
+            return
+        segment = Segment(paths[-1], self.capacity)
+        try:
+            is_expired = segment.last_timestamp() < before
+        finally:
+            segment.close()
+        if is_expired:
+            os.remove(paths[-1])
+
+    def close(self):
+        if self.segment is not None:
+            self.segment.flush()
+            self.segment.close()
+            self.segment = None
+
+
+class Rollup(object):
+    """Aggregate of the records of one bucket.
+    """
+    def __init__(self, start):
+        """Initialize.
+        :param start: First timestamp of the bucket.
+        """
+        self.start = start
+        self.probes = 0
+        self.failures = 0
+        self.min = 0.0
+        self.max = 0.0
+        self.weighted_avg = 0.0
+        self.weighted_loss = 0.0
+
+    def add(self, record):
+        """Add a record.
+        :param record: TimeSeriesRecord.
+        :return:
+        """
+        received = record.probes - record.failures
+        if received > 0:
+            if self.probes == self.failures:
+                self.min = record.min
+                self.max = record.max
+            else:
+                self.min = min(self.min, record.min)
+                self.max = max(self.max, record.max)
+            self.weighted_avg += record.avg * received
+        self.weighted_loss += record.loss * record.probes
+        self.probes += record.probes
+        self.failures += record.failures
+
+    def record(self):
+        """Return the aggregate as record.
+        :return: TimeSeriesRecord.
+        """
+        received = self.probes - self.failures
+        avg = self.weighted_avg / received if received else 0.0
+        loss = self.weighted_loss / self.probes if self.probes else 0.0
+        return TimeSeriesRecord(self.start, self.probes, self.failures,
+                                self.min, avg, self.max, loss)
+
+
+class TimeSeriesStore(object):
+    """Append-only on-disk store of the ping results. The probing threads
+    only queue the results, a writer thread appends them in batches to the
+    raw series of the target and rolls them up into 1-minute and 1-hour
+    buckets. Pages are synced once per batch, never on the probe path.
+    """
+    def __init__(self, directory=None, retention=None, flush_interval=1.0,
+                 capacity=SEGMENT_RECORDS):
+        """Initialize.
+        :param directory: Store directory, default_directory() if None.
+        :param retention: Level -> seconds, DEFAULT_RETENTION if None.
+        :param flush_interval: Seconds between the batches of the writer.
+        :param capacity: Records per segment.
+        """
+        self.directory = directory if directory else default_directory()
+        self.retention = dict(DEFAULT_RETENTION)
+        if retention:
+            self.retention.update(retention)
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        # (key, level) -> Series
+        self.series = {}
+        # (key, level) -> Rollup of the current bucket
+        self.rollups = {}
+        # target -> key
+        self.targets = {}
+        self.queue = queue.Queue()
+        self.mutex = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_expire = 0.0
+        make_directory(self.directory)
+
+    def set_targets(self, targets):
+        """Store the results of the given targets.
+        :param targets: List of PingTarget.
+        :return:
+        """
+        for target in list(self.targets):
+            if target not in targets:
+                target.remove_listener(self.observe)
+                del self.targets[target]
+        for target in targets:
+            if target not in self.targets:
+                self.targets[target] = target_key(target)
+                target.add_listener(self.observe)
+
+    def observe(self, target):
+        """Listener of the targets, called in the probing threads.
+        :param target:
+        :return:
+        """
+        key = self.targets.get(target)
+        if key is not None:
+            self.append(key, target.result)
+
+    def append(self, key, result, timestamp=None):
+        """Queue a result for the writer.
+        :param key: Series key, see target_key().
+        :param result: PingStruct.
+        :param timestamp: Seconds since the epoch, now if None.
+        :return:
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        failures = 1 if result.result in (RESULT_FAILED, RESULT_NO_RESPONSE,
+                                          RESULT_UNRESOLVED) else 0
+        self.queue.put((key, TimeSeriesRecord(timestamp, 1, failures,
+                                              result.min, result.avg,
+                                              result.max, result.loss)))
+
+    def get_series(self, key, level):
+        series = self.series.get((key, level))
+        if series is None:
+            series = Series(os.path.join(self.directory, key, level),
+                            self.capacity)
+            self.series[(key, level)] = series
+        return series
+
+    def roll_up(self, key, level, record):
+        """Add a record to the current bucket of a rollup level, write the
+        bucket if the record starts a new one.
+        :param key:
+        :param level: LEVEL_MINUTE or LEVEL_HOUR.
+        :param record:
+        :return: Record of the finished bucket or None.
+        """
+        seconds = BUCKET_SECONDS[level]
+        start = record.timestamp - record.timestamp % seconds
+        rollup = self.rollups.get((key, level))
+        finished = None
+        if rollup is not None and rollup.start != start:
+            finished = rollup.record()
+            self.get_series(key, level).merge(finished)
+            rollup = None
+        if rollup is None:
+            rollup = Rollup(start)
+            self.rollups[(key, level)] = rollup
+        rollup.add(record)
+        return finished
+
+    def write(self, batch):
+        """Append a batch of records and sync the touched series.
+        :param batch: List of (key, record).
+        :return:
+        """
+        with self.mutex:
+            for key, record in batch:
+                self.get_series(key, LEVEL_RAW).append(record)
+                minute = self.roll_up(key, LEVEL_MINUTE, record)
+                if minute is not None:
+                    self.roll_up(key, LEVEL_HOUR, minute)
+            for series in self.series.values():
+                series.flush()
+
+    def release(self, key):
+        """Write the unfinished buckets of a series no target writes to any
+        more and close its files.
+        :param key:
+        :return:
+        """
+        minute = self.rollups.pop((key, LEVEL_MINUTE), None)
+        if minute is not None:
+            self.get_series(key, LEVEL_MINUTE).merge(minute.record())
+            self.roll_up(key, LEVEL_HOUR, minute.record())
+        hour = self.rollups.pop((key, LEVEL_HOUR), None)
+        if hour is not None:
+            self.get_series(key, LEVEL_HOUR).merge(hour.record())
+        for level in LEVELS:
+            series = self.series.pop((key, level), None)
+            if series is not None:
+                series.close()
+
+    def expire(self, now):
+        """Remove the segments beyond the retention of their level. Every
+        series in the store directory is expired, also the ones of removed
+        or relabeled targets, which are removed as a whole once all their
+        records are beyond the retention.
+        :param now:
+        :return:
+        """
+        with self.mutex:
+            keys = set(self.targets.values())
+            for key, _ in list(self.series):
+                if key not in keys:
+                    self.release(key)
+            for key in os.listdir(self.directory):
+                directory = os.path.join(self.directory, key)
+                for level in LEVELS:
+                    path = os.path.join(directory, level)
+                    if not os.path.isdir(path):
+                        continue
+                    before = now - self.retention[level]
+                    if (key, level) in self.series:
+                        self.series[(key, level)].expire(before)
+                        continue
+                    Series(path, self.capacity).expire(
+                        before, keep_newest=key in keys)
+                    remove_empty_directory(path)
+                remove_empty_directory(directory)
+
+    def drain(self):
+        """Return the queued records.
+        :return:
+        """
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def run(self):
+        """Writer thread.
+        :return:
+        """
+        while not self.stop_event.wait(self.flush_interval):
+            batch = self.drain()
+            if batch:
+                self.write(batch)
+            now = time.time()
+            if now - self.last_expire > 60.0:
+                self.last_expire = now
+                self.expire(now)
+
+    def start(self):
+        """Start the writer thread.
+        :return:
+        """
+        self.thread = threading.Thread(target=self.run,
+                                       name="any_ping_timeseries")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def query(self, key, start, end, level=LEVEL_RAW):
+        """Return the stored records of a series in [start, end]. Records
+        still queued and the unfinished rollup buckets are not included.
+        :param key: Series key, see target_key().
+        :param start: Timestamp.
+        :param end: Timestamp.
+        :param level: LEVEL_RAW, LEVEL_MINUTE or LEVEL_HOUR.
+        :return: List of TimeSeriesRecord.
+        """
+        with self.mutex:
+            if (key, level) in self.series:
+                return self.series[(key, level)].query(start, end)
+            path = os.path.join(self.directory, key, level)
+            if not os.path.isdir(path):
+                return []
+            return Series(path, self.capacity).query(start, end)
+
+    def close(self):
+        """Stop the writer, write the queued records and the unfinished
+        buckets.
+        :return:
+        """
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+        self.write(self.drain())
+        with self.mutex:
+            # the unfinished minute is part of the unfinished hour
+            for key, level in [item for item in self.rollups
+                               if item[1] == LEVEL_MINUTE]:
+                record = self.rollups.pop((key, level)).record()
+                self.get_series(key, level).merge(record)
+                self.roll_up(key, LEVEL_HOUR, record)
+            # a restart within the buckets adds to these records
+            for (key, level), rollup in self.rollups.items():
+                self.get_series(key, level).merge(rollup.record())
+            self.rollups = {}
+            for series in self.series.values():
+                series.close()
+            self.series = {}
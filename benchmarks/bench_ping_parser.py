@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+"""Check the ping output parser against the captured outputs in ping_output/
+and report how many parses per second it manages for each of them.
+
+    benchmarks/bench_ping_parser.py [--iterations N]
+"""
+
+import argparse
+import glob
+import json
+import sys
+import time
+
+from os.path import abspath, basename, dirname, join
+
+sys.path.insert(0, abspath(join(dirname(__file__), '..')))
+
+from any_ping_applet import ping_parser
+
+CORPUS_PATH = join(dirname(abspath(__file__)), "ping_output")
+
+
+def check(name, parsed, expected):
+    """Compare a parse result with the expected values.
+    :return: List of mismatch descriptions.
+    """
+    errors = []
+    for key, value in expected.items():
+        if getattr(parsed, key) != value:
+            errors.append("%s: %s is %r, expected %r" %
+                          (name, key, getattr(parsed, key), value))
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    with open(join(CORPUS_PATH, "expected.json"), 'r') as expected_file:
+        expected = json.load(expected_file)
+
+    errors = []
+    total_time = 0.0
+    total_count = 0
+    for path in sorted(glob.glob(join(CORPUS_PATH, "*.txt"))):
+        name = basename(path)
+        with open(path, 'rb') as output_file:
+            output = memoryview(output_file.read())
+        errors += check(name, ping_parser.parse(output), expected[name])
+        time_start = time.perf_counter()
+        for _ in range(0, args.iterations):
+            ping_parser.parse(output)
+        elapsed = time.perf_counter() - time_start
+        total_time += elapsed
+        total_count += args.iterations
+        print("{:<32} {:>12.0f} parses/s".format(name,
+                                                  args.iterations / elapsed))
+    print("{:<32} {:>12.0f} parses/s".format("total", total_count / total_time))
+
+    for error in errors:
+        print(error)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+#!/usr/bin/python3
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+"""Measure how the probing core scales with the number of targets. Runs the
+targets against benchmarks/fake_ping and prints one JSON document with CPU
+time, memory, threads, probe jitter and icon render latency per run.
+
+    benchmarks/bench_scaling.py [--targets 1,10,100,1000] [--duration S]
+        [--update-rate S] [--pings N] [--streaming] [--rtt MS] [--loss P]
+        [--max-concurrent-probes N] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, abspath(join(dirname(__file__), '..')))
+
+from any_ping_applet import history, ping_parser, scheduler, theme
+from any_ping_applet.ping_containers import IconTuple
+from any_ping_applet.ping_target import PingTarget
+
+FAKE_PING_PATH = join(dirname(abspath(__file__)), "fake_ping")
+
+
+def install_fake_ping(args):
+    """Put fake_ping on PATH as ping and configure its replies.
+    :return: Temporary directory holding the link.
+    """
+    directory = tempfile.mkdtemp(prefix="any_ping_bench-")
+    os.symlink(FAKE_PING_PATH, join(directory, "ping"))
+    os.environ["PATH"] = directory + os.pathsep + os.environ.get("PATH", "")
+    os.environ["FAKE_PING_RTT"] = str(args.rtt)
+    os.environ["FAKE_PING_JITTER"] = str(args.rtt_jitter)
+    os.environ["FAKE_PING_LOSS"] = str(args.loss)
+    # the environment of the ping processes is copied at import time
+    ping_parser.PING_ENVIRONMENT.update(os.environ, LC_ALL="C")
+    return directory
+
+
+def process_status():
+    """Return the current RSS in KiB and the number of threads of the
+    process.
+    """
+    rss = None
+    threads = threading.active_count()
+    try:
+        with open("/proc/self/status", 'r') as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Threads:"):
+                    threads = int(line.split()[1])
+    except IOError:
+        pass
+    return rss, threads
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def jitter_statistics(arrivals, update_rate):
+    """Compare the intervals between consecutive results of every target
+    with the update rate.
+    :param arrivals: List of lists of result times, one list per target.
+    :param update_rate:
+    :return: Dictionary, deviations in ms.
+    """
+    deviations = []
+    for times in arrivals:
+        for i in range(1, len(times)):
+            deviations.append(abs(times[i] - times[i - 1] - update_rate) *
+                              1000.0)
+    return {"intervals": len(deviations),
+            "mean_ms": sum(deviations) / len(deviations)
+            if deviations else None,
+            "p50_ms": percentile(deviations, 0.5),
+            "p95_ms": percentile(deviations, 0.95),
+            "p99_ms": percentile(deviations, 0.99),
+            "max_ms": max(deviations) if deviations else None}
+
+
+def icon_render_latency(targets, iterations):
+    """Time composing the indicator icon of all targets, once uncached and
+    then from the cache.
+    :return: Dictionary, latencies in ms, None without svgutils.
+    """
+    try:
+        from any_ping_applet.icon_compositor import IconCompositor
+        from any_ping_applet.icon_store import IconStore
+    except ImportError:
+        return None
+    icon_tuples = [IconTuple(target.id, target.name, target.icon, True, True)
+                   for target in targets]
+    directory = tempfile.mkdtemp(prefix="any_ping_bench_icons-")
+    try:
+        store = IconStore(directory)
+        cold = []
+        for _ in range(0, iterations):
+            compositor = IconCompositor()
+            time_start = time.perf_counter()
+            svg = compositor.compose(icon_tuples, theme.THEME_LIGHT)
+            store.path(svg)
+            cold.append((time.perf_counter() - time_start) * 1000.0)
+        warm = []
+        for _ in range(0, iterations):
+            time_start = time.perf_counter()
+            svg = compositor.compose(icon_tuples, theme.THEME_LIGHT)
+            store.path(svg)
+            warm.append((time.perf_counter() - time_start) * 1000.0)
+    except ImportError:
+        return None
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {"cold_p50_ms": percentile(cold, 0.5),
+            "cold_max_ms": max(cold),
+            "cached_p50_ms": percentile(warm, 0.5),
+            "cached_max_ms": max(warm)}
+
+
+def run(number_of_targets, args):
+    """Probe number_of_targets fake targets for args.duration seconds.
+    :return: Dictionary of the measurements.
+    """
+    arrivals = [[] for _ in range(0, number_of_targets)]
+    targets = []
+    for i in range(0, number_of_targets):
+        target = PingTarget(i, "bench" + str(i),
+                            "10.{}.{}.{}".format(i // 65536, i // 256 % 256,
+                                                 i % 256),
+                            args.update_rate, args.pings, True, True, True,
+                            streaming=args.streaming)
+        target.add_listener(
+            lambda t, times=arrivals[i]: times.append(time.monotonic()))
+        targets.append(target)
+
+    usage_start = resource.getrusage(resource.RUSAGE_SELF)
+    children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+    time_start = time.monotonic()
+    for target in targets:
+        target.start()
+    time.sleep(args.duration)
+    # measure before stopping, stopping waits for the probes in flight
+    time_stop = time.monotonic()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    rss, threads = process_status()
+    for target in targets:
+        target.stop()
+    arrivals = [[t for t in times if t <= time_stop] for times in arrivals]
+
+    results = sum(len(times) for times in arrivals)
+    return {
+        "targets": number_of_targets,
+        "elapsed_s": time_stop - time_start,
+        "results": results,
+        "expected_results": int(number_of_targets * args.duration /
+                                args.update_rate),
+        "cpu_user_s": usage.ru_utime - usage_start.ru_utime,
+        "cpu_system_s": usage.ru_stime - usage_start.ru_stime,
+        # includes the fake ping processes
+        "cpu_children_s": children.ru_utime - children_start.ru_utime +
+        children.ru_stime - children_start.ru_stime,
+        "rss_kib": rss,
+        "max_rss_kib": usage.ru_maxrss,
+        "threads": threads,
+        "jitter": jitter_statistics(arrivals, args.update_rate),
+        "icon_render": icon_render_latency(targets, args.icon_iterations),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--targets", default="1,10,100,1000")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--update-rate", type=float, default=1.0)
+    parser.add_argument("--pings", type=int, default=1)
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--rtt", type=float, default=10.0)
+    parser.add_argument("--rtt-jitter", type=float, default=1.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--max-concurrent-probes", type=int,
+                        default=scheduler.DEFAULT_MAX_CONCURRENT_PROBES)
+    parser.add_argument("--icon-iterations", type=int, default=5)
+    parser.add_argument("--output", help="write the JSON to this file")
+    args = parser.parse_args()
+
+    # keep diagnostic output of the probes out of the report
+    output = sys.stdout
+    sys.stdout = sys.stderr
+    directory = install_fake_ping(args)
+    scheduler.configure(args.max_concurrent_probes)
+    history.set_default_capacity(
+        max(1, int(args.duration / args.update_rate) * args.pings))
+    try:
+        runs = [run(int(n), args) for n in args.targets.split(",")]
+    finally:
+        scheduler.default_scheduler().shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report = {
+        "time": time.time(),
+        "python": sys.version.split()[0],
+        "parameters": {key: value for key, value in vars(args).items()
+                       if key != "output"},
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(text + "\n")
+    else:
+        output.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -46,6 +46,7 @@ setup(name="any_ping_indicator",
           find_resources("ui"),
           find_resources("autostart")],
       scripts=["bin/any_ping_applet"],
+      python_requires='>=3.5',
       install_requires=[
           'svgutils'
       ]
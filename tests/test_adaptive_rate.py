@@ -0,0 +1,88 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import unittest
+
+from any_ping_applet.adaptive_rate import AdaptiveRate
+from any_ping_applet.ping_containers import PingObjectTuple, PingStruct, \
+    RESULT_OK, RESULT_FAILED, BACKEND_SUBPROCESS, BACKEND_BATCH
+from any_ping_applet.ping_target import PingTarget
+
+OK = PingStruct(RESULT_OK, 10.0, 10.0, 10.0, 0.0)
+FAILED = PingStruct(RESULT_FAILED, 0.0, 0.0, 0.0, 100.0)
+
+
+class TestAdaptiveRate(unittest.TestCase):
+    def test_stable_target_backs_off(self):
+        rate = AdaptiveRate(1.0, 1.0, 4.0)
+        intervals = [rate.update(OK, 50.0, False) for _ in range(0, 12)]
+        self.assertEqual(intervals[:3], [1.0, 1.0, 1.5])
+        self.assertEqual(intervals[-1], 4.0)
+
+    def test_degradation_restarts_at_minimum(self):
+        rate = AdaptiveRate(4.0, 1.0, 4.0)
+        self.assertEqual(rate.update(OK, 50.0, False), 4.0)
+        slow = PingStruct(RESULT_OK, 80.0, 80.0, 80.0, 0.0)
+        self.assertEqual(rate.update(slow, 50.0, True), 1.0)
+        self.assertEqual(rate.update(OK, 50.0, True), 1.0)
+
+    def test_moving_avg_keeps_interval(self):
+        rate = AdaptiveRate(2.0, 1.0, 4.0)
+        rate.update(OK, 50.0, False)
+        moved = PingStruct(RESULT_OK, 20.0, 20.0, 20.0, 0.0)
+        self.assertEqual(rate.update(moved, 50.0, False), 2.0)
+        self.assertEqual(rate.stable_count, 0)
+
+    def test_outage_backs_off(self):
+        rate = AdaptiveRate(1.0, 1.0, 10.0, outage_results=3)
+        intervals = [rate.update(FAILED, 50.0, i == 0)
+                     for i in range(0, 10)]
+        # burst at the minimum, then back off up to the maximum
+        self.assertEqual(intervals[:3], [1.0, 1.0, 1.0])
+        self.assertEqual(intervals[3:5], [1.5, 2.25])
+        self.assertEqual(intervals[-1], 10.0)
+        # the target answers again
+        self.assertEqual(rate.update(OK, 50.0, True), 1.0)
+
+
+
+class TestPingTargetRate(unittest.TestCase):
+    def target(self, backend=BACKEND_SUBPROCESS, streaming=False):
+        return PingTarget.from_settings(0, PingObjectTuple(
+            "", "127.0.0.1", 2.0, 1, True, True, True, backend, streaming,
+            True, 1.0, 10.0))
+
+    def test_adaptive(self):
+        target = self.target()
+        self.assertIsNotNone(target.adaptive_rate)
+        target.set_result(FAILED, [None])
+        self.assertEqual(target.effective_update_rate, 1.0)
+
+    def test_fixed_rate_of_streamed_and_batched_targets(self):
+        for target in (self.target(streaming=True),
+                       self.target(backend=BACKEND_BATCH)):
+            self.assertIsNone(target.adaptive_rate)
+            target.set_result(FAILED, [None])
+            self.assertEqual(target.effective_update_rate, 2.0)
+        target = self.target()
+        target.reconfigure(target.settings()._replace(streaming=True))
+        self.assertIsNone(target.adaptive_rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
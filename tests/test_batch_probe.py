@@ -0,0 +1,117 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import errno
+import unittest
+from unittest import mock
+
+from any_ping_applet import batch_probe
+from any_ping_applet.ping_containers import RESULT_OK, RESULT_PARTIAL, \
+    RESULT_NO_RESPONSE, RESULT_UNRESOLVED
+from any_ping_applet.scheduler import ProbeScheduler
+
+
+class Target(object):
+    def __init__(self, address):
+        self.address = address
+        self.probe_timeouts = 0
+        self.result = None
+
+    def resolve(self):
+        return self.address
+
+    def set_result(self, result, samples):
+        self.result = result
+
+
+class TestParse(unittest.TestCase):
+    def test_parse(self):
+        output = (b"8.8.8.8 : 12.31 - 11.87\n"
+                  b"10.0.0.1 : - - -\n"
+                  b"fe80::1  : 0.05 0.04 0.06\n"
+                  b"unknown.invalid: Name or service not known\n")
+        self.assertEqual(batch_probe.parse(output), {
+            "8.8.8.8": [12.31, None, 11.87],
+            "10.0.0.1": [None, None, None],
+            "fe80::1": [0.05, 0.04, 0.06]})
+
+    def test_parse_empty(self):
+        self.assertEqual(batch_probe.parse(b""), {})
+
+
+class TestFpingCommand(unittest.TestCase):
+    def test_command(self):
+        self.assertEqual(
+            batch_probe.fping_command(["10.0.0.1", "10.0.0.2"], 3, 6.0),
+            ["fping", "-C", "3", "-q", "-p", "1000", "-t", "1000", "-i", "1",
+             "-r", "0", "10.0.0.1", "10.0.0.2"])
+
+    def test_period(self):
+        # at most one ping per second, at least every 10 ms
+        self.assertEqual(batch_probe.fping_period(2, 1.0), 500)
+        self.assertEqual(batch_probe.fping_period(1, 60.0), 1000)
+        self.assertEqual(batch_probe.fping_period(1000, 1.0), 10)
+
+
+class TestProbe(unittest.TestCase):
+    def test_results(self):
+        targets = [Target("10.0.0.1"), Target("10.0.0.2"), Target(None),
+                   Target("10.0.0.1")]
+        with mock.patch("subprocess.Popen") as popen:
+            popen.return_value.communicate.return_value = (
+                None, b"10.0.0.1 : 1.0 3.0\n10.0.0.2 : 2.0 -\n")
+            results = batch_probe.probe(targets, 2, 2.0)
+        # a shared address is probed once
+        self.assertEqual(popen.call_args[0][0][-2:], ["10.0.0.1",
+                                                      "10.0.0.2"])
+        self.assertEqual(results[targets[0]][0].result, RESULT_OK)
+        self.assertEqual(results[targets[0]][1], [1.0, 3.0])
+        self.assertEqual(results[targets[1]][0].result, RESULT_PARTIAL)
+        self.assertEqual(results[targets[2]][0].result, RESULT_UNRESOLVED)
+        self.assertEqual(results[targets[3]], results[targets[0]])
+
+    def test_no_reply_line(self):
+        target = Target("10.0.0.1")
+        with mock.patch("subprocess.Popen") as popen:
+            popen.return_value.communicate.return_value = (None, b"")
+            result, samples = batch_probe.probe([target], 2, 2.0)[target]
+        self.assertEqual(result.result, RESULT_NO_RESPONSE)
+        self.assertEqual(samples, [None, None])
+
+
+class TestProbeBatch(unittest.TestCase):
+    def test_fping_missing(self):
+        scheduler = ProbeScheduler()
+        with mock.patch("subprocess.Popen",
+                        side_effect=FileNotFoundError("fping")):
+            scheduler.probe_batch([Target("10.0.0.1")], 1, 1.0)
+        self.assertFalse(scheduler.is_batch_available)
+
+    def test_transient_error(self):
+        scheduler = ProbeScheduler()
+        target = Target("10.0.0.1")
+        with mock.patch("subprocess.Popen",
+                        side_effect=OSError(errno.EMFILE, "Too many open "
+                                                          "files")):
+            scheduler.probe_batch([target], 1, 1.0)
+        self.assertTrue(scheduler.is_batch_available)
+        self.assertIsNone(target.result)
+
+
+if __name__ == '__main__':
+    unittest.main()
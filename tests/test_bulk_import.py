@@ -0,0 +1,154 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from any_ping_applet import bulk_import
+from any_ping_applet.ping_containers import PingObjectTuple
+
+TEMPLATE = PingObjectTuple("", "", 1.0, 1, True, True, True)
+
+
+class TestParsers(unittest.TestCase):
+    def test_csv_without_header(self):
+        targets = list(bulk_import.parse_csv(
+            "# comment\n10.0.0.1,a,5,3\n\n10.0.0.2\n", TEMPLATE))
+        self.assertEqual(targets, [
+            TEMPLATE._replace(address="10.0.0.1", name="a", update_rate=5.0,
+                              number_of_pings=3),
+            TEMPLATE._replace(address="10.0.0.2")])
+
+    def test_csv_header(self):
+        targets = list(bulk_import.parse_csv(
+            "name, address, port, probe_type, streaming, unknown\n"
+            "web, 10.0.0.1, 443, tcp, yes, x\n", TEMPLATE))
+        self.assertEqual(targets, [TEMPLATE._replace(
+            name="web", address="10.0.0.1", port=443, probe_type="tcp",
+            streaming=True)])
+
+    def test_csv_bad_values(self):
+        skipped = []
+        targets = list(bulk_import.parse_csv(
+            "10.0.0.1,a,fast\n10.0.0.2,b,2,many\n,no address\n10.0.0.3\n",
+            TEMPLATE, skipped))
+        self.assertEqual([target.address for target in targets],
+                         ["10.0.0.3"])
+        self.assertEqual(len(skipped), 2)
+        self.assertTrue(skipped[0].startswith("row 1: "))
+        self.assertTrue(skipped[1].startswith("row 2: "))
+
+    def test_hosts(self):
+        targets = list(bulk_import.parse_hosts(
+            "# hosts\n127.0.0.1 localhost lo\n10.0.0.1  # router\n",
+            TEMPLATE))
+        self.assertEqual(targets, [
+            TEMPLATE._replace(address="127.0.0.1", name="localhost"),
+            TEMPLATE._replace(address="10.0.0.1")])
+
+    def test_cidr(self):
+        targets = list(bulk_import.parse_cidr("192.168.1.5/30", TEMPLATE))
+        self.assertEqual([target.address for target in targets],
+                         ["192.168.1.5", "192.168.1.6"])
+        self.assertEqual(len(list(bulk_import.parse_cidr("10.0.0.0/20",
+                                                         TEMPLATE))),
+                         bulk_import.MAX_RANGE_HOSTS - 2)
+
+    def test_cidr_invalid(self):
+        for text in ("10.0.0.0/19", "fe80::/64", "10.0.0.300/24"):
+            with self.assertRaises(ValueError):
+                list(bulk_import.parse_cidr(text, TEMPLATE))
+
+    def test_kind_of_file(self):
+        self.assertEqual(bulk_import.kind_of_file("/tmp/Targets.CSV"),
+                         bulk_import.IMPORT_CSV)
+        self.assertEqual(bulk_import.kind_of_file("/etc/hosts"),
+                         bulk_import.IMPORT_HOSTS)
+
+
+class TestImporter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.chunks = []
+        self.done = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, text):
+        path = os.path.join(self.directory, "targets.csv")
+        with open(path, "w") as source_file:
+            source_file.write(text)
+        return path
+
+    def importer(self, kind, source, **kwargs):
+        return bulk_import.Importer(
+            kind, source, TEMPLATE,
+            lambda targets, fraction: self.chunks.append((targets, fraction)),
+            lambda count, error, skipped: self.done.append((count, error,
+                                                           skipped)),
+            **kwargs)
+
+    def test_dedupe_and_skip(self):
+        path = self.write("10.0.0.1\n10.0.0.2\n10.0.0.2\n10.0.0.3,c,-1\n"
+                          "10.0.0.4,d,x\n10.0.0.5\n")
+        importer = self.importer(bulk_import.IMPORT_CSV, path,
+                                 known_addresses=["10.0.0.1"])
+        importer.run()
+        addresses = [target.address for targets, _ in self.chunks
+                     for target in targets]
+        self.assertEqual(addresses, ["10.0.0.2", "10.0.0.5"])
+        count, error, skipped = self.done[0]
+        self.assertEqual((count, error), (2, None))
+        # the invalid update rate and the unparsable one
+        self.assertEqual(len(skipped), 2)
+
+    def test_chunks(self):
+        importer = self.importer(bulk_import.IMPORT_CIDR, "10.0.0.0/28",
+                                 chunk_size=5)
+        importer.run()
+        self.assertEqual([len(targets) for targets, _ in self.chunks],
+                         [5, 5, 4])
+        fractions = [fraction for _, fraction in self.chunks]
+        self.assertEqual(fractions, sorted(fractions))
+        self.assertEqual(fractions[-1], 1.0)
+        self.assertEqual(self.done, [(14, None, [])])
+
+    def test_cancel(self):
+        importer = self.importer(bulk_import.IMPORT_CIDR, "10.0.0.0/28",
+                                 chunk_size=5)
+        importer.on_chunk = lambda targets, fraction: (
+            self.chunks.append(targets), importer.cancel())
+        importer.run()
+        self.assertEqual(len(self.chunks), 1)
+        self.assertEqual(self.done, [(5, None, [])])
+
+    def test_errors(self):
+        self.importer(bulk_import.IMPORT_CIDR, "10.0.0.0/8").run()
+        self.importer(bulk_import.IMPORT_HOSTS,
+                      os.path.join(self.directory, "missing")).run()
+        self.assertEqual([count for count, _, _ in self.done], [0, 0])
+        self.assertIn("more than", self.done[0][1])
+        self.assertIsNotNone(self.done[1][1])
+        self.assertEqual(self.chunks, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from any_ping_applet import config
+from any_ping_applet.ping_containers import PingObjectTuple, BACKEND_NATIVE
+
+
+def settings(name, address):
+    return PingObjectTuple(name, address, 1.0, 1, True, True, True)
+
+
+class TestParseTargets(unittest.TestCase):
+    def test_legacy_layout(self):
+        config_dict = {"0": {"name": "a", "address": "10.0.0.1"},
+                       "1": {"address": "10.0.0.2", "update_rate": 5.0},
+                       "3": {"address": "10.0.0.4"},
+                       "ping_warning": 80.0}
+        entries = config.parse_targets(config_dict)
+        self.assertEqual([id for id, _ in entries], [0, 1])
+        self.assertEqual(entries[0][1], settings("a", "10.0.0.1"))
+        self.assertEqual(entries[1][1].update_rate, 5.0)
+
+    def test_target_defaults(self):
+        target = config.parse_target({"address": "10.0.0.1",
+                                      "backend": BACKEND_NATIVE})
+        self.assertEqual(target, config.TARGET_DEFAULTS._replace(
+            address="10.0.0.1", backend=BACKEND_NATIVE))
+
+    def test_invalid_and_duplicate_ids(self):
+        config_dict = {"version": config.CONFIG_VERSION, "targets": [
+            {"id": 4, "address": "10.0.0.1"},
+            {"id": 4, "address": "10.0.0.2"},
+            {"id": -1, "address": "10.0.0.3"},
+            {"id": True, "address": "10.0.0.4"},
+            {"address": "10.0.0.5"}]}
+        entries = config.parse_targets(config_dict)
+        self.assertEqual([id for id, _ in entries], [4, None, None, None,
+                                                     None])
+        ids, targets = config.assign_ids(entries)
+        self.assertEqual(ids, [4, 5, 6, 7, 8])
+        self.assertEqual([t.address for t in targets],
+                         ["10.0.0." + str(i) for i in range(1, 6)])
+
+
+class TestValidate(unittest.TestCase):
+    def test_valid(self):
+        config.validate(settings("a", "10.0.0.1"))
+
+    def test_invalid(self):
+        target = settings("a", "10.0.0.1")
+        for changes in ({"address": ""}, {"update_rate": 0},
+                        {"update_rate": True},
+                        {"min_update_rate": 10.0, "max_update_rate": 5.0},
+                        {"number_of_pings": 0}, {"backend": "other"},
+                        {"probe_type": "other"}, {"port": 65536}):
+            with self.assertRaises(ValueError):
+                config.validate(target._replace(**changes))
+
+
+class TestPersist(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "config")
+        self.saved = (getattr(config, "__CONFIG_FILE_PATH"),
+                      config.ping_object_tuples, config.target_ids,
+                      config.ping_warning)
+        setattr(config, "__CONFIG_FILE_PATH", self.path)
+        config.ping_object_tuples = [settings("a", "10.0.0.1")]
+        config.target_ids = [0]
+        config.ping_warning = 50.0
+
+    def tearDown(self):
+        config.persist()
+        (path, config.ping_object_tuples, config.target_ids,
+         config.ping_warning) = self.saved
+        setattr(config, "__CONFIG_FILE_PATH", path)
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.path) as config_file:
+            return json.load(config_file)
+
+    def test_schedule_after_persist(self):
+        config.schedule_persist(60.0)
+        config.persist()
+        self.assertIsNone(getattr(config, "__pending_timer"))
+        self.assertEqual(self.read()["ping_warning"], 50.0)
+        # a new write is scheduled, not left to the cancelled timer
+        config.ping_warning = 80.0
+        config.schedule_persist(0.01)
+        deadline = time.time() + 5.0
+        while self.read()["ping_warning"] != 80.0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.read()["ping_warning"], 80.0)
+
+    def test_reload_until_applied(self):
+        config.persist()
+        self.assertIsNone(config.reload())
+        config_dict = self.read()
+        config_dict["targets"].append({"address": "10.0.0.2"})
+        with open(self.path, "w") as config_file:
+            json.dump(config_dict, config_file)
+        entries, ping_warning, content = config.reload()
+        self.assertEqual([id for id, _ in entries], [0, None])
+        self.assertEqual(ping_warning, 50.0)
+        # not applied yet, still changed
+        self.assertIsNotNone(config.reload())
+        config.applied(content)
+        self.assertIsNone(config.reload())
@@ -0,0 +1,68 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import unittest
+
+from any_ping_applet.history import RttHistory, percentile, summarize
+from any_ping_applet.ping_containers import RESULT_OK, RESULT_PARTIAL, \
+    RESULT_FAILED
+
+
+class TestRttHistory(unittest.TestCase):
+    def test_statistics_of_window(self):
+        history = RttHistory(10)
+        history.extend([100.0, 100.0], timestamp=0.0)
+        history.extend([1.0, 2.0, None, 3.0], timestamp=100.0)
+        statistics = history.statistics(seconds=50.0, now=110.0)
+        self.assertEqual(statistics.count, 4)
+        self.assertAlmostEqual(statistics.loss_rate, 0.25)
+        self.assertAlmostEqual(statistics.mean, 2.0)
+        self.assertAlmostEqual(statistics.p50, 2.0)
+        self.assertAlmostEqual(statistics.p95, 2.9)
+
+    def test_statistics_of_empty_window(self):
+        history = RttHistory(10)
+        self.assertIsNone(history.statistics())
+        history.append(None, timestamp=0.0)
+        self.assertIsNone(history.statistics(seconds=10.0, now=100.0))
+        statistics = history.statistics()
+        self.assertEqual(statistics.loss_rate, 1.0)
+        self.assertEqual(statistics.p95, 0.0)
+
+    def test_capacity(self):
+        history = RttHistory(3)
+        history.extend([1.0, None, 3.0, 4.0, 5.0], timestamp=0.0)
+        self.assertEqual(len(history), 3)
+        self.assertEqual(history.window(), ([3.0, 4.0, 5.0], 0))
+
+
+class TestSummarize(unittest.TestCase):
+    def test_results(self):
+        self.assertEqual(summarize([1.0, 3.0]).result, RESULT_OK)
+        partial = summarize([1.0, None])
+        self.assertEqual(partial.result, RESULT_PARTIAL)
+        self.assertAlmostEqual(partial.loss, 50.0)
+        self.assertEqual(summarize([None]).result, RESULT_FAILED)
+
+    def test_percentile(self):
+        self.assertEqual(percentile([1.0], 95.0), 1.0)
+        self.assertAlmostEqual(percentile([0.0, 10.0], 50.0), 5.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import socket
+import threading
+import unittest
+
+from any_ping_applet.icmp import IcmpProber, IcmpSocketError, checksum, \
+    open_socket
+
+
+def has_icmp_socket():
+    """Return True if the process may open an ICMP socket.
+    :return:
+    """
+    try:
+        sock, _ = open_socket(socket.AF_INET)
+    except IcmpSocketError:
+        return False
+    sock.close()
+    return True
+
+
+class TestChecksum(unittest.TestCase):
+    def test_checksum(self):
+        self.assertEqual(checksum(b"\x00\x00"), 0xFFFF)
+        data = b"\x08\x00\x00\x00\x12\x34\x00\x01abc"
+        value = checksum(data)
+        # the checksum of the data including its checksum is zero
+        self.assertEqual(checksum(data[:2] + bytes([value >> 8,
+                                                    value & 0xFF]) +
+                                  data[4:] + b"\x00"), 0)
+
+
+@unittest.skipUnless(has_icmp_socket(), "no ICMP socket permitted")
+class TestIcmpProber(unittest.TestCase):
+    def setUp(self):
+        self.prober = IcmpProber()
+
+    def tearDown(self):
+        self.prober.close()
+
+    def test_loopback(self):
+        result, samples = self.prober.ping_samples("127.0.0.1", 3, 1.0)
+        self.assertEqual(len(samples), 3)
+        self.assertNotIn(None, samples)
+
+    def test_overlapping_probes(self):
+        # the threads share the socket, none may drop the others' replies
+        lost = []
+
+        def probe():
+            for _ in range(0, 10):
+                _, samples = self.prober.ping_samples("127.0.0.1", 5, 1.0)
+                lost.append(samples.count(None))
+
+        threads = [threading.Thread(target=probe) for _ in range(0, 8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(lost), 0)
+        self.assertEqual(self.prober.waiters, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
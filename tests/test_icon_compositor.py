@@ -0,0 +1,85 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import unittest
+from unittest import mock
+
+from any_ping_applet.icon_compositor import IconCompositor
+from any_ping_applet.ping_containers import IconTuple
+
+
+def icon_tuple(id, icon, show_indicator=True, show_text=False):
+    return IconTuple(id, "target" + str(id), icon, show_indicator, show_text)
+
+
+class TestIconCompositor(unittest.TestCase):
+    def setUp(self):
+        self.compositor = IconCompositor(cache_size=2)
+        # rendering needs svgutils and the themes, the cache does not
+        patcher = mock.patch.object(self.compositor, "render",
+                                    side_effect=lambda signature:
+                                    repr(signature).encode())
+        self.render = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_signature(self):
+        icons = [icon_tuple(0, "icon_green", show_text=True),
+                 icon_tuple(1, "icon_red", show_indicator=False),
+                 icon_tuple(2, "icon_orange")]
+        self.assertEqual(IconCompositor.signature(icons, "dark"),
+                         ("dark", (("icon_green", "target0"),
+                                   ("icon_orange", None))))
+        self.assertIsNone(IconCompositor.signature(
+            [icon_tuple(0, "icon_green", show_indicator=False)], "dark"))
+        self.assertIsNone(self.compositor.compose([], "dark"))
+
+    def test_memoized(self):
+        icons = [icon_tuple(0, "icon_green")]
+        svg = self.compositor.compose(icons, "dark")
+        # the id does not change the icon
+        self.assertIs(self.compositor.compose([icon_tuple(5, "icon_green")],
+                                              "dark"), svg)
+        self.assertEqual(self.render.call_count, 1)
+        self.assertEqual((self.compositor.hits, self.compositor.misses),
+                         (1, 1))
+
+    def test_lru_eviction(self):
+        green = [icon_tuple(0, "icon_green")]
+        red = [icon_tuple(0, "icon_red")]
+        orange = [icon_tuple(0, "icon_orange")]
+        self.compositor.compose(green, "dark")
+        self.compositor.compose(red, "dark")
+        # green is used again, red is the least recently used
+        self.compositor.compose(green, "dark")
+        self.compositor.compose(orange, "dark")
+        self.assertEqual(len(self.compositor.cache), 2)
+        self.assertEqual(self.render.call_count, 3)
+        self.compositor.compose(green, "dark")
+        self.assertEqual(self.render.call_count, 3)
+        self.compositor.compose(red, "dark")
+        self.assertEqual(self.render.call_count, 4)
+
+    def test_themes_cached_apart(self):
+        icons = [icon_tuple(0, "icon_green")]
+        self.compositor.compose(icons, "dark")
+        self.compositor.compose(icons, "light")
+        self.assertEqual(self.render.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
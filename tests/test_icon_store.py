@@ -0,0 +1,96 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from any_ping_applet.icon_store import IconStore
+
+
+class TestIconStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def icons(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_content_addressed(self):
+        store = IconStore(self.directory)
+        svg = b"<svg>green</svg>"
+        path = store.path(svg)
+        self.assertEqual(os.path.basename(path),
+                         "icon-" + hashlib.sha1(svg).hexdigest() + ".svg")
+        with open(path, 'rb') as icon_file:
+            self.assertEqual(icon_file.read(), svg)
+        # shown again, reused without writing
+        self.assertEqual(store.path(svg), path)
+        self.assertEqual(store.writes, 1)
+        self.assertNotEqual(store.path(b"<svg>red</svg>"), path)
+        self.assertEqual(store.writes, 2)
+        # no temporary files are left
+        self.assertEqual(len(self.icons()), 2)
+
+    def test_rewritten_if_removed(self):
+        store = IconStore(self.directory)
+        path = store.path(b"<svg>green</svg>")
+        os.remove(path)
+        self.assertEqual(store.path(b"<svg>green</svg>"), path)
+        self.assertTrue(os.path.isfile(path))
+        self.assertEqual(store.writes, 2)
+
+    def test_eviction(self):
+        store = IconStore(self.directory, max_bytes=20)
+        first = store.path(b"a" * 8)
+        second = store.path(b"b" * 8)
+        # first is used again, second is the least recently used
+        store.path(b"a" * 8)
+        third = store.path(b"c" * 8)
+        self.assertTrue(os.path.isfile(first))
+        self.assertFalse(os.path.isfile(second))
+        self.assertTrue(os.path.isfile(third))
+        self.assertEqual(store.total_bytes, 16)
+        # the most recent icon is kept even if it is too large
+        large = store.path(b"d" * 30)
+        self.assertEqual(self.icons(), [os.path.basename(large)])
+
+    def test_adopt_previous_run(self):
+        store = IconStore(self.directory)
+        old = store.path(b"a" * 8)
+        new = store.path(b"b" * 8)
+        past = time.time() - 60.0
+        os.utime(old, (past, past))
+        with open(os.path.join(self.directory, "other.txt"), 'w'):
+            pass
+        store = IconStore(self.directory, max_bytes=10)
+        # the older icon is evicted first, other files are not touched
+        self.assertFalse(os.path.isfile(old))
+        self.assertTrue(os.path.isfile(new))
+        self.assertIn("other.txt", self.icons())
+        self.assertEqual(store.path(b"b" * 8), new)
+        self.assertEqual(store.writes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
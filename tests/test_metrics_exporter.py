@@ -0,0 +1,136 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import unittest
+
+from any_ping_applet.history import RttHistory
+from any_ping_applet.metrics_exporter import MetricsExporter
+from any_ping_applet.ping_containers import PingStruct, RESULT_OK, \
+    RESULT_FAILED
+
+
+class Target(object):
+    def __init__(self, id, name, address):
+        self.id = id
+        self.name = name
+        self.address = address
+        self.history = RttHistory(16)
+        self.result = None
+        self.samples = []
+        self.resolve_latency = None
+        self.effective_update_rate = 2.0
+        self.probe_timeouts = 0
+        self.deadline_misses = 0
+
+    def add_listener(self, listener):
+        pass
+
+    def remove_listener(self, listener):
+        pass
+
+    def set_result(self, result, samples):
+        self.result = result
+        self.samples = samples
+        self.history.extend(samples)
+
+
+class TestMetricsExporter(unittest.TestCase):
+    def setUp(self):
+        self.exporter = MetricsExporter(0, buckets=(0.01, 0.1))
+
+    def lines(self):
+        return self.exporter.serialize().decode("utf-8").splitlines()
+
+    def test_exposition(self):
+        target = Target(3, "lo", "127.0.0.1")
+        self.exporter.set_targets([target])
+        self.exporter.add_collector(
+            lambda: [("any_ping_test_total", "counter", "Test.", 2)])
+        target.set_result(PingStruct(RESULT_OK, 5.0, 50.0, 27.5, 50.0),
+                          [5.0, 50.0, None])
+        self.exporter.observe(target)
+        lines = self.lines()
+        labels = "id=\"3\",name=\"lo\",address=\"127.0.0.1\""
+        for line in (
+                "# TYPE any_ping_probe_rate gauge",
+                "any_ping_probe_rate 0.5",
+                "# TYPE any_ping_test_total counter",
+                "any_ping_test_total 2.0",
+                "# TYPE any_ping_rtt_avg_seconds gauge",
+                "any_ping_rtt_avg_seconds{" + labels + "} 0.0275",
+                "any_ping_packet_loss_ratio{" + labels + "} 0.5",
+                "# TYPE any_ping_rtt_seconds histogram",
+                "any_ping_rtt_seconds_bucket{" + labels + ",le=\"0.01\"} 1",
+                "any_ping_rtt_seconds_bucket{" + labels + ",le=\"0.1\"} 2",
+                "any_ping_rtt_seconds_bucket{" + labels + ",le=\"+Inf\"} 2",
+                "any_ping_rtt_seconds_count{" + labels + "} 2",
+                "any_ping_probes_total{" + labels + "} 1",
+                "any_ping_probe_failures_total{" + labels + "} 0",
+                "any_ping_probe_interval_seconds{" + labels + "} 2.0",
+                "any_ping_window_loss_ratio{" + labels + "} " +
+                repr(1.0 / 3)):
+            self.assertIn(line, lines)
+        # every family is announced once, its samples follow
+        self.assertEqual(
+            len([line for line in lines
+                 if line.startswith("# TYPE any_ping_rtt_seconds ")]), 1)
+        self.assertLess(lines.index("# TYPE any_ping_rtt_avg_seconds gauge"),
+                        lines.index("any_ping_rtt_avg_seconds{" + labels +
+                                    "} 0.0275"))
+
+    def test_duplicate_targets(self):
+        targets = [Target(0, "dns", "8.8.8.8"), Target(1, "dns", "8.8.8.8")]
+        self.exporter.set_targets(targets)
+        targets[0].set_result(PingStruct(RESULT_OK, 1.0, 1.0, 1.0, 0.0),
+                              [1.0])
+        targets[1].set_result(PingStruct(RESULT_FAILED, 0.0, 0.0, 0.0,
+                                         100.0), [None])
+        for target in targets:
+            self.exporter.observe(target)
+        lines = self.lines()
+        self.assertIn("any_ping_probe_failures_total{id=\"0\",name=\"dns\","
+                      "address=\"8.8.8.8\"} 0", lines)
+        self.assertIn("any_ping_probe_failures_total{id=\"1\",name=\"dns\","
+                      "address=\"8.8.8.8\"} 1", lines)
+
+    def test_serialize_without_lock(self):
+        target = Target(0, "lo", "127.0.0.1")
+        statistics = target.history.statistics
+        locked = []
+
+        def check_lock(*args):
+            locked.append(self.exporter.mutex.locked())
+            return statistics(*args)
+
+        target.history.statistics = check_lock
+        self.exporter.set_targets([target])
+        target.set_result(PingStruct(RESULT_OK, 1.0, 1.0, 1.0, 0.0), [1.0])
+        self.exporter.observe(target)
+        first = self.exporter.serialize()
+        self.assertEqual(locked, [False])
+        # cached until the next result
+        self.assertEqual(self.exporter.serialize(), first)
+        self.assertEqual(locked, [False])
+        self.exporter.observe(target)
+        self.assertIn(b"any_ping_probes_total{id=\"0\",name=\"lo\","
+                      b"address=\"127.0.0.1\"} 2", self.exporter.serialize())
+        self.assertEqual(locked, [False, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import glob
+import json
+import unittest
+
+from os.path import abspath, basename, dirname, join
+
+from any_ping_applet import ping_parser
+from any_ping_applet.ping_containers import RESULT_OK, RESULT_PARTIAL, \
+    RESULT_FAILED, RESULT_NO_RESPONSE
+
+# captured ping outputs and their expected parse results
+CORPUS_PATH = join(dirname(dirname(abspath(__file__))), "benchmarks",
+                   "ping_output")
+
+
+class TestParse(unittest.TestCase):
+    def test_corpus(self):
+        with open(join(CORPUS_PATH, "expected.json"), 'r') as expected_file:
+            expected = json.load(expected_file)
+        paths = sorted(glob.glob(join(CORPUS_PATH, "*.txt")))
+        self.assertEqual(sorted(basename(path) for path in paths),
+                         sorted(expected))
+        for path in paths:
+            name = basename(path)
+            with open(path, 'rb') as output_file:
+                parsed = ping_parser.parse(memoryview(output_file.read()))
+            for key, value in expected[name].items():
+                self.assertEqual(getattr(parsed, key), value,
+                                 name + ": " + key)
+
+    def test_parse_reply(self):
+        self.assertEqual(ping_parser.parse_reply(
+            b"64 bytes from 8.8.8.8: icmp_seq=7 ttl=117 time=10.3 ms"),
+            (7, 10.3))
+        self.assertEqual(ping_parser.parse_reply(
+            b"64 bytes from 8.8.8.8: seq=0 ttl=117 time=10.311 ms"),
+            (0, 10.311))
+        self.assertEqual(ping_parser.parse_reply(
+            b"64 bytes from ::1: icmp_seq=2 ttl=64 time<1 ms"), (2, 1.0))
+        self.assertEqual(ping_parser.parse_reply(
+            b"no answer yet for icmp_seq=3"), (3, None))
+        self.assertIsNone(ping_parser.parse_reply(
+            b"PING 8.8.8.8 (8.8.8.8) 56(84) bytes of data."))
+
+    def test_to_ping_struct(self):
+        def parsed(status, loss):
+            return ping_parser.ParseResult(status, 4, 2, loss, 1.0, 2.0, 3.0,
+                                           [1.0, 3.0])
+
+        self.assertEqual(
+            ping_parser.to_ping_struct(parsed(ping_parser.PARSE_OK, 0.0), 0),
+            (RESULT_OK, 1.0, 3.0, 2.0, 0.0))
+        self.assertEqual(
+            ping_parser.to_ping_struct(
+                parsed(ping_parser.PARSE_PARTIAL, 50.0), 1),
+            (RESULT_PARTIAL, 1.0, 3.0, 2.0, 50.0))
+        self.assertEqual(
+            ping_parser.to_ping_struct(
+                parsed(ping_parser.PARSE_FAILED, 100.0), 1),
+            (RESULT_FAILED, 0.0, 0.0, 0.0, 100.0))
+        no_summary = parsed(ping_parser.PARSE_NO_SUMMARY, 0.0)
+        self.assertEqual(ping_parser.to_ping_struct(no_summary, 2).result,
+                         RESULT_NO_RESPONSE)
+        self.assertEqual(ping_parser.to_ping_struct(no_summary, 1).result,
+                         RESULT_FAILED)
+
+
+if __name__ == '__main__':
+    unittest.main()
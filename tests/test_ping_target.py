@@ -0,0 +1,63 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import unittest
+from unittest import mock
+
+from any_ping_applet.ping_containers import PingObjectTuple
+from any_ping_applet.ping_target import PingTarget, PING_INTERVAL
+
+
+class TestPingCommand(unittest.TestCase):
+    def target(self, update_rate, number_of_pings):
+        return PingTarget.from_settings(0, PingObjectTuple(
+            "", "10.0.0.1", update_rate, number_of_pings, True, True, True))
+
+    def test_argv(self):
+        self.assertEqual(self.target(1.0, 1).ping_command(),
+                         ["ping", "-c", "1", "-W", "1", "10.0.0.1"])
+        self.assertEqual(self.target(5.0, 3).ping_command("10.0.0.2"),
+                         ["ping", "-c", "3", "-W", "1", "10.0.0.2"])
+
+    def test_fits_into_deadline(self):
+        for update_rate, number_of_pings in ((1.0, 1), (60.0, 1), (2.0, 4),
+                                             (60.0, 10)):
+            target = self.target(update_rate, number_of_pings)
+            argv = target.ping_command()
+            # no deadline, which keeps ping sending until enough replies
+            self.assertNotIn("-w", argv)
+            count = int(argv[argv.index("-c") + 1])
+            timeout = int(argv[argv.index("-W") + 1])
+            self.assertEqual(count, number_of_pings)
+            self.assertLessEqual((count - 1) * PING_INTERVAL + timeout,
+                                 target.probe_deadline())
+
+    def test_probe_subprocess_runs_command(self):
+        target = self.target(60.0, 2)
+        output = b"2 packets transmitted, 0 received, 100% packet loss\n"
+        with mock.patch("subprocess.Popen") as popen:
+            process = popen.return_value
+            process.communicate.return_value = (output, b"")
+            process.wait.return_value = 1
+            _, samples = target.probe_subprocess()
+        self.assertEqual(popen.call_args[0][0], target.ping_command())
+        self.assertEqual(samples, [None, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
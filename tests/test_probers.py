@@ -0,0 +1,207 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import socket
+import threading
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from any_ping_applet import probers
+from any_ping_applet.ping_containers import RESULT_OK, RESULT_FAILED, \
+    PROBE_TCP, PROBE_UDP, PROBE_HTTP
+
+LOCALHOST = "127.0.0.1"
+TIMEOUT = 0.3
+
+
+def unused_port(kind=socket.SOCK_STREAM):
+    """Return a port nothing listens on.
+    :param kind:
+    :return:
+    """
+    sock = socket.socket(socket.AF_INET, kind)
+    sock.bind((LOCALHOST, 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def start_thread(target):
+    thread = threading.Thread(target=target)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+class ProberTests(object):
+    """Tests of every probe type, probe_type is set by the test case.
+    """
+    def assertTimesOut(self, prober):
+        time_start = time.monotonic()
+        self.assertIsNone(prober.measure(LOCALHOST, TIMEOUT))
+        self.assertGreaterEqual(time.monotonic() - time_start, TIMEOUT * 0.9)
+
+    def test_resolution_failure(self):
+        prober = probers.create(self.probe_type, "localhost", 1)
+        with mock.patch.object(socket, "getaddrinfo",
+                               side_effect=socket.gaierror("failed")):
+            result, samples = prober.probe("host.invalid", 2, TIMEOUT)
+        self.assertEqual(result.result, RESULT_FAILED)
+        self.assertEqual(samples, [None, None])
+
+
+class TestTcpProber(ProberTests, unittest.TestCase):
+    probe_type = PROBE_TCP
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind((LOCALHOST, 0))
+        self.server.listen(8)
+        self.port = self.server.getsockname()[1]
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_success(self):
+        prober = probers.create(PROBE_TCP, LOCALHOST, self.port)
+        result, samples = prober.probe(LOCALHOST, 2, TIMEOUT)
+        self.assertEqual(result.result, RESULT_OK)
+        self.assertEqual(len(samples), 2)
+        self.assertTrue(all(rtt >= 0.0 for rtt in samples))
+
+    def test_refused(self):
+        prober = probers.create(PROBE_TCP, LOCALHOST, unused_port())
+        result, samples = prober.probe(LOCALHOST, 1, TIMEOUT)
+        self.assertEqual(result.result, RESULT_FAILED)
+
+    def test_timeout(self):
+        # a full accept queue drops the handshake
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind((LOCALHOST, 0))
+        server.listen(0)
+        port = server.getsockname()[1]
+        clients = []
+        try:
+            for _ in range(0, 4):
+                client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                client.setblocking(False)
+                client.connect_ex((LOCALHOST, port))
+                clients.append(client)
+            time.sleep(0.05)
+            self.assertTimesOut(probers.create(PROBE_TCP, LOCALHOST, port))
+        finally:
+            for client in clients:
+                client.close()
+            server.close()
+
+
+class TestUdpProber(ProberTests, unittest.TestCase):
+    probe_type = PROBE_UDP
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind((LOCALHOST, 0))
+        self.port = self.server.getsockname()[1]
+        self.is_echoing = True
+        start_thread(self.echo)
+
+    def tearDown(self):
+        self.server.close()
+
+    def echo(self):
+        while True:
+            try:
+                data, address = self.server.recvfrom(2048)
+            except OSError:
+                return
+            if self.is_echoing:
+                self.server.sendto(data, address)
+
+    def test_success(self):
+        prober = probers.create(PROBE_UDP, LOCALHOST, self.port)
+        result, samples = prober.probe(LOCALHOST, 3, TIMEOUT)
+        self.assertEqual(result.result, RESULT_OK)
+
+    def test_refused(self):
+        prober = probers.create(PROBE_UDP, LOCALHOST,
+                                unused_port(socket.SOCK_DGRAM))
+        time_start = time.monotonic()
+        self.assertIsNone(prober.measure(LOCALHOST, TIMEOUT))
+        # the port unreachable is reported before the timeout
+        self.assertLess(time.monotonic() - time_start, TIMEOUT)
+
+    def test_timeout(self):
+        self.is_echoing = False
+        self.assertTimesOut(probers.create(PROBE_UDP, LOCALHOST, self.port))
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        if self.path == "/delay":
+            time.sleep(TIMEOUT * 3)
+        self.send_response(500 if self.path == "/error" else 200)
+        self.end_headers()
+
+    def log_message(self, *_):
+        pass
+
+
+class TestHttpProber(ProberTests, unittest.TestCase):
+    probe_type = PROBE_HTTP
+
+    def setUp(self):
+        self.server = HTTPServer((LOCALHOST, 0), Handler)
+        self.port = self.server.server_address[1]
+        start_thread(self.server.serve_forever)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_url(self):
+        prober = probers.create(PROBE_HTTP, "https://example.com:8443/a?b=1")
+        self.assertTrue(prober.is_https)
+        self.assertEqual((prober.host, prober.port, prober.path),
+                         ("example.com", 8443, "/a?b=1"))
+        prober = probers.create(PROBE_HTTP, "example.com", 8080)
+        self.assertFalse(prober.is_https)
+        self.assertEqual((prober.port, prober.path), (8080, "/"))
+
+    def test_success(self):
+        prober = probers.create(PROBE_HTTP, "http://localhost/", self.port)
+        result, samples = prober.probe(LOCALHOST, 2, TIMEOUT)
+        self.assertEqual(result.result, RESULT_OK)
+
+    def test_server_error(self):
+        prober = probers.create(PROBE_HTTP, "localhost/error", self.port)
+        self.assertIsNone(prober.measure(LOCALHOST, TIMEOUT))
+
+    def test_refused(self):
+        prober = probers.create(PROBE_HTTP, "localhost", unused_port())
+        self.assertIsNone(prober.measure(LOCALHOST, TIMEOUT))
+
+    def test_timeout(self):
+        prober = probers.create(PROBE_HTTP, "localhost/delay", self.port)
+        self.assertTimesOut(prober)
+
+
+if __name__ == '__main__':
+    unittest.main()
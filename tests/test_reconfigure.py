@@ -0,0 +1,156 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import unittest
+
+from any_ping_applet import reconfigure
+from any_ping_applet.ping_containers import PingObjectTuple
+
+
+def settings(name, address, update_rate=1.0):
+    return PingObjectTuple(name, address, update_rate, 1, True, True, True)
+
+
+class Target(object):
+    def __init__(self, id, settings):
+        self.id = id
+        self.current = reconfigure.normalize(settings)
+        self.is_stopped = False
+        self.ping_warning = None
+
+    def settings(self):
+        return self.current
+
+    def stop(self):
+        self.is_stopped = True
+
+    def reconfigure(self, settings, ping_warning=None):
+        self.current = settings
+        self.ping_warning = ping_warning
+
+    def set_ping_warning(self, ping_warning):
+        self.ping_warning = ping_warning
+
+
+class TestDiff(unittest.TestCase):
+    def setUp(self):
+        self.targets = [Target(0, settings("a", "10.0.0.1")),
+                        Target(1, settings("b", "10.0.0.2")),
+                        Target(2, settings("c", "10.0.0.3"))]
+
+    def test_unchanged(self):
+        changes = reconfigure.diff(
+            self.targets, [(t.id, t.settings()) for t in self.targets],
+            Target)
+        self.assertEqual(changes.targets, self.targets)
+        self.assertEqual((changes.added, changes.removed, changes.changed,
+                          changes.relabeled), ([], [], [], []))
+
+    def test_move_edit_remove_add(self):
+        edited = settings("b", "10.0.0.2", 5.0)
+        changes = reconfigure.diff(
+            self.targets, [(2, self.targets[2].settings()), (1, edited),
+                           (None, settings("", "10.0.0.9"))], Target)
+        self.assertEqual([t.id for t in changes.targets], [2, 1, 3])
+        self.assertIs(changes.targets[0], self.targets[2])
+        self.assertEqual(changes.removed, [self.targets[0]])
+        self.assertEqual(changes.changed, [(self.targets[1], edited)])
+        self.assertEqual(changes.relabeled, [])
+        self.assertEqual(len(changes.added), 1)
+        # a target without name is named by its address
+        self.assertEqual(changes.added[0].settings().name, "10.0.0.9")
+
+    def test_relabeled(self):
+        changes = reconfigure.diff(
+            self.targets, [(0, settings("x", "10.0.0.1"))], Target)
+        self.assertEqual(changes.relabeled, [self.targets[0]])
+
+    def test_added_id(self):
+        # an unused id of the config is kept, a used one is replaced
+        changes = reconfigure.diff(
+            self.targets, [(7, settings("d", "10.0.0.4"))], Target)
+        self.assertEqual(changes.added[0].id, 7)
+        changes = reconfigure.diff(
+            self.targets[:1], [(0, self.targets[0].settings()),
+                               (None, settings("d", "10.0.0.4"))], Target)
+        self.assertEqual(changes.added[0].id, 1)
+
+    def test_apply(self):
+        edited = settings("b", "10.0.0.2", 5.0)
+        changes = reconfigure.diff(
+            self.targets, [(1, edited), (None, settings("d", "10.0.0.4"))],
+            Target)
+        reconfigure.apply(changes, 80.0)
+        self.assertTrue(self.targets[0].is_stopped)
+        self.assertFalse(self.targets[1].is_stopped)
+        self.assertEqual(self.targets[1].settings(), edited)
+        self.assertEqual(self.targets[1].ping_warning, 80.0)
+        self.assertEqual(changes.added[0].ping_warning, 80.0)
+
+
+class TestMatch(unittest.TestCase):
+    def setUp(self):
+        self.targets = [Target(0, settings("a", "10.0.0.1")),
+                        Target(1, settings("b", "10.0.0.2")),
+                        Target(2, settings("c", "10.0.0.3"))]
+
+    def test_ids_win(self):
+        entries = [(2, settings("a", "10.0.0.1"))]
+        self.assertEqual([id for id, _ in reconfigure.match(self.targets,
+                                                            entries)], [2])
+
+    def test_heuristics(self):
+        entries = [(None, settings("c", "10.0.0.3")),
+                   (None, settings("a", "10.0.0.8")),
+                   (None, settings("z", "10.0.0.2")),
+                   (None, settings("a", "10.0.0.9"))]
+        ids = [id for id, _ in reconfigure.match(self.targets, entries)]
+        # equal settings, then the same name, then the same address; every
+        # target is paired once
+        self.assertEqual(ids, [2, 0, 1, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestMerge(unittest.TestCase):
+    def setUp(self):
+        self.base = {0: settings("a", "10.0.0.1"),
+                     1: settings("b", "10.0.0.2"),
+                     2: settings("c", "10.0.0.3")}
+
+    def test_both_sides(self):
+        ours = [(0, settings("a", "10.0.0.9")), (1, self.base[1]),
+                (2, self.base[2]), (3, settings("d", "10.0.0.4"))]
+        theirs = [(0, self.base[0]), (1, settings("b", "10.0.0.8")),
+                  (3, settings("e", "10.0.0.5")),
+                  (None, settings("f", "10.0.0.6"))]
+        merged = reconfigure.merge(self.base, ours, theirs)
+        self.assertEqual(merged, [
+            (0, settings("a", "10.0.0.9")),
+            (1, reconfigure.normalize(settings("b", "10.0.0.8"))),
+            (3, settings("d", "10.0.0.4")),
+            (None, settings("e", "10.0.0.5")),
+            (None, settings("f", "10.0.0.6"))])
+
+    def test_conflict_ours_win(self):
+        ours = [(0, settings("a", "10.0.0.9"))]
+        theirs = [(0, settings("a", "10.0.0.8")), (1, self.base[1])]
+        merged = reconfigure.merge(self.base, ours, theirs)
+        self.assertEqual(merged, [(0, settings("a", "10.0.0.9"))])
@@ -0,0 +1,82 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import threading
+import time
+import unittest
+
+from unittest import mock
+
+from any_ping_applet import resolver
+from any_ping_applet.resolver import DnsCache, Resolution
+
+
+class TestDnsCache(unittest.TestCase):
+    def test_ip_address(self):
+        with mock.patch.object(resolver, "resolve") as resolve:
+            self.assertEqual(DnsCache().lookup("127.0.0.1").ip, "127.0.0.1")
+            self.assertFalse(resolve.called)
+
+    def test_cached(self):
+        entry = Resolution("10.0.0.1", None, 1.0, time.monotonic() + 60.0,
+                           time.monotonic())
+        with mock.patch.object(resolver, "resolve",
+                               return_value=entry) as resolve:
+            cache = DnsCache()
+            self.assertEqual(cache.lookup("host").ip, "10.0.0.1")
+            self.assertEqual(cache.lookup("host").ip, "10.0.0.1")
+            self.assertEqual(resolve.call_count, 1)
+
+    def test_failure_refreshed_in_background(self):
+        failed = Resolution(None, "failed", 1.0, time.monotonic() - 1.0,
+                            None)
+        resolved = Resolution("10.0.0.1", None, 1.0,
+                              time.monotonic() + 60.0, time.monotonic())
+        release = threading.Event()
+        refreshed = threading.Event()
+        calls = []
+
+        def resolve(address, ttl, negative_ttl):
+            calls.append(address)
+            if len(calls) == 1:
+                return failed
+            # a dead DNS server, only the refresh thread waits
+            release.wait(5.0)
+            refreshed.set()
+            return resolved
+
+        with mock.patch.object(resolver, "resolve", side_effect=resolve):
+            cache = DnsCache()
+            self.assertIsNone(cache.lookup("host").ip)
+            time_start = time.monotonic()
+            # the expired failure is served while it is resolved again
+            self.assertEqual(cache.lookup("host").error, "failed")
+            self.assertEqual(cache.lookup("host").error, "failed")
+            self.assertLess(time.monotonic() - time_start, 1.0)
+            release.set()
+            self.assertTrue(refreshed.wait(5.0))
+            for _ in range(0, 100):
+                if "host" not in cache.refreshing:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(cache.lookup("host").ip, "10.0.0.1")
+            self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import unittest
+
+from any_ping_applet.scheduler import ProbeScheduler
+
+
+class Loop(object):
+    """Stand-in for the event loop clock."""
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class PingObject(object):
+    def __init__(self):
+        self.deadline_misses = 0
+
+
+class TestDeadlines(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = ProbeScheduler()
+        self.scheduler.loop = Loop(100.0)
+
+    def test_phases_spread(self):
+        for count in range(2, 200):
+            self.scheduler.phase_count = 0
+            phases = sorted(self.scheduler.first_deadline(1.0) - 100.0
+                            for _ in range(0, count))
+            self.assertTrue(all(0.0 <= phase < 1.0 for phase in phases))
+            gaps = [b - a for a, b in zip(phases, phases[1:])]
+            gaps.append(1.0 - phases[-1] + phases[0])
+            # evenly spread for any count, no two timers fire together
+            self.assertLess(max(gaps), 2.0 / count)
+            self.assertGreater(min(gaps), 0.4 / count)
+
+    def test_phase_scales_with_interval(self):
+        first = self.scheduler.first_deadline(1.0) - 100.0
+        self.scheduler.phase_count = 0
+        self.assertAlmostEqual(self.scheduler.first_deadline(10.0) - 100.0,
+                               10.0 * first)
+
+    def test_next_deadline_on_time(self):
+        ping_object = PingObject()
+        self.assertEqual(self.scheduler.next_deadline(99.5, 2.0,
+                                                      [ping_object]),
+                         101.5)
+        self.assertEqual(ping_object.deadline_misses, 0)
+
+    def test_missed_deadlines_skipped(self):
+        ping_object = PingObject()
+        self.scheduler.loop.now = 107.5
+        deadline = self.scheduler.next_deadline(100.0, 2.0, [ping_object])
+        # 102, 104 and 106 passed while the probe ran, no burst of probes
+        # catches up, the phase is kept
+        self.assertEqual(deadline, 108.0)
+        self.assertEqual(ping_object.deadline_misses, 3)
+        self.scheduler.loop.now = 108.0
+        self.assertEqual(self.scheduler.next_deadline(deadline, 2.0,
+                                                      [ping_object]),
+                         110.0)
+        self.assertEqual(ping_object.deadline_misses, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import unittest
+
+from any_ping_applet.icon_compositor import IconCompositor
+from any_ping_applet.ping_containers import IconTuple
+from any_ping_applet.status_summary import StatusSummary
+
+
+class TestStatusSummary(unittest.TestCase):
+    def test_counts(self):
+        summary = StatusSummary([IconTuple(0, "a", "icon_grey", True, True),
+                                 IconTuple(1, "b", "icon_green", True, True),
+                                 IconTuple(2, "c", "icon_red", False, True)])
+        self.assertEqual(summary.counts(), (0, 0, 1, 1))
+        self.assertTrue(summary.update(
+            IconTuple(0, "a", "icon_red", True, True)))
+        self.assertFalse(summary.update(
+            IconTuple(0, "a", "icon_red", True, True)))
+        self.assertEqual(summary.counts(), (1, 0, 1, 0))
+        # hidden ping objects are not counted
+        self.assertTrue(summary.update(
+            IconTuple(1, "b", "icon_green", False, True)))
+        self.assertEqual(summary.counts(), (1, 0, 0, 0))
+
+    def test_worst(self):
+        summary = StatusSummary()
+        summary.update(IconTuple(0, "a", "icon_orange", True, True))
+        summary.update(IconTuple(1, "b", "icon_red", True, True))
+        summary.update(IconTuple(2, "c", "icon_red", True, True))
+        summary.update(IconTuple(3, "d", "icon_green", True, True))
+        self.assertEqual(summary.worst(3), [(1, "b", "icon_red"),
+                                            (2, "c", "icon_red"),
+                                            (0, "a", "icon_orange")])
+        # a recovered object loses its place
+        summary.update(IconTuple(1, "b", "icon_green", True, True))
+        summary.update(IconTuple(1, "b", "icon_red", True, True))
+        self.assertEqual(summary.worst(1), [(2, "c", "icon_red")])
+
+    def test_reset(self):
+        summary = StatusSummary([IconTuple(0, "a", "icon_red", True, True)])
+        summary.reset([IconTuple(1, "b", "icon_green", True, True)])
+        self.assertEqual(summary.counts(), (0, 0, 1, 0))
+
+
+class TestSummarySignature(unittest.TestCase):
+    def test_inactive_only(self):
+        self.assertIsNone(IconCompositor.summary_signature((0, 0, 0, 3),
+                                                           "light"))
+        self.assertIsNone(IconCompositor.summary_signature((0, 0, 0, 0),
+                                                           "light"))
+
+    def test_counts(self):
+        theme, visible = IconCompositor.summary_signature((1, 0, 1000, 3),
+                                                          "light")
+        self.assertEqual(visible, (("icon_red", "1  "),
+                                   ("icon_orange", "0  "),
+                                   ("icon_green", "999")))
+
+
+if __name__ == '__main__':
+    unittest.main()
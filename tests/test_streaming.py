@@ -0,0 +1,93 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import unittest
+
+from any_ping_applet.ping_containers import RESULT_OK, RESULT_PARTIAL
+from any_ping_applet.streaming import PingStream, ping_command
+
+
+def reply(sequence, rtt):
+    return ("64 bytes from 10.0.0.1: icmp_seq=" + str(sequence) +
+            " ttl=64 time=" + str(rtt) + " ms").encode()
+
+
+def timeout(sequence):
+    return ("no answer yet for icmp_seq=" + str(sequence)).encode()
+
+
+class TestPingStream(unittest.TestCase):
+    def setUp(self):
+        self.stream = PingStream(8)
+
+    def test_replies_and_timeouts(self):
+        self.assertEqual(
+            self.stream.feed(b"PING 10.0.0.1 (10.0.0.1) 56(84) bytes"), [])
+        self.assertEqual(self.stream.feed(reply(1, 1.5)), [1.5])
+        self.assertEqual(self.stream.feed(timeout(2)), [None])
+        self.assertIsNone(self.stream.last_rtt)
+        self.assertEqual(self.stream.feed(reply(3, 2.5)), [2.5])
+        result = self.stream.result()
+        self.assertEqual(result.result, RESULT_PARTIAL)
+        self.assertAlmostEqual(result.loss, 100.0 / 3)
+
+    def test_gap_is_loss(self):
+        self.stream.feed(reply(1, 1.0))
+        # 2 to 4 were neither answered nor reported
+        self.assertEqual(self.stream.feed(reply(5, 1.0)),
+                         [None, None, None, 1.0])
+        self.assertEqual(list(self.stream.window),
+                         [1.0, None, None, None, 1.0])
+
+    def test_gap_limited_to_window(self):
+        self.stream.feed(reply(1, 1.0))
+        self.assertEqual(self.stream.feed(reply(1000, 1.0)),
+                         [None] * 8 + [1.0])
+        self.assertEqual(len(self.stream.window), 8)
+
+    def test_wraparound(self):
+        self.stream.feed(reply(65534, 1.0))
+        self.assertEqual(self.stream.feed(reply(65535, 1.0)), [1.0])
+        self.assertEqual(self.stream.feed(reply(0, 1.0)), [1.0])
+        self.assertEqual(self.stream.feed(reply(2, 1.0)), [None, 1.0])
+        self.assertEqual(self.stream.result().result, RESULT_PARTIAL)
+
+    def test_duplicate_and_late_replies(self):
+        self.stream.feed(reply(1, 1.0))
+        self.stream.feed(timeout(2))
+        self.stream.feed(reply(3, 1.0))
+        # duplicate of the latest reply
+        self.assertEqual(self.stream.feed(reply(3, 1.0)), [])
+        # late reply of the request already counted as lost
+        self.assertEqual(self.stream.feed(reply(2, 9.0)), [])
+        self.assertEqual(list(self.stream.window), [1.0, None, 1.0])
+        self.assertEqual(self.stream.last_rtt, 1.0)
+
+    def test_window(self):
+        for sequence in range(0, 20):
+            self.stream.feed(reply(sequence, 1.0))
+        self.assertEqual(len(self.stream.window), 8)
+        self.assertEqual(self.stream.result().result, RESULT_OK)
+
+    def test_ping_command(self):
+        self.assertEqual(ping_command("10.0.0.1", 0.5),
+                         ["ping", "-n", "-O", "-i", "0.500", "10.0.0.1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
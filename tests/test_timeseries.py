@@ -0,0 +1,142 @@
+################################################################################
+# Copyright (C) 2015 by Samuel Bachmann                                        #
+# samuel.bachmann@gmail.com                                                    #
+#                                                                              #
+# This program is free software; you can redistribute it and/or modify         #
+# it under the terms of the Lesser GNU General Public License as published by  #
+# the Free Software Foundation; either version 3 of the License, or            #
+# (at your option) any later version.                                          #
+#                                                                              #
+# This program is distributed in the hope that it will be useful,              #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                 #
+# Lesser GNU General Public License for more details.                          #
+#                                                                              #
+# You should have received a copy of the Lesser GNU General Public License     #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.         #
+################################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from any_ping_applet.ping_containers import PingStruct, RESULT_OK, \
+    RESULT_FAILED
+from any_ping_applet.timeseries import TimeSeriesStore, LEVEL_RAW, \
+    LEVEL_MINUTE, LEVEL_HOUR
+
+DAY = 24 * 3600.0
+# start of an hour, a zero timestamp marks unused records
+T0 = 1499997600.0
+
+
+class Target(object):
+    def __init__(self, name, address):
+        self.name = name
+        self.address = address
+
+    def add_listener(self, listener):
+        pass
+
+    def remove_listener(self, listener):
+        pass
+
+
+class TestTimeSeriesStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = TimeSeriesStore(self.directory, capacity=16)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_rollups(self):
+        ok = PingStruct(RESULT_OK, 10.0, 30.0, 20.0, 0.0)
+        failed = PingStruct(RESULT_FAILED, 0.0, 0.0, 0.0, 100.0)
+        self.store.append("key", ok, T0)
+        self.store.append("key", failed, T0 + 30.0)
+        self.store.append("key", PingStruct(RESULT_OK, 5.0, 50.0, 40.0, 0.0),
+                          T0 + 59.0)
+        # starts the second minute, the first one is finished
+        self.store.append("key", ok, T0 + 60.0)
+        self.store.write(self.store.drain())
+        self.assertEqual(len(self.store.query("key", T0, T0 + 60.0)), 4)
+        minutes = self.store.query("key", T0, T0 + 60.0, LEVEL_MINUTE)
+        self.assertEqual(len(minutes), 1)
+        minute = minutes[0]
+        self.assertEqual((minute.probes, minute.failures), (3, 1))
+        self.assertEqual((minute.min, minute.max), (5.0, 50.0))
+        self.assertAlmostEqual(minute.avg, 30.0, places=4)
+        self.assertAlmostEqual(minute.loss, 100.0 / 3, places=4)
+        self.assertEqual(
+            self.store.query("key", T0, T0 + 60.0, LEVEL_HOUR), [])
+
+    def test_segments_rotate(self):
+        ok = PingStruct(RESULT_OK, 1.0, 1.0, 1.0, 0.0)
+        for i in range(0, 40):
+            self.store.append("key", ok, T0 + i)
+        self.store.write(self.store.drain())
+        records = self.store.query("key", T0, T0 + 100.0)
+        self.assertEqual([record.timestamp for record in records],
+                         [T0 + i for i in range(0, 40)])
+        self.assertEqual(len(os.listdir(
+            os.path.join(self.directory, "key", LEVEL_RAW))), 3)
+
+    def test_expire_removed_targets(self):
+        ok = PingStruct(RESULT_OK, 1.0, 1.0, 1.0, 0.0)
+        kept = Target("kept", "127.0.0.1")
+        removed = Target("removed", "127.0.0.2")
+        self.store.set_targets([kept, removed])
+        for target in (kept, removed):
+            key = self.store.targets[target]
+            for i in range(0, 40):
+                self.store.append(key, ok, T0 + 60.0 * i)
+        self.store.write(self.store.drain())
+        removed_key = self.store.targets[removed]
+        self.store.set_targets([kept])
+        self.store.expire(T0 + 2 * DAY)
+        # raw records of the kept target are beyond the retention, the
+        # newest segment is still written
+        kept_raw = os.path.join(self.directory, self.store.targets[kept],
+                                LEVEL_RAW)
+        self.assertEqual(len(os.listdir(kept_raw)), 1)
+        # the rollups of the removed target are within their retention
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory,
+                                                        removed_key))),
+                         [LEVEL_HOUR, LEVEL_MINUTE])
+        self.store.expire(T0 + 400 * DAY)
+        self.assertFalse(os.path.exists(os.path.join(self.directory,
+                                                     removed_key)))
+
+    def test_restart_within_bucket(self):
+        ok = PingStruct(RESULT_OK, 10.0, 10.0, 10.0, 0.0)
+        failed = PingStruct(RESULT_FAILED, 0.0, 0.0, 0.0, 100.0)
+        self.store.append("key", ok, T0)
+        self.store.append("key", ok, T0 + 10.0)
+        self.store.close()
+        # the restart continues the minute and the hour written at close
+        self.store = TimeSeriesStore(self.directory, capacity=16)
+        self.store.append("key", failed, T0 + 20.0)
+        self.store.append("key", PingStruct(RESULT_OK, 40.0, 40.0, 40.0, 0.0),
+                          T0 + 30.0)
+        self.store.close()
+        self.store = TimeSeriesStore(self.directory, capacity=16)
+        self.store.append("key", ok, T0 + 70.0)
+        self.store.close()
+        minutes = self.store.query("key", T0, T0 + DAY, LEVEL_MINUTE)
+        self.assertEqual([minute.timestamp for minute in minutes],
+                         [T0, T0 + 60.0])
+        self.assertEqual((minutes[0].probes, minutes[0].failures), (4, 1))
+        self.assertEqual((minutes[0].min, minutes[0].max), (10.0, 40.0))
+        self.assertAlmostEqual(minutes[0].avg, 20.0, places=4)
+        self.assertAlmostEqual(minutes[0].loss, 25.0, places=4)
+        hours = self.store.query("key", T0, T0 + DAY, LEVEL_HOUR)
+        self.assertEqual([hour.timestamp for hour in hours], [T0])
+        self.assertEqual((hours[0].probes, hours[0].failures), (5, 1))
+        self.assertAlmostEqual(hours[0].loss, 20.0, places=4)
+
+
+if __name__ == '__main__':
+    unittest.main()